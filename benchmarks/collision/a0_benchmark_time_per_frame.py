@@ -72,7 +72,12 @@
         'collman_cls_name': 'CollisionManagerGrid',
         'cshape_cls_names': ['CircleShape'],
         'collman_gen_args': [3.0]
-        }
+        },
+    'Numpy': {
+        'collman_cls_name': 'CollisionManagerNumpy',
+        'cshape_cls_names': ['CircleShape'],
+        'collman_gen_args': []
+        },
     }
 
 # Collision Manager is always Grid, compare performance
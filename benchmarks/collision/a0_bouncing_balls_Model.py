@@ -141,7 +141,10 @@ def update(self, dt):
                 actor.colliding = False
 
         # update collman
-        if not isinstance(self.collman, collision_module.CollisionManagerBruteForce):
+        if hasattr(self.collman, 'update_many'):
+            self.collman.update_many(self.actors)
+        elif not isinstance(self.collman, collision_module.CollisionManagerBruteForce):
+            # implementations without incremental update
             add = self.collman.add
             self.collman.clear()
             for actor in self.actors:
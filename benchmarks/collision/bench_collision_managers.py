@@ -0,0 +1,527 @@
+"""
+Headless benchmark for the collision managers in cocos.collision_model
+
+Sweeps object count, size distribution, density, motion pattern and cshape
+classes over every collision manager and every query type, timing each
+query per frame, and writes the timing percentiles as JSON and / or CSV so
+runs can be compared, by example before and after a change, or to choose
+a collision manager for a game with known characteristics.
+
+Typical use, from (checkout)/benchmarks/collision::
+
+    python bench_collision_managers.py --quick
+    python bench_collision_managers.py --json results.json --csv results.csv
+    python bench_collision_managers.py --counts 500,2000 --motions drift \\
+        --managers Grid,Numpy,AABBTree --queries all_collisions,update
+
+To compare implementations of cocos.collision_model copy them to this dir
+with suitable names and pass them with --modules, by example
+--modules cocos.collision_model,collision_joePR
+
+Older implementations may lack some of the managers, cshapes or queries;
+the cases and queries they can't run are skipped and reported. Managers
+without update_many or update are updated by clear() and adding all the
+objects again.
+
+Sweep axes
+
+    - counts: number of objects
+    - sizes: 'uniform' (all the same size), 'mixed' (sizes uniform in
+      [0.5, 2] times the base), 'few_big' (5% of the objects ten times
+      bigger)
+    - densities: fraction of the world area covered by objects, the world
+      side is calculated from that
+    - motions: 'static', 'jitter' (small random displacement each frame),
+      'drift' (constant velocity, bouncing at the world borders), 'swarm'
+      (all objects chase a moving target, so they crowd)
+    - shapes: 'circle', 'aarect', 'obb', 'mixed' (circle, aarect and obb)
+
+Each row of results is one (module, manager, count, size, density, motion,
+shapes, query) combination, with the time per frame in milliseconds
+summarized as min, p50, p90, p99, max and mean over the frames.
+Per object queries are asked for --queries-per-frame objects each frame;
+the time reported is for all of them.
+"""
+from __future__ import division, print_function, unicode_literals
+
+import argparse
+import csv
+import gc
+import importlib
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+
+# running without installing cocos
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+import pyglet
+# no window is needed, and on a box without display it can't be created
+pyglet.options['shadow_window'] = False
+
+import cocos.euclid as eu
+
+timer = getattr(time, 'perf_counter', time.time)
+
+manager_names = ['BruteForce', 'Grid', 'Numpy', 'AABBTree']
+
+size_names = ['uniform', 'mixed', 'few_big']
+motion_names = ['static', 'jitter', 'drift', 'swarm']
+shapes_names = ['circle', 'aarect', 'obb', 'mixed']
+
+# query name -> function(collman, objs, sample, rnd, params) doing the
+# work for one frame
+queries = {}
+
+# query name -> collision manager method the query needs, None if it can be
+# asked to any manager
+query_methods = {}
+
+# shapes name -> cshape classes needed
+shapes_classes = {
+    'circle': ['CircleShape'],
+    'aarect': ['AARectShape'],
+    'obb': ['OBBShape'],
+    'mixed': ['CircleShape', 'AARectShape', 'OBBShape'],
+    }
+
+
+def query(name, method=None):
+    def register(fn):
+        queries[name] = fn
+        query_methods[name] = method
+        return fn
+    return register
+
+
+def update_collman(collman, objs):
+    """tells collman the objects moved, in the best way collman supports"""
+    if hasattr(collman, 'update_many'):
+        collman.update_many(objs)
+    elif hasattr(collman, 'update'):
+        for obj in objs:
+            collman.update(obj)
+    else:
+        collman.clear()
+        for obj in objs:
+            collman.add(obj)
+
+
+@query('update')
+def q_update(collman, objs, sample, rnd, params):
+    update_collman(collman, objs)
+
+
+@query('all_collisions', 'iter_all_collisions')
+def q_all_collisions(collman, objs, sample, rnd, params):
+    for pair in collman.iter_all_collisions():
+        pass
+
+
+@query('contacts', 'update_contacts')
+def q_contacts(collman, objs, sample, rnd, params):
+    collman.update_contacts()
+
+
+@query('colliding', 'objs_colliding')
+def q_colliding(collman, objs, sample, rnd, params):
+    for obj in sample:
+        collman.objs_colliding(obj)
+
+
+@query('colliding_many', 'objs_colliding_many')
+def q_colliding_many(collman, objs, sample, rnd, params):
+    collman.objs_colliding_many(sample)
+
+
+@query('near', 'objs_near')
+def q_near(collman, objs, sample, rnd, params):
+    d = params['near_distance']
+    for obj in sample:
+        collman.objs_near(obj, d)
+
+
+@query('ranked_near', 'ranked_objs_near')
+def q_ranked_near(collman, objs, sample, rnd, params):
+    d = params['near_distance']
+    for obj in sample:
+        collman.ranked_objs_near(obj, d)
+
+
+@query('k_nearest', 'k_nearest')
+def q_k_nearest(collman, objs, sample, rnd, params):
+    for obj in sample:
+        collman.k_nearest(obj, 5)
+
+
+@query('touching_points', 'objs_touching_points')
+def q_touching_points(collman, objs, sample, rnd, params):
+    side = params['world_side']
+    points = [(rnd.uniform(0.0, side), rnd.uniform(0.0, side))
+              for obj in sample]
+    collman.objs_touching_points(points)
+
+
+@query('raycast', 'raycast')
+def q_raycast(collman, objs, sample, rnd, params):
+    side = params['world_side']
+    for obj in sample:
+        a = rnd.uniform(0.0, 2.0 * math.pi)
+        collman.raycast(obj.cshape.center, (math.cos(a), math.sin(a)),
+                        side * 0.25)
+
+
+@query('sweep', 'sweep_hits')
+def q_sweep(collman, objs, sample, rnd, params):
+    step = params['base_radius'] * 4.0
+    for obj in sample:
+        a = rnd.uniform(0.0, 2.0 * math.pi)
+        collman.sweep_hits(obj, (step * math.cos(a), step * math.sin(a)))
+
+
+query_names = list(queries)
+
+
+class Actor(object):
+    def __init__(self, cshape, velocity):
+        self.cshape = cshape
+        self.vel = velocity
+
+
+def make_radii(rnd, count, size, base_radius):
+    if size == 'uniform':
+        return [base_radius] * count
+    elif size == 'mixed':
+        return [base_radius * rnd.uniform(0.5, 2.0) for i in range(count)]
+    elif size == 'few_big':
+        return [base_radius * (10.0 if rnd.random() < 0.05 else 1.0)
+                for i in range(count)]
+    raise ValueError("unknown size distribution: %s" % size)
+
+
+def make_cshape(cm, rnd, kind, center, r):
+    if kind == 'mixed':
+        kind = rnd.choice(['circle', 'aarect', 'obb'])
+    if kind == 'circle':
+        return cm.CircleShape(center, r)
+    elif kind == 'aarect':
+        return cm.AARectShape(center, r, r)
+    elif kind == 'obb':
+        return cm.OBBShape(center, r, r * 0.5, rnd.uniform(0.0, 360.0))
+    raise ValueError("unknown shapes: %s" % kind)
+
+
+def make_world(cm, rnd, case, base_radius):
+    """returns (actors, world_side)"""
+    radii = make_radii(rnd, case['count'], case['size'], base_radius)
+    area = sum(math.pi * r * r for r in radii)
+    side = math.sqrt(area / case['density'])
+    actors = []
+    for r in radii:
+        # keep the objects fully inside the world, the grid disregards the
+        # outside
+        r = min(r, side * 0.25)
+        center = eu.Vector2(rnd.uniform(r, side - r), rnd.uniform(r, side - r))
+        a = rnd.uniform(0.0, 2.0 * math.pi)
+        speed = base_radius * 0.5
+        actor = Actor(make_cshape(cm, rnd, case['shapes'], center, r),
+                      eu.Vector2(speed * math.cos(a), speed * math.sin(a)))
+        actor.r = r
+        actors.append(actor)
+    return actors, side
+
+
+def move(actors, rnd, motion, side, frame, base_radius):
+    if motion == 'static':
+        return
+    if motion == 'swarm':
+        a = frame * 0.05
+        target = eu.Vector2(side * (0.5 + 0.3 * math.cos(a)),
+                            side * (0.5 + 0.3 * math.sin(a)))
+    for actor in actors:
+        cshape = actor.cshape
+        x, y = cshape.center
+        if motion == 'jitter':
+            step = base_radius * 0.2
+            x += rnd.uniform(-step, step)
+            y += rnd.uniform(-step, step)
+        elif motion == 'drift':
+            x += actor.vel.x
+            y += actor.vel.y
+        elif motion == 'swarm':
+            dx = target.x - x
+            dy = target.y - y
+            d = math.sqrt(dx * dx + dy * dy) or 1.0
+            step = base_radius * 0.5
+            x += step * dx / d + rnd.uniform(-step, step)
+            y += step * dy / d + rnd.uniform(-step, step)
+        else:
+            raise ValueError("unknown motion: %s" % motion)
+        r = actor.r
+        if x < r or x > side - r:
+            actor.vel.x = -actor.vel.x
+            x = min(max(x, r), side - r)
+        if y < r or y > side - r:
+            actor.vel.y = -actor.vel.y
+            y = min(max(y, r), side - r)
+        cshape.center = eu.Vector2(x, y)
+
+
+def make_collman(cm, manager, side, base_radius, cell_ratio):
+    if manager == 'Grid':
+        cell = 2.0 * base_radius * cell_ratio
+        return cm.CollisionManagerGrid(0.0, side, 0.0, side, cell, cell)
+    return getattr(cm, 'CollisionManager' + manager)()
+
+
+def percentile(ordered, p):
+    """p-th percentile, linear interpolation between closest ranks"""
+    if not ordered:
+        return float('nan')
+    k = (len(ordered) - 1) * p / 100.0
+    lo = int(math.floor(k))
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(times):
+    ms = sorted(t * 1000.0 for t in times)
+    return {
+        'frames': len(ms),
+        'min_ms': ms[0],
+        'p50_ms': percentile(ms, 50),
+        'p90_ms': percentile(ms, 90),
+        'p99_ms': percentile(ms, 99),
+        'max_ms': ms[-1],
+        'mean_ms': sum(ms) / len(ms),
+        }
+
+
+def iter_cases(config):
+    for module_name in config['modules']:
+        for manager in config['managers']:
+            for count in config['counts']:
+                for size in config['sizes']:
+                    for density in config['densities']:
+                        for motion in config['motions']:
+                            for shapes in config['shapes']:
+                                yield {
+                                    'module': module_name,
+                                    'manager': manager,
+                                    'count': count,
+                                    'size': size,
+                                    'density': density,
+                                    'motion': motion,
+                                    'shapes': shapes,
+                                    }
+
+
+def missing_feature(cm, case):
+    """returns what the module lacks to run the case, None if nothing"""
+    needed = ['CollisionManager' + case['manager']]
+    needed.extend(shapes_classes[case['shapes']])
+    for name in needed:
+        if not hasattr(cm, name):
+            return 'no %s in %s' % (name, case['module'])
+    return None
+
+
+def run_case(cm, case, config, log=None):
+    """returns a list of result rows, one per query the manager supports"""
+    base_radius = config['base_radius']
+    # same world for all managers
+    rnd = random.Random(config['seed'])
+    actors, side = make_world(cm, rnd, case, base_radius)
+    collman = make_collman(cm, case['manager'], side, base_radius,
+                           config['cell_ratio'])
+    for actor in actors:
+        collman.add(actor)
+    params = {
+        'world_side': side,
+        'base_radius': base_radius,
+        'near_distance': base_radius * 2.0,
+        }
+    # the questions need the manager updated, so 'update' goes first
+    names = []
+    for name in sorted(config['queries'], key=lambda name: name != 'update'):
+        method = query_methods[name]
+        if method is None or hasattr(collman, method):
+            names.append(name)
+        elif log is not None:
+            log('skipped query %s for %s %s: no method %s' %
+                (name, case['module'], case['manager'], method))
+    times = dict((name, []) for name in names)
+    n_sample = min(config['queries_per_frame'], len(actors))
+    for frame in range(config['warmup'] + config['frames']):
+        move(actors, rnd, case['motion'], side, frame, base_radius)
+        if 'update' not in times:
+            update_collman(collman, actors)
+        sample = rnd.sample(actors, n_sample)
+        for name in names:
+            fn = queries[name]
+            query_rnd = random.Random(frame)
+            gc.disable()
+            start = timer()
+            fn(collman, actors, sample, query_rnd, params)
+            elapsed = timer() - start
+            gc.enable()
+            if frame >= config['warmup']:
+                times[name].append(elapsed)
+    rows = []
+    for name in names:
+        row = dict(case)
+        row['query'] = name
+        row['world_side'] = side
+        row.update(summarize(times[name]))
+        rows.append(row)
+    return rows
+
+
+def run_benchmark(config, log=None):
+    """
+    Runs all the cases described by config, returns a list of result rows.
+
+    Cases that can't run, by example the numpy manager without numpy or a
+    manager the module doesn't have, are skipped and reported to log; so
+    are the queries a manager doesn't support.
+    """
+    rows = []
+    modules = {}
+    for case in iter_cases(config):
+        if (case['manager'] == 'BruteForce' and
+                case['count'] > config['max_brute_force']):
+            continue
+        module_name = case['module']
+        if module_name not in modules:
+            modules[module_name] = importlib.import_module(module_name)
+        cm = modules[module_name]
+        missing = missing_feature(cm, case)
+        if missing is not None:
+            if log is not None:
+                log('skipped %s: %s' % (case, missing))
+            continue
+        try:
+            case_rows = run_case(cm, case, config, log)
+        except (ImportError, NotImplementedError) as e:
+            if log is not None:
+                log('skipped %s: %s' % (case, e))
+            continue
+        if log is not None:
+            for row in case_rows:
+                log('%(module)s %(manager)s n=%(count)s %(size)s '
+                    'density=%(density)s %(motion)s %(shapes)s %(query)s: '
+                    'p50 %(p50_ms).3f ms, p99 %(p99_ms).3f ms' % row)
+        rows.extend(case_rows)
+    return rows
+
+
+csv_fields = ['module', 'manager', 'count', 'size', 'density', 'motion',
+              'shapes', 'query', 'world_side', 'frames', 'min_ms', 'p50_ms',
+              'p90_ms', 'p99_ms', 'max_ms', 'mean_ms']
+
+
+def write_json(filename, config, rows):
+    doc = {
+        'name': 'collision managers benchmark',
+        'python': sys.version,
+        'platform': platform.platform(),
+        'config': config,
+        'results': rows,
+        }
+    with open(filename, 'w') as f:
+        json.dump(doc, f, indent=1, sort_keys=True)
+
+
+def write_csv(filename, rows):
+    if sys.version_info[0] < 3:
+        f = open(filename, 'wb')
+    else:
+        f = open(filename, 'w', newline='')
+    with f:
+        writer = csv.DictWriter(f, fieldnames=csv_fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+
+
+default_config = {
+    'modules': ['cocos.collision_model'],
+    'managers': manager_names,
+    'queries': query_names,
+    'counts': [250, 1000],
+    'sizes': ['uniform', 'mixed'],
+    'densities': [0.05, 0.25],
+    'motions': ['static', 'drift'],
+    'shapes': ['circle'],
+    'frames': 20,
+    'warmup': 2,
+    'queries_per_frame': 50,
+    'base_radius': 8.0,
+    'cell_ratio': 1.25,
+    'max_brute_force': 1000,
+    'seed': 123456,
+    }
+
+quick_config = dict(default_config, counts=[200], sizes=['mixed'],
+                    densities=[0.1], motions=['drift'], frames=5)
+
+
+def csv_list(convert, choices=None):
+    def parse(text):
+        values = [convert(v) for v in text.split(',') if v]
+        if choices is not None:
+            for v in values:
+                if v not in choices:
+                    raise argparse.ArgumentTypeError(
+                        "%s not in %s" % (v, ', '.join(choices)))
+        return values
+    return parse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n\n')[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true',
+                        help='small sweep, for a fast sanity check')
+    parser.add_argument('--modules', type=csv_list(str))
+    parser.add_argument('--managers', type=csv_list(str, manager_names))
+    parser.add_argument('--queries', type=csv_list(str, query_names))
+    parser.add_argument('--counts', type=csv_list(int))
+    parser.add_argument('--sizes', type=csv_list(str, size_names))
+    parser.add_argument('--densities', type=csv_list(float))
+    parser.add_argument('--motions', type=csv_list(str, motion_names))
+    parser.add_argument('--shapes', type=csv_list(str, shapes_names))
+    parser.add_argument('--frames', type=int)
+    parser.add_argument('--warmup', type=int)
+    parser.add_argument('--queries-per-frame', type=int,
+                        dest='queries_per_frame')
+    parser.add_argument('--max-brute-force', type=int,
+                        dest='max_brute_force',
+                        help='skip BruteForce for counts above this')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--json', help='write results as json to this file')
+    parser.add_argument('--csv', help='write results as csv to this file')
+    parser.add_argument('--silent', action='store_true')
+    args = parser.parse_args(argv)
+
+    config = dict(quick_config if args.quick else default_config)
+    for key in default_config:
+        value = getattr(args, key, None)
+        if value is not None:
+            config[key] = value
+    log = None if args.silent else print
+    rows = run_benchmark(config, log)
+    if args.json:
+        write_json(args.json, config, rows)
+    if args.csv:
+        write_csv(args.csv, rows)
+    return rows
+
+
+if __name__ == '__main__':
+    main()
@@ -10,10 +10,17 @@
     - edit the 'implementations' dict to match the names and the description
     - uncomment the desired comparison
     - run the script
+
+To compare the collision managers (BruteForce, Grid, Numpy) found in a
+single implementation use plot_collman_cases(<module name>), by example
+plot_collman_cases('cocos.collision_model')
+
+For a headless run over all managers and query types, with results saved
+as JSON / CSV, look at bench_collision_managers.py
 """
 from __future__ import division, print_function, unicode_literals
 
-import imp
+import importlib
 import pprint
 
 import a0_benchmark_time_per_frame as cmark 
@@ -87,6 +94,40 @@ def plot_implementation_cases_aa_rect(implementations):
     cmark.plot_benchmark_time_per_frame(ball_quantities, stats, title, fname, -10, 50)
     print('Done. Plot saved in file:', fname)
 
+# Collision Manager varies, cshape is CircleShape; comparing the managers
+# provided by one implementation of cocos.collision_model.
+collman_cases = {
+    'BruteForce': {
+        'collman_cls_name': 'CollisionManagerBruteForce',
+        'cshape_cls_names': ['CircleShape',],
+        'collman_gen_args': []
+        },
+    'Grid': {
+        'collman_cls_name': 'CollisionManagerGrid',
+        'cshape_cls_names': ['CircleShape',],
+        'collman_gen_args': [1.25] # desired (cell width) / (obj width) ratio
+        },
+    'Numpy': {
+        'collman_cls_name': 'CollisionManagerNumpy',
+        'cshape_cls_names': ['CircleShape',],
+        'collman_gen_args': []
+        },
+    }
+
+def plot_collman_cases(module_name):
+    title = 'bouncing balls model - time per frame\n comparing collision managers'
+    fname = 'comparing_collision_managers_%s.png' % module_name
+    print('\nWorking, it will take around five minutes to complete.')
+
+    ball_quantities = cmark.stats_params['ball_quantities']
+    cm = importlib.import_module(module_name)
+    __builtins__.collision_module = cm
+    stats = cmark.benchmark_time_per_frame(collman_cases,
+                                           cmark.base_demo_world_params,
+                                           cmark.stats_params)
+    cmark.plot_benchmark_time_per_frame(ball_quantities, stats, title, fname, -50, 150)
+    print('Done. Plot saved in file:', fname)
+
         
 if __name__ == "__main__":
 
@@ -96,6 +137,7 @@ def plot_implementation_cases_aa_rect(implementations):
         "collision_dan": "collision_dan"
         }
     try:
+        #plot_collman_cases('cocos.collision_model')
         #plot_implementation_cases_circle(implementations)
         plot_implementation_cases_aa_rect(implementations)
     except ImportError as e:
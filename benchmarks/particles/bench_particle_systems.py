@@ -0,0 +1,219 @@
+"""
+Headless benchmark for the particle systems in cocos.particle_systems
+
+Runs each particle system as a seeded cocos.particle.ParticleSimulation,
+no window or GL context needed, stepping with a fixed dt; the time per
+step is reported as percentiles and can be written as JSON. Because the
+simulations are seeded the final particles state can be saved with
+--save-snapshot and compared in a later run with --check-snapshot, by
+example before and after a change to the particle math.
+
+Typical use, from (checkout)/benchmarks/particles::
+
+    python bench_particle_systems.py --quick
+    python bench_particle_systems.py --systems Fireworks,Galaxy --frames 600
+    python bench_particle_systems.py --save-snapshot before.npz
+    python bench_particle_systems.py --check-snapshot before.npz
+
+Each row of results is one (system, storage) combination, storage being
+'sparse' (the default storage) or 'compact' (compact_storage=True), with
+the time per step in milliseconds summarized as min, p50, p90, p99, max
+and mean over the frames.
+"""
+from __future__ import division, print_function, unicode_literals
+
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+# running without installing cocos
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+import pyglet
+# no window is needed, and on a box without display it can't be created
+pyglet.options['shadow_window'] = False
+
+import numpy
+
+import cocos.particle_systems
+from cocos.particle import simulation_of
+
+timer = getattr(time, 'perf_counter', time.time)
+
+system_names = list(cocos.particle_systems.__all__)
+storage_names = ['sparse', 'compact']
+
+
+def percentile(ordered, p):
+    """p-th percentile, linear interpolation between closest ranks"""
+    if not ordered:
+        return float('nan')
+    k = (len(ordered) - 1) * p / 100.0
+    lo = int(math.floor(k))
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(times):
+    ms = sorted(t * 1000.0 for t in times)
+    return {
+        'frames': len(ms),
+        'min_ms': ms[0],
+        'p50_ms': percentile(ms, 50),
+        'p90_ms': percentile(ms, 90),
+        'p99_ms': percentile(ms, 99),
+        'max_ms': ms[-1],
+        'mean_ms': sum(ms) / len(ms),
+        }
+
+
+def run_case(name, storage, config):
+    simulation = simulation_of(getattr(cocos.particle_systems, name),
+                               seed=config['seed'])
+    simulation.compact_storage = (storage == 'compact')
+    dt = config['dt']
+    simulation.simulate(config['warmup'], dt)
+    times = []
+    live = 0
+    for frame in range(config['frames']):
+        t0 = timer()
+        simulation.step(dt)
+        times.append(timer() - t0)
+        # particle_count is only exact after a step with compact storage
+        live += numpy.count_nonzero(simulation.particle_life >= 0)
+    row = {'system': name, 'storage': storage,
+           'capacity': simulation.total_particles,
+           'mean_live': live / config['frames']}
+    row.update(summarize(times))
+    return row, simulation
+
+
+def snapshot_key(name, storage, array_name):
+    return '%s.%s.%s' % (name, storage, array_name)
+
+
+def sorted_rows(state):
+    # compact storage reorders the particles, compare them sorted
+    rows = numpy.hstack([state[name].reshape(len(state[name]), -1)
+                         for name in sorted(state)])
+    return rows[numpy.lexsort(rows.T[::-1])]
+
+
+def run_benchmark(config, log=None):
+    rows = []
+    snapshots = {}
+    for name in config['systems']:
+        for storage in config['storages']:
+            row, simulation = run_case(name, storage, config)
+            rows.append(row)
+            for array_name, values in simulation.snapshot().items():
+                snapshots[snapshot_key(name, storage, array_name)] = values
+            if log:
+                log("{system:10} {storage:8} live {mean_live:7.1f} / "
+                    "{capacity:5}  p50 {p50_ms:7.3f} ms  p90 {p90_ms:7.3f} ms  "
+                    "max {max_ms:7.3f} ms".format(**row))
+    return rows, snapshots
+
+
+def check_snapshots(expected, got, log=None):
+    """Returns the names of the (system, storage) cases that differ"""
+    cases = set(key.rsplit('.', 1)[0] for key in got)
+    differ = []
+    for case in sorted(cases):
+        names = [key for key in got if key.startswith(case + '.')]
+        if any(key not in expected for key in names):
+            continue
+        state = dict((key, got[key]) for key in names)
+        reference = dict((key, expected[key]) for key in names)
+        a = sorted_rows(state)
+        b = sorted_rows(reference)
+        if a.shape != b.shape or not numpy.allclose(a, b, rtol=1e-5, atol=1e-4):
+            differ.append(case)
+    if log:
+        log("snapshot check: %d cases, %d differ %s" %
+            (len(cases), len(differ), ' '.join(differ)))
+    return differ
+
+
+def write_json(filename, config, rows):
+    doc = {
+        'name': 'particle systems benchmark',
+        'python': sys.version,
+        'numpy': numpy.__version__,
+        'platform': platform.platform(),
+        'config': config,
+        'results': rows,
+        }
+    with open(filename, 'w') as f:
+        json.dump(doc, f, indent=1, sort_keys=True)
+
+
+default_config = {
+    'systems': system_names,
+    'storages': storage_names,
+    'frames': 300,
+    'warmup': 120,
+    'dt': 1.0 / 60,
+    'seed': 123456,
+    }
+
+quick_config = dict(default_config, frames=30, warmup=30)
+
+
+def csv_list(convert, choices=None):
+    def parse(text):
+        values = [convert(v) for v in text.split(',') if v]
+        if choices is not None:
+            for v in values:
+                if v not in choices:
+                    raise argparse.ArgumentTypeError(
+                        "%s not in %s" % (v, ', '.join(choices)))
+        return values
+    return parse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n\n')[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true',
+                        help='few frames, for a fast sanity check')
+    parser.add_argument('--systems', type=csv_list(str, system_names))
+    parser.add_argument('--storages', type=csv_list(str, storage_names))
+    parser.add_argument('--frames', type=int)
+    parser.add_argument('--warmup', type=int,
+                        help='frames simulated before timing')
+    parser.add_argument('--dt', type=float)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--json', help='write results as json to this file')
+    parser.add_argument('--save-snapshot', dest='save_snapshot',
+                        help='save the final particles state to this .npz file')
+    parser.add_argument('--check-snapshot', dest='check_snapshot',
+                        help='compare the final particles state with this .npz file')
+    parser.add_argument('--silent', action='store_true')
+    args = parser.parse_args(argv)
+
+    config = dict(quick_config if args.quick else default_config)
+    for key in default_config:
+        value = getattr(args, key, None)
+        if value is not None:
+            config[key] = value
+    log = None if args.silent else print
+    rows, snapshots = run_benchmark(config, log)
+    if args.json:
+        write_json(args.json, config, rows)
+    if args.save_snapshot:
+        numpy.savez_compressed(args.save_snapshot, **snapshots)
+    if args.check_snapshot:
+        expected = numpy.load(args.check_snapshot)
+        if check_snapshots(expected, snapshots, log):
+            sys.exit(1)
+    return rows
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# ----------------------------------------------------------------------------
+# cocos2d
+# Copyright (c) 2008-2012 Daniel Moisset, Ricardo Quesada, Rayentray Tappa,
+# Lucio Torre
+# Copyright (c) 2009-2023  Richard Jones, Claudio Canepa
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#   * Neither the name of cocos2d nor the names of its
+#     contributors may be used to endorse or promote products
+#     derived from this software without specific prior written
+#     permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Steps the actions of all the nodes from a single clock callback.
+
+Nodes with actions to run register in the :class:`ActionManager` at
+``director.action_manager`` instead of scheduling their own callback in the
+pyglet clock, so the clock carries one entry no matter how many nodes are
+animated, and nodes starting or finishing actions only add or remove an
+entry in the manager.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+__docformat__ = 'restructuredtext'
+
+import pyglet
+
+__all__ = ['ActionManager']
+
+
+class ActionManager(object):
+    """Pumps the actions of the registered nodes once per clock tick.
+
+    Nodes are stepped in registration order by calling their ``_step``, so
+    each node keeps its own semantics for actions removal, ``skip_frame``,
+    :meth:`~cocos.cocosnode.CocosNode.pause` and
+    :meth:`~cocos.cocosnode.CocosNode.resume`.
+
+    The manager is in the pyglet clock only while some node is registered.
+    """
+    def __init__(self):
+        # registered nodes; a dict used as an insertion ordered set
+        self.nodes = {}
+        #: True while the manager is scheduled in the pyglet clock
+        self.scheduled = False
+
+    def add(self, node):
+        """Registers a node, its actions will be stepped each tick.
+
+        Arguments:
+            node (CocosNode): the node; adding it again is a no-op.
+        """
+        self.nodes[node] = None
+        if not self.scheduled:
+            self.scheduled = True
+            pyglet.clock.schedule(self.step)
+
+    def remove(self, node):
+        """Unregisters a node; no error if it was not registered.
+
+        Arguments:
+            node (CocosNode): the node.
+        """
+        self.nodes.pop(node, None)
+
+    def __contains__(self, node):
+        return node in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def step(self, dt):
+        """Steps the actions of the registered nodes.
+
+        Nodes registered while stepping start at the next tick, nodes
+        unregistered while stepping are not stepped anymore.
+
+        Arguments:
+            dt (float): time in seconds since the last tick.
+        """
+        nodes = self.nodes
+        for node in list(nodes):
+            if node in nodes:
+                node._step(dt)
+        if not nodes:
+            self.scheduled = False
+            pyglet.clock.unschedule(self.step)
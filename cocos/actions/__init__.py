@@ -44,3 +44,4 @@
 from .grid3d_actions import *
 from .camera_actions import *
 from .move_actions import *
+from .group_actions import *
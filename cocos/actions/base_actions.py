@@ -325,9 +325,29 @@ def __deepcopy__(self):
       (see test_action_non_interval.py for an example)
 
 
-Future:
-Next cocos version probably will provide an easier mechanism to designate some
-parameters as references.
+    - list the member names in the class attribute shared_members; the
+      template and all its workers will share the same object::
+
+        class Orbit(ac.IntervalAction):
+            shared_members = ('center_node',)
+
+            def init(self, center_node, duration):
+                self.center_node = center_node
+                self.duration = duration
+
+Worker instantiation cost
+-------------------------
+
+Each do call copies the template, and the Loop and Repeat operators copy
+their inner action on each repetition, so the copy speed matters when many
+nodes run the same script.
+Action.__deepcopy__ takes a fast path: members with immutable values (numbers,
+strings, None and tuples of those) and the members named in shared_members
+are shared with the template, euclid vectors and points are copied directly,
+inner actions are copied with their own fast path and anything else goes
+through copy.deepcopy.
+Subclasses that keep state out of the instance __dict__, by example in
+__slots__, must override __deepcopy__.
 
 
 Overview main subclasses
@@ -402,14 +422,31 @@ def __deepcopy__(self):
 
 import copy
 
+import six
+
+from cocos.euclid import Vector2, Vector3, Point2, Point3
+
 __all__ = ['Action',                               # Base Class
            'IntervalAction', 'InstantAction',      # Important Subclasses
            'sequence', 'spawn', 'loop', 'Repeat',  # Generic Operators
            'Reverse', '_ReverseTime', ]            # Reverse
 
 
+#: types whose values can be shared between a template and its workers
+_atomic_types = frozenset((type(None), bool, float, complex, six.text_type,
+                           six.binary_type, type, type(len)) + six.integer_types)
+
+#: euclid types which only hold numbers, copied with their __copy__
+_vector_types = frozenset([Vector2, Vector3, Point2, Point3])
+
+
 class Action(object):
     """The most general action"""
+
+    #: names of members that are shared, not copied, between a template and
+    #: its workers; use it for references to nodes, callbacks or big tables
+    shared_members = ()
+
     def __init__(self, *args, **kwargs):
         """dont override - use init"""
         self.duration = None  # The base action has potentially infinite duration
@@ -419,6 +456,32 @@ def __init__(self, *args, **kwargs):
         self._done = False
         self.scheduled_to_remove = False  # exclusive use by cocosnode.remove_action
 
+    def __deepcopy__(self, memo):
+        """Fast copy of a template, see 'Worker instantiation cost'"""
+        cls = self.__class__
+        new = cls.__new__(cls)
+        memo[id(self)] = new
+        shared = cls.shared_members
+        atomic = _atomic_types
+        state = new.__dict__
+        for name, value in self.__dict__.items():
+            kind = type(value)
+            if kind in atomic or name in shared:
+                state[name] = value
+            elif kind in _vector_types:
+                state[name] = value.__copy__()
+            elif kind is tuple and all(type(v) in atomic for v in value):
+                state[name] = value
+            elif isinstance(value, Action):
+                copied = memo.get(id(value))
+                if copied is None:
+                    copied = value.__deepcopy__(memo)
+                    memo[id(value)] = copied
+                state[name] = copied
+            else:
+                state[name] = copy.deepcopy(value, memo)
+        return new
+
     def init(*args, **kwargs):
         """
         Gets called by __init__ with all the parameters received,
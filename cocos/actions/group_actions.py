@@ -0,0 +1,289 @@
+# ----------------------------------------------------------------------------
+# cocos2d
+# Copyright (c) 2008-2012 Daniel Moisset, Ricardo Quesada, Rayentray Tappa,
+# Lucio Torre
+# Copyright (c) 2009-2023  Richard Jones, Claudio Canepa
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#   * Neither the name of cocos2d nor the names of its
+#     contributors may be used to endorse or promote products
+#     derived from this software without specific prior written
+#     permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ----------------------------------------------------------------------------
+"""Group actions: interval actions over many nodes at once
+
+Group Actions
+=============
+
+An usual interval action changes one target, calling its update once per
+frame; a thousand sprites moving with MoveBy means a thousand update calls,
+each one doing its math with euclid objects.
+
+A group action interpolates one attribute for all the nodes in a `NodeGroup`
+with numpy arrays holding the start and end values, and writes back the
+results in bulk with `NodeGroup.set_values`, so each frame costs one array
+operation plus the writes.
+
+The group action is run as any other action by some node, usually the
+layer that holds the group nodes; that node is the action target but it is
+not modified::
+
+    sprites = [Sprite('ball.png', position=p) for p in positions]
+    for sprite in sprites:
+        batch.add(sprite)
+    layer.do(GroupMoveBy(sprites, (200, 0), 2) + GroupFadeTo(sprites, 0, 1))
+
+The end values can be one value for all the nodes or a sequence with a value
+per node::
+
+    layer.do(GroupMoveTo(sprites, [(10 * i, 100) for i in range(len(sprites))], 3))
+
+The time alter actions `Accelerate`, `AccelDeccel` and `Speed`, and the
+`Reverse` of `GroupMoveBy` and `GroupRotateBy`, work as with the single node
+actions.
+
+The group nodes are shared, not copied, between the template and the workers.
+
+Available group actions
+=======================
+
+  * `GroupMoveTo`
+  * `GroupMoveBy`
+  * `GroupRotateBy`
+  * `GroupScaleTo`
+  * `GroupFadeTo`
+
+Custom destinations for the values, by example a vertex buffer owned by a
+batching node, can be served by a `NodeGroup` subclass overriding
+`NodeGroup.set_values`.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+__docformat__ = 'restructuredtext'
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .base_actions import IntervalAction
+
+__all__ = ['NodeGroup',                             # nodes and bulk access
+           'GroupIntervalAction',                   # base class
+           'GroupMoveTo', 'GroupMoveBy',            # movement
+           'GroupRotateBy',                         # rotation
+           'GroupScaleTo',                          # scale
+           'GroupFadeTo', ]                         # opacity
+
+
+class NodeGroup(object):
+    """A fixed sequence of nodes animated together by group actions
+
+    Values for an attribute are read and written as numpy arrays with
+    shape (len(nodes), columns), by example columns is 2 for position.
+    """
+    def __init__(self, nodes):
+        """Init method.
+
+        :Parameters:
+            `nodes` : iterable
+                The nodes in the group, usually `CocosNode` instances
+        """
+        if numpy is None:
+            raise ImportError("group actions need numpy")
+        self.nodes = list(nodes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def get_values(self, attrib, columns):
+        """Returns a new float array with the attrib values of the nodes"""
+        values = numpy.array([getattr(node, attrib) for node in self.nodes],
+                             dtype=float)
+        return values.reshape(len(self.nodes), columns)
+
+    def set_values(self, attrib, values):
+        """Sets the attrib in each node to the matching row of values
+
+        Override to send the values elsewhere; the array is owned by the
+        action and will be overwritten in the next update.
+        """
+        if values.shape[1] == 1:
+            rows = values[:, 0].tolist()
+        else:
+            rows = [tuple(row) for row in values.tolist()]
+        for node, value in zip(self.nodes, rows):
+            setattr(node, attrib, value)
+
+
+def _per_node(value, count, columns):
+    """value broadcasted to a (count, columns) float array
+
+    Raises ValueError if value is not one value or a value per node.
+    """
+    try:
+        rows = numpy.asarray(value, dtype=float).reshape(-1, columns)
+    except ValueError:
+        raise ValueError("end values must have %d number(s) each, got %r" %
+                         (columns, value))
+    if len(rows) not in (1, count):
+        raise ValueError("got %d end values for %d nodes, expected one value "
+                         "or one per node" % (len(rows), count))
+    values = numpy.empty((count, columns))
+    values[:] = rows
+    return values
+
+
+class GroupIntervalAction(IntervalAction):
+    """Base class for the group actions
+
+    Subclasses set the class members attrib and columns, and implement
+    set_range to fill start_values and delta; the value at time t is
+    start_values + delta * t .
+    """
+    #: nodes attribute changed by the action
+    attrib = None
+    #: number of floats in the attribute value
+    columns = 1
+
+    shared_members = ('nodes',)
+
+    def init(self, nodes, end, duration):
+        """Init method.
+
+        :Parameters:
+            `nodes` : `NodeGroup` or iterable
+                The nodes to change
+            `end` : value or sequence of values
+                One value for all the nodes or a value per node
+            `duration` : float
+                Duration time in seconds
+        """
+        if not isinstance(nodes, NodeGroup):
+            nodes = NodeGroup(nodes)
+        # fail early on end values not matching the nodes
+        _per_node(end, len(nodes), self.columns)
+        self.nodes = nodes
+        self.end = end
+        self.duration = duration
+
+    def start(self):
+        self.start_values = self.nodes.get_values(self.attrib, self.columns)
+        self.delta = _per_node(self.end, len(self.nodes), self.columns)
+        self.set_range()
+        self.values = numpy.empty_like(self.start_values)
+
+    def set_range(self):
+        """Turns self.delta, initially the per node end parameter, into
+        end - start"""
+        self.delta -= self.start_values
+
+    def update(self, t):
+        values = self.values
+        numpy.multiply(self.delta, t, out=values)
+        values += self.start_values
+        self.nodes.set_values(self.attrib, values)
+
+
+class GroupMoveTo(GroupIntervalAction):
+    """Moves the nodes to a position, same for all or one per node
+
+    Example::
+
+        action = GroupMoveTo(sprites, (320, 240), 2)
+        layer.do(action)
+    """
+    attrib = 'position'
+    columns = 2
+
+
+class GroupMoveBy(GroupMoveTo):
+    """Moves the nodes by a delta, same for all or one per node
+
+    Example::
+
+        # each sprite moves 50 pixels to the left in 8 seconds
+        action = GroupMoveBy(sprites, (-50, 0), 8)
+        layer.do(action)
+    """
+    def set_range(self):
+        pass
+
+    def __reversed__(self):
+        return GroupMoveBy(self.nodes, -numpy.asarray(self.end, dtype=float),
+                           self.duration)
+
+
+class GroupRotateBy(GroupIntervalAction):
+    """Rotates the nodes clockwise a number of degrees, same for all or one
+    per node
+
+    Example::
+
+        action = GroupRotateBy(sprites, 180, 2)
+        layer.do(action)
+    """
+    attrib = 'rotation'
+
+    def set_range(self):
+        pass
+
+    def update(self, t):
+        values = self.values
+        numpy.multiply(self.delta, t, out=values)
+        values += self.start_values
+        numpy.remainder(values, 360.0, out=values)
+        self.nodes.set_values(self.attrib, values)
+
+    def __reversed__(self):
+        return GroupRotateBy(self.nodes, -numpy.asarray(self.end, dtype=float),
+                             self.duration)
+
+
+class GroupScaleTo(GroupIntervalAction):
+    """Scales the nodes to a zoom factor, same for all or one per node
+
+    Example::
+
+        action = GroupScaleTo(sprites, 2.0, 1)
+        layer.do(action)
+    """
+    attrib = 'scale'
+
+
+class GroupFadeTo(GroupIntervalAction):
+    """Fades the nodes to an opacity in the range 0-255, same for all or one
+    per node
+
+    Example::
+
+        action = GroupFadeTo(sprites, 0, 2)
+        layer.do(action)
+    """
+    attrib = 'opacity'
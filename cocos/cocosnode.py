@@ -48,6 +48,11 @@
 import pyglet
 from pyglet import gl
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from cocos.director import director
 from cocos.camera import Camera
 from cocos import euclid
@@ -55,6 +60,21 @@
 __all__ = ['CocosNode']
 
 
+class _LazyMember(object):
+    """Class attribute that creates the member value at the first read in
+    each instance; the value is stored in the instance, so later reads and
+    writes are plain attribute accesses"""
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.name] = self.factory()
+        return value
+
+
 class CocosNode(object):
     """
     Cocosnode is the main element. Anything that gets drawn or contains things
@@ -78,102 +98,113 @@ class CocosNode(object):
         - create callbacks to handle the advancement of time
         - overriding :meth:`draw` to render the node
     """
+    # The members below are class level defaults: a node stores only the
+    # values that differ, and the mutable members are created at the first
+    # read, so leaf nodes that never use a camera, grid, actions or
+    # schedules don't pay for them.
+
+    # composition stuff
+
+    #: list of (int, child-reference) where int is the z-order, sorted by ascending z (back to front order)
+    children = _LazyMember('children', list)
+
+    #: dictionary that maps children names with children references
+    children_names = _LazyMember('children_names', dict)
+
+    _parent = None
+
+    # drawing stuff
+
+    #: x-position of the object relative to its parent's children_anchor_x value.
+    #: Default: 0
+    _x = 0
+
+    #: y-position of the object relative to its parent's children_anchor_y value.
+    #: Default: 0
+    _y = 0
+
+    #: a float, alters the scale of this node and its children.
+    #: Default: 1.0
+    _scale = 1.0
+
+    #: a float, alters the horizontal scale of this node and its children.
+    #: total scale along x axis is _scale_x * _scale
+    #: Default: 1.0
+    _scale_x = 1.0
+
+    #: a float, alters the vertical scale of this node and its children.
+    #: total scale along y axis is _scale_y * _scale
+    #: Default: 1.0
+    _scale_y = 1.0
+
+    #: a float, in degrees, alters the rotation of this node and its children.
+    #: Default: 0.0
+    _rotation = 0.0
+
+    #: eye, center and up vector for the :class:`.Camera`.
+    #: gluLookAt() is used with these values.
+    #: Default: FOV 60, center of the screen.
+    #:
+    #: .. NOTE::
+    #:      The camera can perform exactly the same
+    #:      transformation as ``scale``, ``rotation`` and the
+    #:      ``x``, ``y`` attributes (with the exception that the
+    #:      camera can modify also the z-coordinate)
+    #:      In fact, they all transform the same matrix, so
+    #:      use either the camera or the other attributes, but not both
+    #:      since the camera will be overridden by the transformations done
+    #:      by the other attributes.
+    #:
+    #: You can change the camera manually or by using the 
+    #: :class:`.Camera3DAction` action.
+    camera = _LazyMember('camera', Camera)
+
+    _transform_anchor_x = 0
+    _transform_anchor_y = 0
+
+    #: the grid object for the grid actions.
+    #: This can be a `Grid3D` or a `TiledGrid3D` object depending
+    #: on the action.
+    grid = None
+
+    # actions stuff
+    #: list of `Action` objects that are running
+    actions = _LazyMember('actions', list)
+
+    #: list of `Action` objects to be removed
+    to_remove = _LazyMember('to_remove', list)
+
+    #: whether or not the next frame will be skipped
+    skip_frame = False
+
+    # schedule stuff
+    scheduled = False          # deprecated, soon to be removed
+    scheduled_calls = _LazyMember('scheduled_calls', list)  #: list of scheduled callbacks
+    #: list of scheduled interval callbacks
+    scheduled_interval_calls = _LazyMember('scheduled_interval_calls', list)
+    is_running = False         #: whether of not the object is running
+
+    # matrix stuff
+    is_transform_dirty = False
+    transform_matrix = _LazyMember('transform_matrix', euclid.Matrix3)
+    is_inverse_transform_dirty = False
+    inverse_transform_matrix = _LazyMember('inverse_transform_matrix', euclid.Matrix3)
+    # world matrices, None when they must be recalculated; a node caches
+    # one only if its parent has it cached, so when a node has one of them
+    # None all its descendants have it None too
+    _world_transform = None
+    _world_inverse = None
+    # True after the node is removed from its parent: it keeps the parent
+    # reference but the parent changes don't reach it, so it doesn't cache
+    _detached = False
+
     def __init__(self):
-        # composition stuff
-
-        #: list of (int, child-reference) where int is the z-order, sorted by ascending z (back to front order)
-        self.children = []
-
-        #: dictionary that maps children names with children references
-        self.children_names = {}
-
-        self._parent = None
-
-        # drawing stuff
-
-        #: x-position of the object relative to its parent's children_anchor_x value.
-        #: Default: 0
-        self._x = 0
-
-        #: y-position of the object relative to its parent's children_anchor_y value.
-        #: Default: 0
-        self._y = 0
-
-        #: a float, alters the scale of this node and its children.
-        #: Default: 1.0
-        self._scale = 1.0
-
-        #: a float, alters the horizontal scale of this node and its children.
-        #: total scale along x axis is _scale_x * _scale
-        #: Default: 1.0
-        self._scale_x = 1.0
-
-        #: a float, alters the vertical scale of this node and its children.
-        #: total scale along y axis is _scale_y * _scale
-        #: Default: 1.0
-        self._scale_y = 1.0
-
-        #: a float, in degrees, alters the rotation of this node and its children.
-        #: Default: 0.0
-        self._rotation = 0.0
-
-        #: eye, center and up vector for the :class:`.Camera`.
-        #: gluLookAt() is used with these values.
-        #: Default: FOV 60, center of the screen.
-        #:
-        #: .. NOTE::
-        #:      The camera can perform exactly the same
-        #:      transformation as ``scale``, ``rotation`` and the
-        #:      ``x``, ``y`` attributes (with the exception that the
-        #:      camera can modify also the z-coordinate)
-        #:      In fact, they all transform the same matrix, so
-        #:      use either the camera or the other attributes, but not both
-        #:      since the camera will be overridden by the transformations done
-        #:      by the other attributes.
-        #:
-        #: You can change the camera manually or by using the 
-        #: :class:`.Camera3DAction` action.
-        self.camera = Camera()
-
-        #: offset from (x,0) from where rotation and scale will be applied.
-        #: Default: 0
-        self.transform_anchor_x = 0
-
-        #: offset from (0,y) from where rotation and scale will be applied.
-        #: Default: 0
-        self.transform_anchor_y = 0
+        # an instance member, pyglet sprites implement it as a property
 
         #: whether of not the object and his childrens are visible.
         #: Default: True
         self.visible = True
 
-        #: the grid object for the grid actions.
-        #: This can be a `Grid3D` or a `TiledGrid3D` object depending
-        #: on the action.
-        self.grid = None
-
-        # actions stuff
-        #: list of `Action` objects that are running
-        self.actions = []
-
-        #: list of `Action` objects to be removed
-        self.to_remove = []
-
-        #: whether or not the next frame will be skipped
-        self.skip_frame = False
-
-        # schedule stuff
-        self.scheduled = False          # deprecated, soon to be removed
-        self.scheduled_calls = []       #: list of scheduled callbacks
-        self.scheduled_interval_calls = []  #: list of scheduled interval callbacks
-        self.is_running = False         #: whether of not the object is running
-
-        # matrix stuff
-        self.is_transform_dirty = False
-        self.transform_matrix = euclid.Matrix3().identity()
-        self.is_inverse_transform_dirty = False
-        self.inverse_transform_matrix = euclid.Matrix3().identity()
-
     def make_property(attr):
         types = {'anchor_x': "int", 'anchor_y': "int", "anchor": "(int, int)"}
 
@@ -309,13 +340,15 @@ def unschedule(self, callback):
             callback (a function):
                 The function to remove from the schedule.
         """
-
-        self.scheduled_calls = [
-            c for c in self.scheduled_calls if c[0] != callback
-            ]
-        self.scheduled_interval_calls = [
-            c for c in self.scheduled_interval_calls if c[0] != callback
-            ]
+        members = self.__dict__
+        if 'scheduled_calls' in members:
+            self.scheduled_calls = [
+                c for c in self.scheduled_calls if c[0] != callback
+                ]
+        if 'scheduled_interval_calls' in members:
+            self.scheduled_interval_calls = [
+                c for c in self.scheduled_interval_calls if c[0] != callback
+                ]
 
         if self.is_running:
             pyglet.clock.unschedule(callback)
@@ -325,9 +358,10 @@ def resume_scheduler(self):
         Time will continue/start passing for this node and callbacks
         will be called, worker actions will be called.
         """
-        for c, i, a, k in self.scheduled_interval_calls:
+        members = self.__dict__
+        for c, i, a, k in members.get('scheduled_interval_calls', ()):
             pyglet.clock.schedule_interval(c, i, *a, **k)
-        for c, a, k in self.scheduled_calls:
+        for c, a, k in members.get('scheduled_calls', ()):
             pyglet.clock.schedule(c, *a, **k)
 
     def pause_scheduler(self):
@@ -335,6 +369,10 @@ def pause_scheduler(self):
         Time will stop for this node: scheduled callbacks will
         not be called, worker actions will not be called.
         """
+        members = self.__dict__
+        if ('scheduled_calls' not in members and
+                'scheduled_interval_calls' not in members):
+            return
         for f in set(
                 [x[0] for x in self.scheduled_interval_calls] +
                 [x[0] for x in self.scheduled_calls]
@@ -354,6 +392,8 @@ def _set_parent(self, parent):
             self._parent = None
         else:
             self._parent = weakref.ref(parent)
+        self._detached = False
+        self._invalidate_world()
 
     parent = property(_get_parent, _set_parent, doc='''The parent of this object.
 
@@ -383,8 +423,7 @@ def _get_x(self):
 
     def _set_x(self, x):
         self._x = x
-        self.is_transform_dirty = True
-        self.is_inverse_transform_dirty = True
+        self._set_transform_dirty()
     x = property(_get_x, lambda self, x: self._set_x(x), doc="The x coordinate of the CocosNode")
 
     def _get_y(self):
@@ -392,8 +431,7 @@ def _get_y(self):
 
     def _set_y(self, y):
         self._y = y
-        self.is_transform_dirty = True
-        self.is_inverse_transform_dirty = True
+        self._set_transform_dirty()
     y = property(_get_y, lambda self, y: self._set_y(y), doc="The y coordinate of the CocosNode")
 
     def _get_position(self):
@@ -401,8 +439,7 @@ def _get_position(self):
 
     def _set_position(self, pos):
         self._x, self._y = pos
-        self.is_transform_dirty = True
-        self.is_inverse_transform_dirty = True
+        self._set_transform_dirty()
 
     position = property(_get_position, lambda self, p: self._set_position(p),
                         doc='''The (x, y) coordinates of the object.
@@ -415,8 +452,7 @@ def _get_scale(self):
 
     def _set_scale(self, s):
         self._scale = s
-        self.is_transform_dirty = True
-        self.is_inverse_transform_dirty = True
+        self._set_transform_dirty()
 
     scale = property(_get_scale, lambda self, scale: self._set_scale(scale),
                      doc='''The scaling factor of the object.
@@ -429,8 +465,7 @@ def _get_scale_x(self):
 
     def _set_scale_x(self, s):
         self._scale_x = s
-        self.is_transform_dirty = True
-        self.is_inverse_transform_dirty = True
+        self._set_transform_dirty()
 
     scale_x = property(_get_scale_x, lambda self, scale: self._set_scale_x(scale),
                        doc='''The scale x of this object.
@@ -443,8 +478,7 @@ def _get_scale_y(self):
 
     def _set_scale_y(self, s):
         self._scale_y = s
-        self.is_transform_dirty = True
-        self.is_inverse_transform_dirty = True
+        self._set_transform_dirty()
 
     scale_y = property(_get_scale_y, lambda self, scale: self._set_scale_y(scale),
                        doc='''The scale y of this object.
@@ -457,8 +491,7 @@ def _get_rotation(self):
 
     def _set_rotation(self, a):
         self._rotation = a
-        self.is_transform_dirty = True
-        self.is_inverse_transform_dirty = True
+        self._set_transform_dirty()
 
     rotation = property(_get_rotation, lambda self, angle: self._set_rotation(angle),
                         doc='''The rotation of this object in degrees.
@@ -467,6 +500,53 @@ def _set_rotation(self, a):
     :type: float
     ''')
 
+    def _get_transform_anchor_x(self):
+        return self._transform_anchor_x
+
+    def _set_transform_anchor_x(self, value):
+        self._transform_anchor_x = value
+        self._set_transform_dirty()
+
+    transform_anchor_x = property(_get_transform_anchor_x,
+                                  lambda self, value: self._set_transform_anchor_x(value),
+                                  doc='''Offset from (x,0) from where rotation and scale will be applied.
+    Defaults to 0.
+
+    :type: int
+    ''')
+
+    def _get_transform_anchor_y(self):
+        return self._transform_anchor_y
+
+    def _set_transform_anchor_y(self, value):
+        self._transform_anchor_y = value
+        self._set_transform_dirty()
+
+    transform_anchor_y = property(_get_transform_anchor_y,
+                                  lambda self, value: self._set_transform_anchor_y(value),
+                                  doc='''Offset from (0,y) from where rotation and scale will be applied.
+    Defaults to 0.
+
+    :type: int
+    ''')
+
+    def _set_transform_dirty(self):
+        # the local transform changed, and with it the world transform of
+        # the node and its descendants
+        self.is_transform_dirty = True
+        self.is_inverse_transform_dirty = True
+        if self._world_transform is not None or self._world_inverse is not None:
+            self._invalidate_world()
+
+    def _invalidate_world(self):
+        if self._world_transform is None and self._world_inverse is None:
+            # and so are the descendants
+            return
+        self._world_transform = None
+        self._world_inverse = None
+        for z, c in self.__dict__.get('children', ()):
+            c._invalidate_world()
+
     def add(self, child, z=0, name=None):
         """Adds a child and if it becomes part of the active scene, it calls
         its :meth:`on_enter` method.
@@ -533,7 +613,7 @@ def remove(self, obj):
                 Name of the reference to be removed or object to be removed.
         """
         if isinstance(obj, string_types):
-            if obj in self.children_names:
+            if obj in self.__dict__.get('children_names', ()):
                 child = self.children_names.pop(obj)
                 self._remove(child)
             else:
@@ -548,6 +628,11 @@ def _remove(self, child):
         if l_old == len(self.children):
             raise Exception("Child not found: %s" % str(child))
 
+        # the child keeps the parent reference, but changes in the parent
+        # will not reach it anymore
+        child._detached = True
+        child._invalidate_world()
+
         if self.is_running:
             child.on_exit()
 
@@ -558,7 +643,7 @@ def get_children(self):
             list[CocosNode]: children of this node, ordered back to front.
 
         """
-        return [c for (z, c) in self.children]
+        return [c for (z, c) in self.__dict__.get('children', ())]
 
     def __contains__(self, child):
         return child in self.get_children()
@@ -579,7 +664,7 @@ def get(self, name):
             than by name will prevent the name to be recycled: attempting to add 
             another node with this name will produce an Exception.
         """
-        if name in self.children_names:
+        if name in self.__dict__.get('children_names', ()):
             return self.children_names[name]
         else:
             raise Exception("Child not found: %s" % name)
@@ -643,7 +728,8 @@ def transform(self):
         """
         x, y = director.get_window_size()
 
-        if not(self.grid and self.grid.active):
+        # a camera never used would not locate, don't create it
+        if not(self.grid and self.grid.active) and 'camera' in self.__dict__:
             # only apply the camera if the grid is not active
             # otherwise, the camera will be applied inside the grid
             self.camera.locate()
@@ -713,16 +799,17 @@ def visit(self):
             return
 
         position = 0
+        children = self.__dict__.get('children', ())
 
         if self.grid and self.grid.active:
             self.grid.before_draw()
 
         # we visit all nodes that should be drawn before ourselves
 
-        if self.children and self.children[0][0] < 0:
+        if children and children[0][0] < 0:
             gl.glPushMatrix()
             self.transform()
-            for z, c in self.children:
+            for z, c in children:
                 if z >= 0:
                     break
                 position += 1
@@ -734,10 +821,10 @@ def visit(self):
         self.draw()
 
         # we visit all the remaining nodes, that are over ourselves
-        if position < len(self.children):
+        if position < len(children):
             gl.glPushMatrix()
             self.transform()
-            for z, c in self.children[position:]:
+            for z, c in children[position:]:
                 c.visit()
             gl.glPopMatrix()
 
@@ -788,7 +875,7 @@ def do(self, action, target=None):
         if not self.scheduled:
             if self.is_running:
                 self.scheduled = True
-                pyglet.clock.schedule(self._step)
+                director.action_manager.add(self)
         return a
 
     def remove_action(self, action):
@@ -819,7 +906,7 @@ def pause(self):
         if not self.scheduled:
             return
         self.scheduled = False
-        pyglet.clock.unschedule(self._step)
+        director.action_manager.remove(self)
 
     def resume(self):
         """
@@ -828,7 +915,7 @@ def resume(self):
         if self.scheduled:
             return
         self.scheduled = True
-        pyglet.clock.schedule(self._step)
+        director.action_manager.add(self)
         self.skip_frame = True
 
     def stop(self):
@@ -838,14 +925,16 @@ def stop(self):
         For each action running, the stop method will be called,
         and the action will be removed from the actions container.
         """
-        for action in self.actions:
+        for action in self.__dict__.get('actions', ()):
             self.remove_action(action)
 
     def are_actions_running(self):
         """
         Determine whether any actions are running.
         """
-        return bool(set(self.actions) - set(self.to_remove))
+        members = self.__dict__
+        return bool(set(members.get('actions', ())) -
+                    set(members.get('to_remove', ())))
 
     def _step(self, dt):
         """pumps all the actions in the node actions container
@@ -861,20 +950,23 @@ def _step(self, dt):
                 The time in seconds that elapsed since that last time this 
                 function was called.
         """
-        for x in self.to_remove:
-            if x in self.actions:
-                self.actions.remove(x)
-        self.to_remove = []
+        members = self.__dict__
+        if members.get('to_remove'):
+            for x in self.to_remove:
+                if x in self.actions:
+                    self.actions.remove(x)
+            self.to_remove = []
 
         if self.skip_frame:
             self.skip_frame = False
             return
 
-        if len(self.actions) == 0:
+        actions = members.get('actions', ())
+        if len(actions) == 0:
             self.scheduled = False
-            pyglet.clock.unschedule(self._step)
+            director.action_manager.remove(self)
 
-        for action in self.actions:
+        for action in actions:
             if not action.scheduled_to_remove:
                 action.step(dt)
                 if action.done():
@@ -906,15 +998,22 @@ def get_local_transform(self):
     def get_world_transform(self):
         """Returns an :class:`.euclid.Matrix3` with the world transformation matrix
 
+        The matrix is cached until the node or some ancestor changes its
+        position, scale, rotation, transform anchor or parent; don't modify it.
+
         Returns:
             euclid.Matrix3
         """
-        matrix = self.get_local_transform()
-
-        p = self.parent
-        while p is not None:
-            matrix = p.get_local_transform() * matrix
-            p = p.parent
+        matrix = self._world_transform
+        if matrix is None:
+            matrix = self.get_local_transform()
+            p = self.parent
+            if p is None:
+                self._world_transform = matrix
+            else:
+                matrix = p.get_world_transform() * matrix
+                if p._world_transform is not None and not self._detached:
+                    self._world_transform = matrix
 
         return matrix
 
@@ -950,15 +1049,22 @@ def get_world_inverse(self):
         """returns an :class:`.euclid.Matrix3` with the world inverse 
         transformation matrix.
 
+        The matrix is cached as the one from :meth:`get_world_transform`;
+        don't modify it.
+
         Returns:
             euclid.Matrix3
         """
-        matrix = self.get_local_inverse()
-
-        p = self.parent
-        while p is not None:
-            matrix = matrix * p.get_local_inverse()
-            p = p.parent
+        matrix = self._world_inverse
+        if matrix is None:
+            matrix = self.get_local_inverse()
+            p = self.parent
+            if p is None:
+                self._world_inverse = matrix
+            else:
+                matrix = matrix * p.get_world_inverse()
+                if p._world_inverse is not None and not self._detached:
+                    self._world_inverse = matrix
 
         return matrix
 
@@ -974,3 +1080,40 @@ def point_to_local(self, p):
         v = euclid.Point2(p[0], p[1])
         matrix = self.get_world_inverse()
         return matrix * v
+
+    def points_to_world(self, points):
+        """Batch version of :meth:`point_to_world`, needs numpy.
+
+        Arguments:
+            points: sequence of (x, y) pairs, a numpy array with shape
+                (n, 2) is fine.
+
+        Returns:
+            numpy.ndarray: float array with shape (n, 2), the points
+            converted to world coordinates.
+        """
+        return _transform_points(self.get_world_transform(), points)
+
+    def points_to_local(self, points):
+        """Batch version of :meth:`point_to_local`, needs numpy.
+
+        Arguments:
+            points: sequence of (x, y) pairs, a numpy array with shape
+                (n, 2) is fine.
+
+        Returns:
+            numpy.ndarray: float array with shape (n, 2), the points
+            converted to local coordinates.
+        """
+        return _transform_points(self.get_world_inverse(), points)
+
+
+def _transform_points(matrix, points):
+    """points, shape (n, 2), transformed by the affine euclid.Matrix3"""
+    if numpy is None:
+        raise ImportError("points_to_world and points_to_local need numpy")
+    points = numpy.asarray(points, dtype=float).reshape(-1, 2)
+    linear = numpy.array(((matrix.a, matrix.e), (matrix.b, matrix.f)))
+    transformed = numpy.dot(points, linear)
+    transformed += (matrix.c, matrix.g)
+    return transformed
@@ -39,8 +39,14 @@
 
 import operator as op
 import math
+import heapq
 import cocos.euclid as eu
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # interfaces, abstract base clases ######################################
 
 msg_abstract = "abstract method called, needs implementation"
@@ -102,6 +108,23 @@ def fits_in_box(self, packed_box):
         """
         raise NotImplementedError(msg_abstract)
 
+    def ray_hit(self, origin, direction):
+        """
+        Returns the smallest t >= 0 such that origin + t * direction is a
+        point of the shape, or None if the ray misses the shape.
+
+        If direction has length 1.0 t is the distance from origin to the
+        shape along the ray; if origin is inside the shape t is 0.0
+
+        :Parameters:
+            `origin` : 2-tuple of floats or euclid.Vector2
+                ray start point
+            `direction` : 2-tuple of floats or euclid.Vector2
+                ray direction, not null
+        :rtype: float or None
+        """
+        raise NotImplementedError(msg_abstract)
+
     def minmax(self):
         """
         Returns the smallest axis aligned rectangle that contains all shape points.
@@ -158,8 +181,20 @@ class CollisionManager(object):
     'obj' or 'other' is seen in the code you can assume it means collidable.
 
     While usually all collidables in a collision manager are of the same class
-    (CircleShape or AARectShape) it is allowed to use both types into the same
-    collision manager.
+    (CircleShape, AARectShape, OBBShape or ConvexPolygonShape) it is allowed
+    to mix types into the same collision manager.
+
+    Collidables can optionally have the members
+
+        - collision_category : int, with one bit set, defaults to CATEGORY_DEFAULT
+        - collision_mask : int, the categories it can interact with, defaults to MASK_ALL
+
+    Two objects interact only if the category of each one has a bit set in
+    the mask of the other; the questions involving a pair of objects
+    (collisions, proximity, sweeps) never report pairs that don't interact.
+    This allows to keep by example player bullets, enemy bullets and
+    pickups in one collision manager.
+    The category and mask for known objects are read in 'add'.
 
     The known objects collective for each CollisionManager instance is
     manipulated by calling the methods
@@ -167,6 +202,8 @@ class CollisionManager(object):
         - clean() \: forgets all objects and empties internal data structures
         - add(obj) \: remember obj as a known object
         - remove_tricky(obj) \: forgets obj
+        - update(obj), update_many(objs) \: refresh the info about known
+          objects that changed cshape
 
     When objects are made known to a collision manager, internal data structures
     are updated based on the obj.cshape value at the 'add' moment.
@@ -189,6 +226,20 @@ class CollisionManager(object):
 
     You do::
 
+        # game logic, with accurate collision info
+        ...
+
+        # update cshapes for next frame
+        for actor in moving actors:
+            actor.cshape.center = actor.new_pos
+
+        # updating collision info; with CollisionManagerGrid the cost
+        # depends on how many objects changed cells, not on the number of
+        # known objects
+        collision_manager.update_many(moving_actors)
+
+    Or, the older pattern::
+
         # updating collision info
         collision_manager.clear() # fast, no leaks even if changed cshapes
         for actor in moving_actors:
@@ -237,6 +288,21 @@ def clear(self):
         """
         raise NotImplementedError(msg_abstract)
 
+    def update(self, obj):
+        """
+        Refreshes the info stored for obj, to be called after obj.cshape
+        changed.
+        obj is required to be a known object.
+        """
+        raise NotImplementedError(msg_abstract)
+
+    def update_many(self, objs):
+        """
+        Same as calling update(obj) for each obj in objs, usually faster.
+        All objs are required to be known objects.
+        """
+        raise NotImplementedError(msg_abstract)
+
     def they_collide(self, obj1, obj2):
         """
         Returns a boolean, True if obj1 overlaps objs2
@@ -306,7 +372,93 @@ def ranked_objs_near(self, obj, near_distance):
         """
         raise NotImplementedError(msg_abstract)
 
-    def iter_all_collisions(self):
+    def k_nearest(self, obj, k, max_distance=None):
+        """
+        Returns a list with the (other, distance) pairs for the k known
+        objects nearest to obj, except obj itself, ordered in increasing
+        distance.
+        If max_distance is not None only objects at distance less or equal
+        than max_distance are considered, so the list can have less than k
+        elements.
+        obj is not required to be a known object
+
+        Unlike ranked_objs_near it stops searching as soon as the k nearest
+        are known.
+        """
+        raise NotImplementedError(msg_abstract)
+
+    def nearest(self, obj, max_distance=None):
+        """
+        Returns the known object nearest to obj, except obj itself, or None
+        if there is no known object at distance less or equal than
+        max_distance.
+        obj is not required to be a known object
+        """
+        raise NotImplementedError(msg_abstract)
+
+    def objs_colliding_many(self, objs):
+        """
+        Batch version of objs_colliding.
+        Returns a list of (i, other) pairs, one for each known object other
+        that overlaps objs[i], excluding objs[i] itself.
+        The objs are not required to be known objects
+        """
+        raise NotImplementedError(msg_abstract)
+
+    def objs_near_many(self, objs, near_distance):
+        """
+        Batch version of objs_near.
+        Returns a list of (i, other) pairs, one for each known object other
+        at distance less or equal than near_distance to objs[i], excluding
+        objs[i] itself.
+        The objs are not required to be known objects
+        """
+        raise NotImplementedError(msg_abstract)
+
+    def objs_touching_points(self, points):
+        """
+        Batch version of objs_touching_point.
+        points is a sequence of (x, y) pairs (a numpy array with shape
+        (n, 2) is fine); returns a list of (i, obj) pairs, one for each
+        known object obj touching points[i]
+        """
+        raise NotImplementedError(msg_abstract)
+
+    def raycast(self, origin, direction, max_distance=None):
+        """
+        Returns a list of (obj, distance) pairs with the known objects hit
+        by the ray that starts at origin and goes in direction, ordered by
+        increasing distance.
+        distance is measured from origin along the ray, and is 0.0 for
+        objects containing origin.
+        If max_distance is not None only hits at distance less or equal than
+        max_distance are reported.
+
+        Useful for line of sight and hitscan weapons.
+        """
+        raise NotImplementedError(msg_abstract)
+
+    def segment_hits(self, p0, p1):
+        """
+        Returns a list of (obj, distance) pairs with the known objects hit
+        by the segment from p0 to p1, ordered by increasing distance to p0.
+        """
+        raise NotImplementedError(msg_abstract)
+
+    def sweep_hits(self, obj, displacement):
+        """
+        Returns a list of (other, t) pairs with the known objects that obj
+        would touch when moving by displacement, ordered by increasing t;
+        t in [0, 1] is the fraction of displacement done at the first
+        contact (see time_of_impact).
+        obj is not required to be a known object, and is excluded from the
+        answer.
+
+        Useful to not miss collisions of fast objects.
+        """
+        raise NotImplementedError(msg_abstract)
+
+    def iter_all_collisions(self, category_pairs=None):
         """
         Iterator that exposes all collisions between known objects.
         At each step it will yield a pair (obj, other).
@@ -314,7 +466,43 @@ def iter_all_collisions(self):
         will not be seen.
         In other worlds, 'obj1 collides with obj2' means (obj1, obj2) or
         (obj2, obj1) will appear in the iterator output but not both.
+
+        If category_pairs is not None, it must be a sequence of
+        (category_a, category_b) pairs, and only collisions between an
+        object with a category bit in category_a and other with a category
+        bit in category_b are reported, as (obj_a, obj_b)
+        """
+
+    def update_contacts(self, category_pairs=None):
+        """
+        Compares the collisions between known objects, as given by
+        iter_all_collisions(category_pairs), with the ones seen in the
+        previous call, and returns three lists of (obj, other) pairs:
+
+            - began : pairs colliding now but not in the previous call
+            - persisted : pairs colliding now and in the previous call
+            - ended : pairs colliding in the previous call but not now
+
+        Usually called once per frame, after the known objects are updated::
+
+            began, persisted, ended = collision_manager.update_contacts()
+            for obj, other in began:
+                # process event 'obj starts touching other'
+
+        Objects removed with remove_tricky will see their contacts ended in
+        the next call. The contacts are not forgotten by 'clear', so the
+        clear and re-add pattern works too; use forget_contacts to start
+        anew.
+        Use the same category_pairs in all calls.
         """
+        raise NotImplementedError(msg_abstract)
+
+    def forget_contacts(self):
+        """
+        Forgets the contacts remembered by update_contacts, so in the next
+        call all colliding pairs will be reported as began.
+        """
+        raise NotImplementedError(msg_abstract)
 
     def knows(self, obj):
         """Returns True if obj was added to the collision manager, false otherwise
@@ -372,6 +560,8 @@ def overlaps(self, other):
             return circle_overlaps_circle(self, other)
         elif isinstance(other, AARectShape):
             return aa_rect_overlaps_circle(other, self)
+        elif isinstance(other, ConvexPolygonShape):
+            return polygon_overlaps_circle(other, self)
         raise NotImplementedError(
             "Collision between CircleShape and {0} is not implemented".format(other.__class__.__name__))
 
@@ -380,6 +570,8 @@ def distance(self, other):
             return circle_distance_circle(self, other)
         elif isinstance(other, AARectShape):
             return aa_rect_distance_circle(other, self)
+        elif isinstance(other, ConvexPolygonShape):
+            return polygon_distance_circle(other, self)
         raise NotImplementedError(
             "Distance between CircleShape and {0} is not implemented".format(other.__class__.__name__))
 
@@ -394,6 +586,9 @@ def fits_in_box(self, packed_box):
         return (((packed_box[0] + r) <= self.center[0] <= (packed_box[1] - r)) and
                 ((packed_box[2] + r) <= self.center[1] <= (packed_box[3] - r)))
 
+    def ray_hit(self, origin, direction):
+        return ray_hit_circle(origin, direction, self.center, self.r)
+
     def minmax(self):
         r = self.r
         return (self.center[0] - r, self.center[0] + r,
@@ -435,6 +630,8 @@ def overlaps(self, other):
             return aa_rect_overlaps_aa_rect(self, other)
         elif isinstance(other, CircleShape):
             return aa_rect_overlaps_circle(self, other)
+        elif isinstance(other, ConvexPolygonShape):
+            return polygon_overlaps_polygon(other, self)
         raise NotImplementedError(
             "Collision between AARectShape and {0} is not implemented".format(other.__class__.__name__))
 
@@ -443,6 +640,8 @@ def distance(self, other):
             return aa_rect_distance_aa_rect(self, other)
         elif isinstance(other, CircleShape):
             return aa_rect_distance_circle(self, other)
+        elif isinstance(other, ConvexPolygonShape):
+            return polygon_distance_polygon(other, self)
         raise NotImplementedError(
             "Distance between AARectShape and {0} is not implemented".format(other.__class__.__name__))
 
@@ -457,6 +656,9 @@ def fits_in_box(self, packed_box):
         return ((packed_box[0] + self.rx <= self.center[0] <= packed_box[1] - self.rx) and
                 (packed_box[2] + self.ry <= self.center[1] <= packed_box[3] - self.ry))
 
+    def ray_hit(self, origin, direction):
+        return ray_hit_aa_rect(origin, direction, self.center, self.rx, self.ry)
+
     def minmax(self):
         return (self.center[0] - self.rx, self.center[0] + self.rx,
                 self.center[1] - self.ry, self.center[1] + self.ry)
@@ -465,6 +667,210 @@ def copy(self):
         return AARectShape(eu.Vector2(*self.center), self.rx, self.ry)
 
 
+class ConvexPolygonShape(Cshape):
+    """
+    Implements the Cshape interface that uses convex polygons as geometric
+    shape.
+
+    The polygon is given by its vertices relative to center, and can be
+    rotated around center; rotation is in degrees, clockwise, same as
+    CocosNode.rotation, so for an actor it is usual to do::
+
+        actor.cshape.center = actor.position
+        actor.cshape.rotation = actor.rotation
+
+    Overlap is decided by the separating axis theorem. Distance is the
+    euclidean distance, also when the other shape is an AARectShape.
+
+    The rotated vertices, the edge normals and the AABB relative to center
+    are cached, so changing center is cheap and changing rotation or
+    vertices costs one recalculation.
+
+    Look at Cshape for other class and methods documentation.
+    """
+
+    def __init__(self, center, vertices, rotation=0.0):
+        """
+        :Parameters:
+            `center` : euclid.Vector2
+                polygon center, the rotation pivot
+            `vertices` : sequence of 2-tuple of floats
+                polygon vertices relative to center, in order (any winding)
+            `rotation` : float
+                clockwise rotation in degrees
+        """
+        self.center = center
+        self._rotation = rotation
+        self.vertices = vertices
+
+    @property
+    def vertices(self):
+        """polygon vertices relative to center, before rotation, counter
+        clockwise"""
+        return self._vertices
+
+    @vertices.setter
+    def vertices(self, vertices):
+        vertices = [(float(x), float(y)) for x, y in vertices]
+        if len(vertices) < 3:
+            raise ValueError("a polygon needs at least 3 vertices")
+        if _signed_area(vertices) < 0.0:
+            vertices.reverse()
+        self._vertices = vertices
+        self._local = None
+
+    @property
+    def rotation(self):
+        """clockwise rotation in degrees"""
+        return self._rotation
+
+    @rotation.setter
+    def rotation(self, rotation):
+        if rotation != self._rotation:
+            self._rotation = rotation
+            self._local = None
+
+    def _get_local(self):
+        # (rotated vertices, edge normals, AABB) relative to center
+        if self._local is None:
+            if self._rotation:
+                a = math.radians(self._rotation)
+                c = math.cos(a)
+                s = math.sin(a)
+                vertices = [(x * c + y * s, y * c - x * s)
+                            for x, y in self._vertices]
+            else:
+                vertices = self._vertices
+            xs = [x for x, y in vertices]
+            ys = [y for x, y in vertices]
+            self._local = (vertices, _edge_normals(vertices),
+                           (min(xs), max(xs), min(ys), max(ys)))
+        return self._local
+
+    def world_vertices(self):
+        """
+        Returns the polygon vertices in world coordinates, counter clockwise
+
+        :rtype: list of 2-tuple of floats
+        """
+        cx, cy = self.center
+        return [(cx + x, cy + y) for x, y in self._get_local()[0]]
+
+    def normals(self):
+        """
+        Returns the unit outward normals for the edges, the i-th edge going
+        from the i-th vertex to the next
+
+        :rtype: list of 2-tuple of floats
+        """
+        return self._get_local()[1]
+
+    def overlaps(self, other):
+        if isinstance(other, (ConvexPolygonShape, AARectShape)):
+            return polygon_overlaps_polygon(self, other)
+        elif isinstance(other, CircleShape):
+            return polygon_overlaps_circle(self, other)
+        raise NotImplementedError(
+            "Collision between {0} and {1} is not implemented".format(self.__class__.__name__, other.__class__.__name__))
+
+    def distance(self, other):
+        if isinstance(other, (ConvexPolygonShape, AARectShape)):
+            return polygon_distance_polygon(self, other)
+        elif isinstance(other, CircleShape):
+            return polygon_distance_circle(self, other)
+        raise NotImplementedError(
+            "Distance between {0} and {1} is not implemented".format(self.__class__.__name__, other.__class__.__name__))
+
+    def near_than(self, other, near_distance):
+        return self.distance(other) <= near_distance
+
+    def touches_point(self, x, y):
+        cx, cy = self.center
+        x -= cx
+        y -= cy
+        vertices, normals, aabb = self._get_local()
+        for (vx, vy), (nx, ny) in zip(vertices, normals):
+            if (x - vx) * nx + (y - vy) * ny > 0.0:
+                return False
+        return True
+
+    def fits_in_box(self, packed_box):
+        minx, maxx, miny, maxy = self.minmax()
+        return (packed_box[0] <= minx and maxx <= packed_box[1] and
+                packed_box[2] <= miny and maxy <= packed_box[3])
+
+    def ray_hit(self, origin, direction):
+        return ray_hit_convex_polygon(origin, direction,
+                                      self.world_vertices(), self.normals())
+
+    def minmax(self):
+        cx, cy = self.center
+        minx, maxx, miny, maxy = self._get_local()[2]
+        return (cx + minx, cx + maxx, cy + miny, cy + maxy)
+
+    def copy(self):
+        return ConvexPolygonShape(eu.Vector2(*self.center), self._vertices,
+                                  self._rotation)
+
+
+class OBBShape(ConvexPolygonShape):
+    """
+    Implements the Cshape interface that uses rotated rectangles, also known
+    as Oriented Bounding Boxes, as geometric shape.
+
+    Good for actors that rotate, like cars or ships. The rotation is in
+    degrees, clockwise, same as CocosNode.rotation.
+
+    Look at ConvexPolygonShape for other class and methods documentation.
+    """
+
+    def __init__(self, center, half_width, half_height, rotation=0.0):
+        """
+        :Parameters:
+            `center` : euclid.Vector2
+                rectangle center
+            `half_width` : float
+                half width of rectangle, before rotation
+            `half_height` : float
+                half height of rectangle, before rotation
+            `rotation` : float
+                clockwise rotation in degrees
+        """
+        self._rx = half_width
+        self._ry = half_height
+        super(OBBShape, self).__init__(center, self._box_vertices(),
+                                       rotation)
+
+    def _box_vertices(self):
+        rx = self._rx
+        ry = self._ry
+        return [(-rx, -ry), (rx, -ry), (rx, ry), (-rx, ry)]
+
+    @property
+    def rx(self):
+        """half width, before rotation"""
+        return self._rx
+
+    @rx.setter
+    def rx(self, half_width):
+        self._rx = half_width
+        self.vertices = self._box_vertices()
+
+    @property
+    def ry(self):
+        """half height, before rotation"""
+        return self._ry
+
+    @ry.setter
+    def ry(self, half_height):
+        self._ry = half_height
+        self.vertices = self._box_vertices()
+
+    def copy(self):
+        return OBBShape(eu.Vector2(*self.center), self._rx, self._ry,
+                        self._rotation)
+
+
 def clamp(value, minimum, maximum):
         return max(min(value, maximum), minimum)
 
@@ -549,6 +955,543 @@ def aa_rect_distance_aa_rect(aa_rect, other):
         d = 0.0
     return d
 
+def _signed_area(vertices):
+    # twice the signed area, positive for counter clockwise
+    area = 0.0
+    x0, y0 = vertices[-1]
+    for x1, y1 in vertices:
+        area += x0 * y1 - x1 * y0
+        x0, y0 = x1, y1
+    return area
+
+
+def _edge_normals(vertices):
+    # unit outward normals for a counter clockwise convex polygon
+    normals = []
+    x0, y0 = vertices[-1]
+    for x1, y1 in vertices:
+        dx = x1 - x0
+        dy = y1 - y0
+        length = math.sqrt(dx * dx + dy * dy)
+        normals.append((dy / length, -dx / length))
+        x0, y0 = x1, y1
+    # the edge i goes from vertex i to vertex i + 1
+    normals.append(normals.pop(0))
+    return normals
+
+
+_AA_RECT_NORMALS = [(0.0, -1.0), (1.0, 0.0), (0.0, 1.0), (-1.0, 0.0)]
+
+
+def _polygon_data(cshape):
+    # (world vertices, edge normals) for ConvexPolygonShape or AARectShape
+    if isinstance(cshape, AARectShape):
+        cx, cy = cshape.center
+        rx = cshape.rx
+        ry = cshape.ry
+        return ([(cx - rx, cy - ry), (cx + rx, cy - ry), (cx + rx, cy + ry),
+                 (cx - rx, cy + ry)], _AA_RECT_NORMALS)
+    return cshape.world_vertices(), cshape.normals()
+
+
+def _separated(vertices, normals, other_vertices):
+    # True if some edge of the first polygon separates the other; the
+    # first polygon projects on the edge normal at most as its edge vertex,
+    # so only the other polygon needs to be projected
+    for (vx, vy), (nx, ny) in zip(vertices, normals):
+        for x, y in other_vertices:
+            if (x - vx) * nx + (y - vy) * ny < 0.0:
+                break
+        else:
+            return True
+    return False
+
+
+def _polygon_point_distance(vertices, normals, x, y):
+    # distance from point to convex polygon, 0.0 if inside
+    inside = True
+    for (vx, vy), (nx, ny) in zip(vertices, normals):
+        if (x - vx) * nx + (y - vy) * ny > 0.0:
+            inside = False
+            break
+    if inside:
+        return 0.0
+    best = float('inf')
+    x0, y0 = vertices[-1]
+    for x1, y1 in vertices:
+        dx = x1 - x0
+        dy = y1 - y0
+        t = ((x - x0) * dx + (y - y0) * dy) / (dx * dx + dy * dy)
+        t = clamp(t, 0.0, 1.0)
+        ex = x0 + t * dx - x
+        ey = y0 + t * dy - y
+        d = ex * ex + ey * ey
+        if d < best:
+            best = d
+        x0, y0 = x1, y1
+    return math.sqrt(best)
+
+
+def polygon_overlaps_polygon(polygon, other):
+    """
+    Tells if two convex polygons overlap, by the separating axis theorem.
+
+    Each one can be a ConvexPolygonShape or an AARectShape.
+    """
+    vertices, normals = _polygon_data(polygon)
+    other_vertices, other_normals = _polygon_data(other)
+    return not (_separated(vertices, normals, other_vertices) or
+                _separated(other_vertices, other_normals, vertices))
+
+
+def polygon_overlaps_circle(polygon, circle):
+    """
+    Tells if a convex polygon and a circle overlap.
+
+    The polygon can be a ConvexPolygonShape or an AARectShape.
+    The circle must have members 'center', 'r', where the latest is the radius.
+    """
+    vertices, normals = _polygon_data(polygon)
+    x, y = circle.center
+    return _polygon_point_distance(vertices, normals, x, y) < circle.r
+
+
+def polygon_distance_polygon(polygon, other):
+    """
+    Give the euclidean distance between two convex polygons.
+
+    Each one can be a ConvexPolygonShape or an AARectShape.
+    """
+    vertices, normals = _polygon_data(polygon)
+    other_vertices, other_normals = _polygon_data(other)
+    if not (_separated(vertices, normals, other_vertices) or
+            _separated(other_vertices, other_normals, vertices)):
+        return 0.0
+    # disjoint convex polygons: the nearest points include a vertex
+    d = min(_polygon_point_distance(other_vertices, other_normals, x, y)
+            for x, y in vertices)
+    return min(d, min(_polygon_point_distance(vertices, normals, x, y)
+                      for x, y in other_vertices))
+
+
+def polygon_distance_circle(polygon, circle):
+    """
+    Give the euclidean distance between a convex polygon and a circle.
+
+    The polygon can be a ConvexPolygonShape or an AARectShape.
+    The circle must have members 'center', 'r', where the latest is the radius.
+    """
+    vertices, normals = _polygon_data(polygon)
+    x, y = circle.center
+    d = _polygon_point_distance(vertices, normals, x, y) - circle.r
+    if d < 0.0:
+        d = 0.0
+    return d
+
+
+def ray_hit_circle(origin, direction, center, r):
+    """
+    Give the smallest t >= 0 such that origin + t * direction is in the disc
+    with the given center and radius r, or None if there is no such t.
+    """
+    mx = origin[0] - center[0]
+    my = origin[1] - center[1]
+    c = mx * mx + my * my - r * r
+    if c <= 0.0:
+        # origin inside
+        return 0.0
+    dx, dy = direction
+    b = mx * dx + my * dy
+    if b >= 0.0:
+        # outside and going away
+        return None
+    a = dx * dx + dy * dy
+    discriminant = b * b - a * c
+    if discriminant < 0.0:
+        return None
+    return (-b - math.sqrt(discriminant)) / a
+
+
+def ray_hit_aa_rect(origin, direction, center, rx, ry):
+    """
+    Give the smallest t >= 0 such that origin + t * direction is in the axis
+    aligned rectangle with the given center, half width rx and half height
+    ry, or None if there is no such t.
+    """
+    t_enter = 0.0
+    t_exit = float('inf')
+    for o, d, c, r in ((origin[0], direction[0], center[0], rx),
+                       (origin[1], direction[1], center[1], ry)):
+        if d == 0.0:
+            if abs(o - c) > r:
+                return None
+            continue
+        t0 = (c - r - o) / d
+        t1 = (c + r - o) / d
+        if t0 > t1:
+            t0, t1 = t1, t0
+        if t0 > t_enter:
+            t_enter = t0
+        if t1 < t_exit:
+            t_exit = t1
+        if t_enter > t_exit:
+            return None
+    return t_enter
+
+
+def ray_hit_convex_polygon(origin, direction, vertices, normals):
+    """
+    Give the smallest t >= 0 such that origin + t * direction is in the
+    convex polygon, or None if there is no such t.
+
+    vertices are the polygon vertices counter clockwise, normals the unit
+    outward normals for the edges, the i-th edge going from vertices[i] to
+    vertices[i + 1]
+    """
+    ox, oy = origin
+    dx, dy = direction
+    t_enter = 0.0
+    t_exit = float('inf')
+    for (vx, vy), (nx, ny) in zip(vertices, normals):
+        # clip the ray with the inner half plane of each edge
+        outside = (ox - vx) * nx + (oy - vy) * ny
+        speed = dx * nx + dy * ny
+        if speed == 0.0:
+            if outside > 0.0:
+                return None
+            continue
+        t = -outside / speed
+        if speed < 0.0:
+            if t > t_enter:
+                t_enter = t
+        elif t < t_exit:
+            t_exit = t
+        if t_enter > t_exit:
+            return None
+    return t_enter
+
+
+def _convex_hull(points):
+    # monotone chain, counter clockwise
+    points = sorted(set(points))
+    if len(points) < 3:
+        return points
+
+    def half(points):
+        chain = []
+        for p in points:
+            while len(chain) >= 2:
+                (ax, ay), (bx, by) = chain[-2], chain[-1]
+                if (bx - ax) * (p[1] - ay) - (by - ay) * (p[0] - ax) > 0.0:
+                    break
+                chain.pop()
+            chain.append(p)
+        return chain
+    lower = half(points)
+    upper = half(reversed(points))
+    return lower[:-1] + upper[:-1]
+
+
+def _ray_hit_rounded_polygon(origin, direction, vertices, normals, r):
+    # the rounded polygon is the union of the polygon, a rect over each
+    # edge and discs at the vertices
+    hits = [ray_hit_convex_polygon(origin, direction, vertices, normals)]
+    if r > 0.0:
+        x0, y0 = vertices[-1]
+        for (x1, y1), (nx, ny) in zip(vertices,
+                                      [normals[-1]] + normals[:-1]):
+            band = [(x0, y0), (x0 + r * nx, y0 + r * ny),
+                    (x1 + r * nx, y1 + r * ny), (x1, y1)]
+            hits.append(ray_hit_convex_polygon(origin, direction, band,
+                                               _edge_normals(band)))
+            hits.append(ray_hit_circle(origin, direction, (x1, y1), r))
+            x0, y0 = x1, y1
+    hits = [t for t in hits if t is not None]
+    return min(hits) if hits else None
+
+
+def _ray_hit_rounded_rect(origin, direction, center, rx, ry, r):
+    # the rounded rect is the union of two rects and four discs at corners
+    cx, cy = center
+    hits = [ray_hit_aa_rect(origin, direction, center, rx + r, ry),
+            ray_hit_aa_rect(origin, direction, center, rx, ry + r)]
+    for corner in ((cx - rx, cy - ry), (cx + rx, cy - ry),
+                   (cx - rx, cy + ry), (cx + rx, cy + ry)):
+        hits.append(ray_hit_circle(origin, direction, corner, r))
+    hits = [t for t in hits if t is not None]
+    return min(hits) if hits else None
+
+
+def time_of_impact(cshape, displacement, other):
+    """
+    Give the fraction t in [0, 1] of displacement that cshape can move
+    before touching other, or None if cshape moving by displacement does not
+    touch other.
+
+    Gives 0.0 if they already overlap.
+    Implemented for CircleShape, AARectShape and ConvexPolygonShape.
+    """
+    center = cshape.center
+    if (isinstance(cshape, ConvexPolygonShape) or
+            isinstance(other, ConvexPolygonShape)):
+        t = _polygon_time_of_impact(cshape, displacement, other)
+    elif isinstance(cshape, CircleShape):
+        if isinstance(other, CircleShape):
+            t = ray_hit_circle(center, displacement, other.center,
+                               cshape.r + other.r)
+        elif isinstance(other, AARectShape):
+            t = _ray_hit_rounded_rect(center, displacement, other.center,
+                                      other.rx, other.ry, cshape.r)
+        else:
+            raise NotImplementedError(
+                "Time of impact between CircleShape and {0} is not implemented".format(other.__class__.__name__))
+    elif isinstance(cshape, AARectShape):
+        if isinstance(other, AARectShape):
+            t = ray_hit_aa_rect(center, displacement, other.center,
+                                cshape.rx + other.rx, cshape.ry + other.ry)
+        elif isinstance(other, CircleShape):
+            t = _ray_hit_rounded_rect(center, displacement, other.center,
+                                      cshape.rx, cshape.ry, other.r)
+        else:
+            raise NotImplementedError(
+                "Time of impact between AARectShape and {0} is not implemented".format(other.__class__.__name__))
+    else:
+        raise NotImplementedError(
+            "Time of impact for {0} is not implemented".format(cshape.__class__.__name__))
+    if t is not None and t > 1.0:
+        t = None
+    return t
+
+
+def _polygon_time_of_impact(cshape, displacement, other):
+    # cshape moved by t * displacement touches other iff its center, moving
+    # along the ray, enters the minkowski sum of other and -cshape
+    polygonal = (ConvexPolygonShape, AARectShape)
+    if isinstance(cshape, CircleShape):
+        if not isinstance(other, polygonal):
+            raise NotImplementedError(
+                "Time of impact between CircleShape and {0} is not implemented".format(other.__class__.__name__))
+        vertices, normals = _polygon_data(other)
+        return _ray_hit_rounded_polygon(cshape.center, displacement,
+                                        vertices, normals, cshape.r)
+    if not isinstance(cshape, polygonal):
+        raise NotImplementedError(
+            "Time of impact for {0} is not implemented".format(cshape.__class__.__name__))
+    if isinstance(other, CircleShape):
+        # same as the circle moving in the opposite direction
+        return _polygon_time_of_impact(other, (-displacement[0],
+                                               -displacement[1]), cshape)
+    if not isinstance(other, polygonal):
+        raise NotImplementedError(
+            "Time of impact between {0} and {1} is not implemented".format(cshape.__class__.__name__, other.__class__.__name__))
+    cx, cy = cshape.center
+    vertices = _polygon_data(cshape)[0]
+    other_vertices = _polygon_data(other)[0]
+    hull = _convex_hull([(ox - x + cx, oy - y + cy)
+                         for ox, oy in other_vertices for x, y in vertices])
+    return ray_hit_convex_polygon((cx, cy), displacement, hull,
+                                  _edge_normals(hull))
+
+
+def swept_aabb(cshape, displacement):
+    """
+    Give the AABB, as (minx, maxx, miny, maxy), of the region covered by
+    cshape while moving by displacement.
+    """
+    minx, maxx, miny, maxy = cshape.minmax()
+    dx, dy = displacement
+    return (minx + min(dx, 0.0), maxx + max(dx, 0.0),
+            miny + min(dy, 0.0), maxy + max(dy, 0.0))
+
+
+def _normalized_ray(direction, max_distance):
+    # unit direction and max_distance, or None if direction is null
+    dx, dy = direction
+    length = math.sqrt(dx * dx + dy * dy)
+    if length == 0.0:
+        return None
+    if max_distance is None:
+        max_distance = float('inf')
+    return (dx / length, dy / length), max_distance
+
+
+def _ray_aabb_interval(origin, direction, minx, maxx, miny, maxy,
+                       t_enter, t_exit):
+    # clips [t_enter, t_exit] to the ray part inside the AABB; returns None
+    # when empty
+    for o, d, lo, hi in ((origin[0], direction[0], minx, maxx),
+                         (origin[1], direction[1], miny, maxy)):
+        if d == 0.0:
+            if o < lo or o > hi:
+                return None
+            continue
+        t0 = (lo - o) / d
+        t1 = (hi - o) / d
+        if t0 > t1:
+            t0, t1 = t1, t0
+        if t0 > t_enter:
+            t_enter = t0
+        if t1 < t_exit:
+            t_exit = t1
+        if t_enter > t_exit:
+            return None
+    return t_enter, t_exit
+
+
+def aabb_gap(aabb, other):
+    """
+    Give the separation between two axis aligned rectangles expressed as
+    (minx, maxx, miny, maxy), that is, the greatest gap along x or y; 0.0
+    if they overlap.
+
+    The distance between two cshapes is never less than the gap between
+    their AABBs, so this is a cheap lower bound for cshape.distance
+    """
+    d = max(aabb[0] - other[1], other[0] - aabb[1],
+            aabb[2] - other[3], other[2] - aabb[3])
+    if d < 0.0:
+        d = 0.0
+    return d
+
+
+#: category for objects without a 'collision_category' member
+CATEGORY_DEFAULT = 1
+
+#: mask accepting all categories, used for objects without a
+#: 'collision_mask' member
+MASK_ALL = -1
+
+_DEFAULT_FILTER = (CATEGORY_DEFAULT, MASK_ALL)
+
+
+def collision_filter(obj):
+    """
+    Give (category, mask) for a collidable.
+
+    The values are taken from obj.collision_category and obj.collision_mask,
+    defaulting to CATEGORY_DEFAULT and MASK_ALL.
+    """
+    return (getattr(obj, 'collision_category', CATEGORY_DEFAULT),
+            getattr(obj, 'collision_mask', MASK_ALL))
+
+
+def categories_collide(filter_a, filter_b):
+    """
+    Tells if objects with the (category, mask) filters filter_a and filter_b
+    can interact: the category of each one must have a bit set in the mask
+    of the other.
+    """
+    return bool(filter_a[0] & filter_b[1]) and bool(filter_b[0] & filter_a[1])
+
+
+def _store_filter(filters, obj):
+    # filters maps known obj -> (category, mask), only for non default values
+    obj_filter = collision_filter(obj)
+    if obj_filter == _DEFAULT_FILTER:
+        filters.pop(obj, None)
+    else:
+        filters[obj] = obj_filter
+
+
+def _make_accepts(filters, obj):
+    # Returns None when obj can interact with all the known objects, else a
+    # function telling if obj can interact with a known object
+    category, mask = collision_filter(obj)
+    if not filters and category and (mask & CATEGORY_DEFAULT):
+        return None
+    get = filters.get
+
+    def accepts(other):
+        other_category, other_mask = get(other, _DEFAULT_FILTER)
+        return bool(category & other_mask) and bool(other_category & mask)
+    return accepts
+
+
+def _match_category_pairs(category_a, category_b, category_pairs):
+    # 1 if (a, b) matches a requested pair, -1 if (b, a) does, else 0
+    for x, y in category_pairs:
+        if category_a & x and category_b & y:
+            return 1
+        if category_b & x and category_a & y:
+            return -1
+    return 0
+
+
+def _make_pair_filter(filters, category_pairs):
+    # Returns None when all pairs of known objects are to be reported, else
+    # a function f(a, b) giving 0 to discard the pair, 1 to report it as
+    # (a, b) and -1 to report it as (b, a)
+    if not filters and category_pairs is None:
+        return None
+    get = filters.get
+
+    def pair_filter(a, b):
+        category_a, mask_a = get(a, _DEFAULT_FILTER)
+        category_b, mask_b = get(b, _DEFAULT_FILTER)
+        if not (category_a & mask_b and category_b & mask_a):
+            return 0
+        if category_pairs is None:
+            return 1
+        return _match_category_pairs(category_a, category_b, category_pairs)
+    return pair_filter
+
+
+def _update_contacts(previous, pairs):
+    # previous maps pair key -> pair as reported; returns the new map and
+    # the began, persisted, ended lists
+    current = {}
+    began = []
+    persisted = []
+    for pair in pairs:
+        a, b = pair
+        key = (a, b) if id(a) < id(b) else (b, a)
+        current[key] = pair
+        if key in previous:
+            persisted.append(pair)
+        else:
+            began.append(pair)
+    if len(previous) == len(persisted):
+        ended = []
+    else:
+        ended = [pair for key, pair in previous.items() if key not in current]
+    return current, began, persisted, ended
+
+
+class _KNearest(object):
+    """
+    Keeps the k best (other, distance) candidates seen when answering
+    k_nearest
+    """
+    def __init__(self, k, max_distance):
+        self.k = k
+        self.max_distance = max_distance
+        # max-heap by distance, entries (-distance, counter, other)
+        self.heap = []
+        self.counter = 0
+
+    def push(self, other, d):
+        if self.max_distance is not None and d > self.max_distance:
+            return
+        heap = self.heap
+        self.counter += 1
+        if len(heap) < self.k:
+            heapq.heappush(heap, (-d, self.counter, other))
+        elif d < -heap[0][0]:
+            heapq.heapreplace(heap, (-d, self.counter, other))
+
+    def done(self, lower_bound):
+        """True if no object at distance >= lower_bound can be an answer"""
+        if self.max_distance is not None and lower_bound > self.max_distance:
+            return True
+        heap = self.heap
+        return len(heap) == self.k and -heap[0][0] <= lower_bound
+
+    def result(self):
+        res = [(other, -neg_d) for neg_d, counter, other in self.heap]
+        res.sort(key=op.itemgetter(1))
+        return res
+
+
 # CollisionManager implementations #######################################
 
 
@@ -563,49 +1506,71 @@ class CollisionManagerBruteForce(CollisionManager):
 
     def __init__(self):
         self.objs = set()
+        # obj -> (category, mask), only for non default values
+        self.filters = {}
+        # pair key -> pair, the collisions seen by the last update_contacts
+        self.contacts = {}
 
     def add(self, obj):
         # ? use weakref ? python 2.7 has weakset
         self.objs.add(obj)
+        _store_filter(self.filters, obj)
 
     def remove_tricky(self, obj):
         self.objs.remove(obj)
+        self.filters.pop(obj, None)
 
     def clear(self):
         self.objs.clear()
+        self.filters.clear()
+
+    def _others(self, obj):
+        # known objects, except obj, that can interact with obj
+        accepts = _make_accepts(self.filters, obj)
+        if accepts is None:
+            return [other for other in self.objs if other is not obj]
+        return [other for other in self.objs if
+                other is not obj and accepts(other)]
+
+    def update(self, obj):
+        # nothing stored depends on obj.cshape
+        pass
+
+    def update_many(self, objs):
+        pass
 
     def they_collide(self, obj1, obj2):
-        return obj1.cshape.overlaps(obj2.cshape)
+        return (categories_collide(collision_filter(obj1),
+                                   collision_filter(obj2)) and
+                obj1.cshape.overlaps(obj2.cshape))
 
     def objs_colliding(self, obj):
         f_overlaps = obj.cshape.overlaps
-        return [other for other in self.objs if
-                (other is not obj) and f_overlaps(other.cshape)]
+        return [other for other in self._others(obj) if
+                f_overlaps(other.cshape)]
 
     def iter_colliding(self, obj):
         f_overlaps = obj.cshape.overlaps
-        for other in self.objs:
-            if other is not obj and f_overlaps(other.cshape):
+        for other in self._others(obj):
+            if f_overlaps(other.cshape):
                 yield other
 
     def any_near(self, obj, near_distance):
         f_near_than = obj.cshape.near_than
-        for other in self.objs:
-            if other is not obj and f_near_than(other.cshape, near_distance):
+        for other in self._others(obj):
+            if f_near_than(other.cshape, near_distance):
                 return other
         return None
 
     def objs_near(self, obj, near_distance):
         f_near_than = obj.cshape.near_than
-        return [other for other in self.objs if
-                (other is not obj) and f_near_than(other.cshape, near_distance)]
+        return [other for other in self._others(obj) if
+                f_near_than(other.cshape, near_distance)]
 
     def objs_near_wdistance(self, obj, near_distance):
         f_distance = obj.cshape.distance
         res = []
-        for other in self.objs:
-            if other is obj:
-                continue
+        for other in self._others(obj):
             d = f_distance(other.cshape)
             if d <= near_distance:
                 res.append((other, d))
@@ -625,15 +1590,103 @@ def ranked_objs_near(self, obj, near_distance):
         tmp.sort(key=op.itemgetter(1))
         return tmp
 
-    def iter_all_collisions(self):
+    def k_nearest(self, obj, k, max_distance=None):
+        # best first: the others are visited in increasing AABB gap, and the
+        # visit ends when no remaining other can improve the answer
+        if k < 1:
+            return []
+        aabb = obj.cshape.minmax()
+        candidates = [(aabb_gap(aabb, other.cshape.minmax()), other)
+                      for other in self._others(obj)]
+        candidates.sort(key=op.itemgetter(0))
+        f_distance = obj.cshape.distance
+        best = _KNearest(k, max_distance)
+        for lower_bound, other in candidates:
+            if best.done(lower_bound):
+                break
+            best.push(other, f_distance(other.cshape))
+        return best.result()
+
+    def nearest(self, obj, max_distance=None):
+        res = self.k_nearest(obj, 1, max_distance)
+        return res[0][0] if res else None
+
+    def objs_colliding_many(self, objs):
+        res = []
+        for i, obj in enumerate(objs):
+            res.extend((i, other) for other in self.objs_colliding(obj))
+        return res
+
+    def objs_near_many(self, objs, near_distance):
+        res = []
+        for i, obj in enumerate(objs):
+            res.extend((i, other) for other in
+                       self.objs_near(obj, near_distance))
+        return res
+
+    def objs_touching_points(self, points):
+        res = []
+        for obj in self.objs:
+            f_touches_point = obj.cshape.touches_point
+            for i, (x, y) in enumerate(points):
+                if f_touches_point(x, y):
+                    res.append((i, obj))
+        return res
+
+    def raycast(self, origin, direction, max_distance=None):
+        ray = _normalized_ray(direction, max_distance)
+        if ray is None:
+            return []
+        direction, max_distance = ray
+        hits = []
+        for obj in self.objs:
+            t = obj.cshape.ray_hit(origin, direction)
+            if t is not None and t <= max_distance:
+                hits.append((obj, t))
+        hits.sort(key=op.itemgetter(1))
+        return hits
+
+    def segment_hits(self, p0, p1):
+        direction = (p1[0] - p0[0], p1[1] - p0[1])
+        return self.raycast(p0, direction, math.sqrt(direction[0] ** 2 +
+                                                     direction[1] ** 2))
+
+    def sweep_hits(self, obj, displacement):
+        cshape = obj.cshape
+        hits = []
+        for other in self._others(obj):
+            t = time_of_impact(cshape, displacement, other.cshape)
+            if t is not None:
+                hits.append((other, t))
+        hits.sort(key=op.itemgetter(1))
+        return hits
+
+    def iter_all_collisions(self, category_pairs=None):
         # O(n**2)
+        pair_filter = _make_pair_filter(self.filters, category_pairs)
+        order = 1
         for i, obj in enumerate(self.objs):
             f_overlaps = obj.cshape.overlaps
             for j, other in enumerate(self.objs):
                 if j >= i:
                     break
+                if pair_filter is not None:
+                    order = pair_filter(obj, other)
+                    if not order:
+                        continue
                 if f_overlaps(other.cshape):
-                    yield (obj, other)
+                    if order > 0:
+                        yield (obj, other)
+                    else:
+                        yield (other, obj)
+
+    def update_contacts(self, category_pairs=None):
+        self.contacts, began, persisted, ended = _update_contacts(
+            self.contacts, self.iter_all_collisions(category_pairs))
+        return began, persisted, ended
+
+    def forget_contacts(self):
+        self.contacts = {}
 
     def knows(self, obj):
         return obj in self.objs
@@ -709,35 +1762,83 @@ def __init__(self, xmin, xmax, ymin, ymax, cell_width, cell_height):
         numbuckets = cols * rows
         # buckets maps cell identifier -> objs that potentially overlaps the cell
         self.buckets = [set() for k in range(numbuckets)]
+        # obj -> (ix_lo, ix_sup, iy_lo, iy_sup), the cells where obj is stored
+        self.cells = {}
+        # obj -> (category, mask), only for non default values
+        self.filters = {}
+        # pair key -> pair, the collisions seen by the last update_contacts
+        self.contacts = {}
 
     def add(self, obj):
         # add to any bucket it overlaps
         # for the collision logic algorithm is fine if a number of buckets
         # that don't overlap are included; this allows to use a faster
         # 'buckets_for_objects' at the cost of potentially some extra buckets
-        for cell_idx in self._iter_cells_for_aabb(obj.cshape.minmax()):
+        _store_filter(self.filters, obj)
+        if obj in self.cells:
+            self.update(obj)
+            return
+        cell_range = self._cell_range(obj.cshape.minmax())
+        self.cells[obj] = cell_range
+        for cell_idx in self._iter_cells_for_range(cell_range):
             self.buckets[cell_idx].add(obj)
 
     def remove_tricky(self, obj):
-        for cell_idx in self._iter_cells_for_aabb(obj.cshape.minmax()):
+        # the cells are remembered, so it is safe even if obj.cshape changed
+        for cell_idx in self._iter_cells_for_range(self.cells.pop(obj)):
             self.buckets[cell_idx].remove(obj)
+        self.filters.pop(obj, None)
 
     def clear(self):
         for bucket in self.buckets:
             bucket.clear()
+        self.cells.clear()
+        self.filters.clear()
+
+    def update(self, obj):
+        old = self.cells[obj]
+        new = self._cell_range(obj.cshape.minmax())
+        if new == old:
+            # the common case for small displacements
+            return
+        self.cells[obj] = new
+        buckets = self.buckets
+        cols = self.cols
+        ix_lo, ix_sup, iy_lo, iy_sup = new
+        for iy in range(old[2], old[3]):
+            keep_row = iy_lo <= iy < iy_sup
+            for ix in range(old[0], old[1]):
+                if not (keep_row and ix_lo <= ix < ix_sup):
+                    buckets[ix + iy * cols].remove(obj)
+        ix_lo, ix_sup, iy_lo, iy_sup = old
+        for iy in range(new[2], new[3]):
+            keep_row = iy_lo <= iy < iy_sup
+            for ix in range(new[0], new[1]):
+                if not (keep_row and ix_lo <= ix < ix_sup):
+                    buckets[ix + iy * cols].add(obj)
+
+    def update_many(self, objs):
+        update = self.update
+        for obj in objs:
+            update(obj)
 
     def they_collide(self, obj1, obj2):
-        return obj1.cshape.overlaps(obj2.cshape)
+        return (categories_collide(collision_filter(obj1),
+                                   collision_filter(obj2)) and
+                obj1.cshape.overlaps(obj2.cshape))
 
     def objs_colliding(self, obj):
         aabb = obj.cshape.minmax()
         f_overlaps = obj.cshape.overlaps
+        accepts = _make_accepts(self.filters, obj)
         collides = set()
         collides.add(obj)
         # do brute force with others in all the buckets obj overlaps
         for cell_id in self._iter_cells_for_aabb(aabb):
             for other in self.buckets[cell_id]:
-                if other not in collides and f_overlaps(other.cshape):
+                if (other not in collides and
+                        (accepts is None or accepts(other)) and
+                        f_overlaps(other.cshape)):
                     collides.add(other)
         collides.remove(obj)
         return collides
@@ -745,12 +1846,15 @@ def objs_colliding(self, obj):
     def iter_colliding(self, obj):
         aabb = obj.cshape.minmax()
         f_overlaps = obj.cshape.overlaps
+        accepts = _make_accepts(self.filters, obj)
         collides = set()
         collides.add(obj)
         # do brute force with others in all the buckets obj overlaps
         for cell_id in self._iter_cells_for_aabb(aabb):
             for other in self.buckets[cell_id]:
-                if (other not in collides) and f_overlaps(other.cshape):
+                if ((other not in collides) and
+                        (accepts is None or accepts(other)) and
+                        f_overlaps(other.cshape)):
                     collides.add(other)
                     yield other
 
@@ -761,10 +1865,12 @@ def any_near(self, obj, near_distance):
         miny -= near_distance
         maxy += near_distance
         f_distance = obj.cshape.distance
+        accepts = _make_accepts(self.filters, obj)
         # do brute force with others in all the buckets inflated shape overlaps
         for cell_id in self._iter_cells_for_aabb((minx, maxx, miny, maxy)):
             for other in self.buckets[cell_id]:
-                if other is not obj and f_distance(other.cshape) < near_distance:
+                if (other is not obj and (accepts is None or accepts(other)) and
+                        f_distance(other.cshape) < near_distance):
                     return other
         return None
 
@@ -775,11 +1881,14 @@ def objs_near(self, obj, near_distance):
         miny -= near_distance
         maxy += near_distance
         f_distance = obj.cshape.distance
+        accepts = _make_accepts(self.filters, obj)
         collides = set()
         # do brute force with others in all the buckets inflated shape overlaps
         for cell_id in self._iter_cells_for_aabb((minx, maxx, miny, maxy)):
             for other in self.buckets[cell_id]:
-                if other not in collides and (f_distance(other.cshape) < near_distance):
+                if (other not in collides and
+                        (accepts is None or accepts(other)) and
+                        (f_distance(other.cshape) < near_distance)):
                     collides.add(other)
         collides.discard(obj)
         return collides
@@ -791,12 +1900,14 @@ def objs_near_wdistance(self, obj, near_distance):
         miny -= near_distance
         maxy += near_distance
         f_distance = obj.cshape.distance
+        accepts = _make_accepts(self.filters, obj)
         collides = {}
         collides[obj] = 0.0
         # do brute force with others in all the buckets inflated shape overlaps
         for cell_id in self._iter_cells_for_aabb((minx, maxx, miny, maxy)):
             for other in self.buckets[cell_id]:
-                if other not in collides:
+                if other not in collides and (accepts is None or
+                                              accepts(other)):
                     d = f_distance(other.cshape)
                     if d <= near_distance:
                         collides[other] = d
@@ -809,9 +1920,258 @@ def ranked_objs_near(self, obj, near_distance):
         tmp.sort(key=op.itemgetter(1))
         return tmp
 
-    def iter_all_collisions(self):
+    def k_nearest(self, obj, k, max_distance=None):
+        # visits the cells in rings of increasing size around obj, stopping
+        # when the objects in the cells not yet visited can't be nearer than
+        # the k best found
+        if k < 1:
+            return []
+        aabb = obj.cshape.minmax()
+        minx, maxx, miny, maxy = aabb
+        xmin = self.xmin
+        ymin = self.ymin
+        cell_width = self.cell_width
+        cell_height = self.cell_height
+        cols = self.cols
+        rows = self.rows
+        buckets = self.buckets
+        ix_lo = int(math.floor((minx - xmin) / cell_width))
+        ix_sup = int(math.ceil((maxx - xmin) / cell_width))
+        iy_lo = int(math.floor((miny - ymin) / cell_height))
+        iy_sup = int(math.ceil((maxy - ymin) / cell_height))
+        f_distance = obj.cshape.distance
+        accepts = _make_accepts(self.filters, obj)
+        best = _KNearest(k, max_distance)
+        seen = set([obj])
+        inf = float('inf')
+        ring = 0
+        while True:
+            # visit the cells in the border of the ring rectangle
+            lo_x = ix_lo - ring
+            sup_x = ix_sup + ring
+            lo_y = iy_lo - ring
+            sup_y = iy_sup + ring
+            for iy in range(max(lo_y, 0), min(sup_y, rows)):
+                if ring == 0 or iy == lo_y or iy == sup_y - 1:
+                    row_cells = range(max(lo_x, 0), min(sup_x, cols))
+                else:
+                    row_cells = [ix for ix in (lo_x, sup_x - 1)
+                                 if 0 <= ix < cols]
+                for ix in row_cells:
+                    for other in buckets[ix + iy * cols]:
+                        if other not in seen:
+                            seen.add(other)
+                            if accepts is None or accepts(other):
+                                best.push(other, f_distance(other.cshape))
+
+            # objects in cells not visited are at least this far
+            lower_bound = inf
+            if lo_x > 0:
+                lower_bound = min(lower_bound, minx - (xmin + lo_x * cell_width))
+            if sup_x < cols:
+                lower_bound = min(lower_bound, (xmin + sup_x * cell_width) - maxx)
+            if lo_y > 0:
+                lower_bound = min(lower_bound, miny - (ymin + lo_y * cell_height))
+            if sup_y < rows:
+                lower_bound = min(lower_bound, (ymin + sup_y * cell_height) - maxy)
+            if lower_bound == inf or best.done(lower_bound):
+                break
+            ring += 1
+        return best.result()
+
+    def nearest(self, obj, max_distance=None):
+        res = self.k_nearest(obj, 1, max_distance)
+        return res[0][0] if res else None
+
+    def _candidates_many(self, aabbs):
+        # yields (i, candidates) with candidates the objects stored in the
+        # cells overlapping aabbs[i]; queries with the same cell range share
+        # the lookup
+        shared = {}
+        buckets = self.buckets
+        cols = self.cols
+        cell_range = self._cell_range
+        for i, aabb in enumerate(aabbs):
+            key = cell_range(aabb)
+            candidates = shared.get(key)
+            if candidates is None:
+                ix_lo, ix_sup, iy_lo, iy_sup = key
+                if ix_sup - ix_lo == 1 and iy_sup - iy_lo == 1:
+                    candidates = buckets[ix_lo + iy_lo * cols]
+                else:
+                    candidates = set()
+                    for iy in range(iy_lo, iy_sup):
+                        contrib_y = iy * cols
+                        for ix in range(ix_lo, ix_sup):
+                            candidates.update(buckets[ix + contrib_y])
+                shared[key] = candidates
+            yield i, candidates
+
+    def objs_colliding_many(self, objs):
+        res = []
+        append = res.append
+        aabbs = [obj.cshape.minmax() for obj in objs]
+        filters = self.filters
+        for i, candidates in self._candidates_many(aabbs):
+            obj = objs[i]
+            f_overlaps = obj.cshape.overlaps
+            accepts = _make_accepts(filters, obj)
+            for other in candidates:
+                if (other is not obj and (accepts is None or accepts(other)) and
+                        f_overlaps(other.cshape)):
+                    append((i, other))
+        return res
+
+    def objs_near_many(self, objs, near_distance):
+        res = []
+        append = res.append
+        aabbs = []
+        for obj in objs:
+            minx, maxx, miny, maxy = obj.cshape.minmax()
+            aabbs.append((minx - near_distance, maxx + near_distance,
+                          miny - near_distance, maxy + near_distance))
+        filters = self.filters
+        for i, candidates in self._candidates_many(aabbs):
+            obj = objs[i]
+            f_distance = obj.cshape.distance
+            accepts = _make_accepts(filters, obj)
+            for other in candidates:
+                if (other is not obj and (accepts is None or accepts(other)) and
+                        f_distance(other.cshape) <= near_distance):
+                    append((i, other))
+        return res
+
+    def objs_touching_points(self, points):
+        # group the points by cell, then test each cell's objects against the
+        # points in the cell
+        xmin = self.xmin
+        ymin = self.ymin
+        cell_width = self.cell_width
+        cell_height = self.cell_height
+        cols = self.cols
+        rows = self.rows
+        by_cell = {}
+        for i, (x, y) in enumerate(points):
+            ix = int(math.floor((x - xmin) / cell_width))
+            iy = int(math.floor((y - ymin) / cell_height))
+            if 0 <= ix < cols and 0 <= iy < rows:
+                by_cell.setdefault(ix + iy * cols, []).append((i, x, y))
+        res = []
+        append = res.append
+        buckets = self.buckets
+        for cell_id, cell_points in by_cell.items():
+            for obj in buckets[cell_id]:
+                f_touches_point = obj.cshape.touches_point
+                for i, x, y in cell_points:
+                    if f_touches_point(x, y):
+                        append((i, obj))
+        return res
+
+    def raycast(self, origin, direction, max_distance=None):
+        # walks the cells along the ray (DDA), so only the objects in cells
+        # touched by the ray are tested; as in the other questions, points
+        # outside the world bounds are disregarded
+        ray = _normalized_ray(direction, max_distance)
+        if ray is None:
+            return []
+        direction, max_distance = ray
+        xmin = self.xmin
+        ymin = self.ymin
+        cell_width = self.cell_width
+        cell_height = self.cell_height
+        cols = self.cols
+        rows = self.rows
+        interval = _ray_aabb_interval(origin, direction,
+                                      xmin, xmin + cols * cell_width,
+                                      ymin, ymin + rows * cell_height,
+                                      0.0, max_distance)
+        if interval is None:
+            return []
+        t_enter = interval[0]
+        ox, oy = origin
+        dx, dy = direction
+        ix = int(math.floor((ox + t_enter * dx - xmin) / cell_width))
+        iy = int(math.floor((oy + t_enter * dy - ymin) / cell_height))
+        ix = min(max(ix, 0), cols - 1)
+        iy = min(max(iy, 0), rows - 1)
+
+        inf = float('inf')
+        if dx > 0.0:
+            step_x = 1
+            t_max_x = (xmin + (ix + 1) * cell_width - ox) / dx
+            t_delta_x = cell_width / dx
+        elif dx < 0.0:
+            step_x = -1
+            t_max_x = (xmin + ix * cell_width - ox) / dx
+            t_delta_x = -cell_width / dx
+        else:
+            step_x = 0
+            t_max_x = t_delta_x = inf
+        if dy > 0.0:
+            step_y = 1
+            t_max_y = (ymin + (iy + 1) * cell_height - oy) / dy
+            t_delta_y = cell_height / dy
+        elif dy < 0.0:
+            step_y = -1
+            t_max_y = (ymin + iy * cell_height - oy) / dy
+            t_delta_y = -cell_height / dy
+        else:
+            step_y = 0
+            t_max_y = t_delta_y = inf
+
+        buckets = self.buckets
+        seen = set()
+        hits = []
+        while True:
+            for obj in buckets[ix + iy * cols]:
+                if obj not in seen:
+                    seen.add(obj)
+                    t = obj.cshape.ray_hit(origin, direction)
+                    if t is not None and t <= max_distance:
+                        hits.append((obj, t))
+            if t_max_x < t_max_y:
+                t_next = t_max_x
+                ix += step_x
+                t_max_x += t_delta_x
+            else:
+                t_next = t_max_y
+                iy += step_y
+                t_max_y += t_delta_y
+            if (t_next > max_distance or not (0 <= ix < cols) or
+                    not (0 <= iy < rows)):
+                break
+        hits.sort(key=op.itemgetter(1))
+        return hits
+
+    def segment_hits(self, p0, p1):
+        direction = (p1[0] - p0[0], p1[1] - p0[1])
+        return self.raycast(p0, direction, math.sqrt(direction[0] ** 2 +
+                                                     direction[1] ** 2))
+
+    def sweep_hits(self, obj, displacement):
+        cshape = obj.cshape
+        accepts = _make_accepts(self.filters, obj)
+        seen = set([obj])
+        hits = []
+        buckets = self.buckets
+        for cell_id in self._iter_cells_for_aabb(swept_aabb(cshape,
+                                                            displacement)):
+            for other in buckets[cell_id]:
+                if other not in seen:
+                    seen.add(other)
+                    if accepts is not None and not accepts(other):
+                        continue
+                    t = time_of_impact(cshape, displacement, other.cshape)
+                    if t is not None:
+                        hits.append((other, t))
+        hits.sort(key=op.itemgetter(1))
+        return hits
+
+    def iter_all_collisions(self, category_pairs=None):
         # implemented using the fact: 'a collides b' iff (there is a bucket B
         # with a in B, b in B and 'a collides b')
+        pair_filter = _make_pair_filter(self.filters, category_pairs)
+        order = 1
         known_collisions = set()
         for bucket in self.buckets:
             for i, obj in enumerate(bucket):
@@ -819,6 +2179,10 @@ def iter_all_collisions(self):
                 for j, other in enumerate(bucket):
                     if j >= i:
                         break
+                    if pair_filter is not None:
+                        order = pair_filter(obj, other)
+                        if not order:
+                            continue
                     if f_overlaps(other.cshape):
                         if id(obj) < id(other):
                             coll_id = (id(obj), id(other))
@@ -826,19 +2190,24 @@ def iter_all_collisions(self):
                             coll_id = (id(other), id(obj))
                         if coll_id not in known_collisions:
                             known_collisions.add(coll_id)
-                            yield (obj, other)
+                            if order > 0:
+                                yield (obj, other)
+                            else:
+                                yield (other, obj)
+
+    def update_contacts(self, category_pairs=None):
+        self.contacts, began, persisted, ended = _update_contacts(
+            self.contacts, self.iter_all_collisions(category_pairs))
+        return began, persisted, ended
+
+    def forget_contacts(self):
+        self.contacts = {}
 
     def knows(self, obj):
-        for bucket in self.buckets:
-            if obj in bucket:
-                return True
-        return False
+        return obj in self.cells
 
     def known_objs(self):
-        objs = set()
-        for bucket in self.buckets:
-            objs |= bucket
-        return objs
+        return set(self.cells)
 
     def objs_touching_point(self, x, y):
         touching = set()
@@ -858,8 +2227,9 @@ def objs_into_box(self, minx, maxx, miny, maxy):
                     into.add(obj)
         return into
 
-    def _iter_cells_for_aabb(self, aabb):
-        # iterate all buckets overlapping the rectangle minmax
+    def _cell_range(self, aabb):
+        # the cells overlapping the rectangle aabb, as
+        # (ix_lo, ix_sup, iy_lo, iy_sup)
         minx, maxx, miny, maxy = aabb
         ix_lo = int(math.floor((minx - self.xmin) / self.cell_width))
         ix_sup = int(math.ceil((maxx - self.xmin) / self.cell_width))
@@ -875,9 +2245,1266 @@ def _iter_cells_for_aabb(self, aabb):
             iy_lo = 0
         if iy_sup > self.rows:
             iy_sup = self.rows
+        return ix_lo, ix_sup, iy_lo, iy_sup
 
+    def _iter_cells_for_range(self, cell_range):
+        ix_lo, ix_sup, iy_lo, iy_sup = cell_range
         for iy in range(iy_lo, iy_sup):
             contrib_y = iy * self.cols
             for ix in range(ix_lo, ix_sup):
                 cell_id = ix + contrib_y
                 yield cell_id
+
+    def _iter_cells_for_aabb(self, aabb):
+        # iterate all buckets overlapping the rectangle minmax
+        return self._iter_cells_for_range(self._cell_range(aabb))
+
+
+# geometry kinds stored by CollisionManagerNumpy
+_KIND_CIRCLE = 0
+_KIND_AARECT = 1
+_KIND_OBB = 2
+_KIND_OTHER = 3
+
+
+def _shape_params(cshape):
+    """
+    Returns (kind, x, y, ex, ey) describing cshape for the array code.
+
+    For circles ex == ey == radius, for axis aligned rects ex, ey are the
+    half width and half height; any other cshape, OBBs included, is
+    described by its AABB.
+    """
+    if isinstance(cshape, CircleShape):
+        x, y = cshape.center
+        return _KIND_CIRCLE, x, y, cshape.r, cshape.r
+    elif isinstance(cshape, AARectShape):
+        x, y = cshape.center
+        return _KIND_AARECT, x, y, cshape.rx, cshape.ry
+    elif isinstance(cshape, OBBShape):
+        x, y = cshape.center
+        minx, maxx, miny, maxy = cshape.minmax()
+        return _KIND_OBB, x, y, (maxx - minx) * 0.5, (maxy - miny) * 0.5
+    minx, maxx, miny, maxy = cshape.minmax()
+    return (_KIND_OTHER, (minx + maxx) * 0.5, (miny + maxy) * 0.5,
+            (maxx - minx) * 0.5, (maxy - miny) * 0.5)
+
+
+def _np_overlaps(ka, xa, ya, ea, fa, kb, xb, yb, eb, fb):
+    """
+    Elementwise version of cshape.overlaps for circles and aarects.
+
+    Parameters are arrays (or scalars) as returned by _shape_params, for
+    shapes a and b; returns a boolean array. Pairs involving _KIND_OTHER
+    give meaningless values, the caller must handle them.
+    """
+    dx = numpy.abs(xb - xa)
+    dy = numpy.abs(yb - ya)
+    # circle - circle
+    cc = dx ** 2 + dy ** 2 < (ea + eb) ** 2
+    # aarect - aarect
+    rr = (dx < ea + eb) & (dy < fa + fb)
+    # aarect - circle: distance from circle center to nearest point in rect
+    a_is_rect = (ka == _KIND_AARECT)
+    gx = numpy.maximum(dx - numpy.where(a_is_rect, ea, eb), 0.0)
+    gy = numpy.maximum(dy - numpy.where(a_is_rect, fa, fb), 0.0)
+    rc = gx ** 2 + gy ** 2 < numpy.where(a_is_rect, eb, ea) ** 2
+    return numpy.where(ka == kb, numpy.where(ka == _KIND_CIRCLE, cc, rr), rc)
+
+
+def _box_params(cshape):
+    """
+    Returns (rx, ry, cos, sin) describing cshape as a rotated box for the
+    array code; circles are described as a box with rx == ry == radius.
+    """
+    if isinstance(cshape, OBBShape):
+        a = math.radians(cshape.rotation)
+        return cshape.rx, cshape.ry, math.cos(a), math.sin(a)
+    elif isinstance(cshape, CircleShape):
+        return cshape.r, cshape.r, 1.0, 0.0
+    elif isinstance(cshape, AARectShape):
+        return cshape.rx, cshape.ry, 1.0, 0.0
+    minx, maxx, miny, maxy = cshape.minmax()
+    return (maxx - minx) * 0.5, (maxy - miny) * 0.5, 1.0, 0.0
+
+
+def _np_box_overlaps(ka, xa, ya, ba, kb, xb, yb, bb):
+    """
+    Elementwise version of cshape.overlaps for pairs where at least one
+    shape is an OBB and the other is a circle, an aarect or an OBB.
+
+    ba, bb are arrays with rows as returned by _box_params; box - box pairs
+    use the separating axis theorem along the four box axes, box - circle
+    pairs use the circle center in the box frame.
+    """
+    dx = xb - xa
+    dy = yb - ya
+    rxa = ba[..., 0]
+    rya = ba[..., 1]
+    ca = ba[..., 2]
+    sa = ba[..., 3]
+    rxb = bb[..., 0]
+    ryb = bb[..., 1]
+    cb = bb[..., 2]
+    sb = bb[..., 3]
+    # box axes, for a clockwise rotation: u = (c, -s), v = (s, c)
+    uu = numpy.abs(ca * cb + sa * sb)
+    uv = numpy.abs(ca * sb - sa * cb)
+    vu = numpy.abs(sa * cb - ca * sb)
+    vv = numpy.abs(sa * sb + ca * cb)
+    du_a = dx * ca - dy * sa
+    dv_a = dx * sa + dy * ca
+    du_b = dx * cb - dy * sb
+    dv_b = dx * sb + dy * cb
+    bb_overlap = ((numpy.abs(du_a) < rxa + rxb * uu + ryb * uv) &
+                  (numpy.abs(dv_a) < rya + rxb * vu + ryb * vv) &
+                  (numpy.abs(du_b) < rxb + rxa * uu + rya * vu) &
+                  (numpy.abs(dv_b) < ryb + rxa * uv + rya * vv))
+    # box - circle: the circle center in the box frame, relative to the
+    # box center; the sign doesn't matter
+    a_is_box = ka != _KIND_CIRCLE
+    gx = numpy.maximum(numpy.abs(numpy.where(a_is_box, du_a, du_b)) -
+                       numpy.where(a_is_box, rxa, rxb), 0.0)
+    gy = numpy.maximum(numpy.abs(numpy.where(a_is_box, dv_a, dv_b)) -
+                       numpy.where(a_is_box, rya, ryb), 0.0)
+    bc_overlap = gx ** 2 + gy ** 2 < numpy.where(a_is_box, rxb, rxa) ** 2
+    return numpy.where(a_is_box & (kb != _KIND_CIRCLE), bb_overlap,
+                       bc_overlap)
+
+
+def _np_fix_box_overlaps(mask, ka, ga, ba, kb, gb, bb):
+    """
+    Sets in the _np_overlaps result mask the values for the pairs involving
+    OBBs; ga, gb have the centers in the first two columns, ba, bb are the
+    _box_params.
+    """
+    box = (((ka == _KIND_OBB) & (kb != _KIND_OTHER)) |
+           ((kb == _KIND_OBB) & (ka != _KIND_OTHER)))
+    k = numpy.nonzero(box)[0]
+    if len(k):
+        mask[k] = _np_box_overlaps(ka[k], ga[k, 0], ga[k, 1], ba[k],
+                                   kb[k], gb[k, 0], gb[k, 1], bb[k])
+
+
+def _np_distance(ka, xa, ya, ea, fa, kb, xb, yb, eb, fb):
+    """
+    Elementwise version of cshape.distance for circles and aarects, with the
+    same conventions as _np_overlaps.
+    """
+    dx = numpy.abs(xb - xa)
+    dy = numpy.abs(yb - ya)
+    # circle - circle
+    cc = numpy.sqrt(dx ** 2 + dy ** 2) - ea - eb
+    # aarect - aarect
+    rr = numpy.maximum(dx - ea - eb, dy - fa - fb)
+    # aarect - circle
+    a_is_rect = (ka == _KIND_AARECT)
+    gx = numpy.maximum(dx - numpy.where(a_is_rect, ea, eb), 0.0)
+    gy = numpy.maximum(dy - numpy.where(a_is_rect, fa, fb), 0.0)
+    rc = numpy.sqrt(gx ** 2 + gy ** 2) - numpy.where(a_is_rect, eb, ea)
+    d = numpy.where(ka == kb, numpy.where(ka == _KIND_CIRCLE, cc, rr), rc)
+    return numpy.maximum(d, 0.0)
+
+
+def _iter_ranges(lo, hi, chunk):
+    """
+    Expands the integer ranges [lo[k], hi[k]) into arrays (owner, value),
+    where owner is k for each value in the k-th range.
+    The result is yielded in pieces of about chunk elements, to bound the
+    memory used.
+    """
+    counts = numpy.maximum(hi - lo, 0)
+    cumulative = numpy.cumsum(counts)
+    n = len(counts)
+    start = 0
+    while start < n:
+        base = cumulative[start] - counts[start]
+        stop = int(numpy.searchsorted(cumulative, base + chunk, 'right'))
+        stop = min(max(stop, start + 1), n)
+        block = counts[start:stop]
+        total = int(block.sum())
+        if total:
+            owner = numpy.repeat(numpy.arange(start, stop), block)
+            first = numpy.cumsum(block) - block
+            value = (numpy.repeat(lo[start:stop] - first, block) +
+                     numpy.arange(total))
+            yield owner, value
+        start = stop
+
+
+class CollisionManagerNumpy(CollisionManager):
+    """
+    Implements the CollisionManager interface storing the known objects
+    geometry in contiguous numpy arrays, so questions are answered by
+    array operations instead of one python call per pair.
+
+    The all-pairs question (iter_all_collisions) is solved by a vectorized
+    sort and sweep along the axis with more spread; single object questions
+    only examine the objects in the sweep window that can overlap the
+    object's (maybe inflated) AABB.
+
+    CircleShape and AARectShape are handled entirely with array operations,
+    and so are the overlap questions involving OBBShape.
+    Other cshapes are accepted, their AABB is used in the broad phase and
+    their own methods in the narrow phase.
+
+    Needs numpy; collision_category and collision_mask must fit in a
+    signed 64 bits integer.
+
+    Look at CollisionManager for other class and methods documentation.
+    """
+
+    #: max number of candidate pairs processed at once by iter_all_collisions
+    pairs_chunk = 1 << 18
+
+    #: single object questions with less candidates than this use the
+    #: cshape methods instead of array operations
+    vectorize_threshold = 16
+
+    def __init__(self, capacity=64):
+        """
+        :Parameters:
+            `capacity` : int
+                initial size for the arrays, they will grow as needed
+        """
+        if numpy is None:
+            raise ImportError("CollisionManagerNumpy needs numpy")
+        self.objs = []
+        # obj -> index of obj data in the arrays
+        self.slots = {}
+        self.kinds = numpy.zeros(capacity, dtype=numpy.int8)
+        # per row: center x, center y, x half extent, y half extent
+        self.geom = numpy.zeros((capacity, 4), dtype=numpy.float64)
+        # per row: _box_params, used by OBBs and the shapes paired with them
+        self.boxes = numpy.zeros((capacity, 4), dtype=numpy.float64)
+        self.categories = numpy.zeros(capacity, dtype=numpy.int64)
+        self.masks = numpy.zeros(capacity, dtype=numpy.int64)
+        # obj -> (category, mask), only for non default values
+        self.filters = {}
+        # pair key -> pair, the collisions seen by the last update_contacts
+        self.contacts = {}
+        self._sorted = None
+
+    def _grow(self):
+        capacity = 2 * max(len(self.kinds), 1)
+        kinds = numpy.zeros(capacity, dtype=numpy.int8)
+        kinds[:len(self.kinds)] = self.kinds
+        geom = numpy.zeros((capacity, 4), dtype=numpy.float64)
+        geom[:len(self.geom)] = self.geom
+        boxes = numpy.zeros((capacity, 4), dtype=numpy.float64)
+        boxes[:len(self.boxes)] = self.boxes
+        categories = numpy.zeros(capacity, dtype=numpy.int64)
+        categories[:len(self.categories)] = self.categories
+        masks = numpy.zeros(capacity, dtype=numpy.int64)
+        masks[:len(self.masks)] = self.masks
+        self.kinds = kinds
+        self.geom = geom
+        self.boxes = boxes
+        self.categories = categories
+        self.masks = masks
+
+    def _store(self, i, obj):
+        kind, x, y, ex, ey = _shape_params(obj.cshape)
+        self.kinds[i] = kind
+        self.geom[i] = (x, y, ex, ey)
+        self.boxes[i] = _box_params(obj.cshape)
+
+    def add(self, obj):
+        i = self.slots.get(obj)
+        if i is None:
+            i = len(self.objs)
+            if i == len(self.kinds):
+                self._grow()
+            self.objs.append(obj)
+            self.slots[obj] = i
+        self._store(i, obj)
+        _store_filter(self.filters, obj)
+        self.categories[i], self.masks[i] = collision_filter(obj)
+        self._sorted = None
+
+    def remove_tricky(self, obj):
+        i = self.slots.pop(obj)
+        last = len(self.objs) - 1
+        if i != last:
+            moved = self.objs[last]
+            self.objs[i] = moved
+            self.slots[moved] = i
+            self.kinds[i] = self.kinds[last]
+            self.geom[i] = self.geom[last]
+            self.boxes[i] = self.boxes[last]
+            self.categories[i] = self.categories[last]
+            self.masks[i] = self.masks[last]
+        self.objs.pop()
+        self.filters.pop(obj, None)
+        self._sorted = None
+
+    def clear(self):
+        self.objs = []
+        self.slots.clear()
+        self.filters.clear()
+        self._sorted = None
+
+    def update(self, obj):
+        self._store(self.slots[obj], obj)
+        self._sorted = None
+
+    def update_many(self, objs):
+        slots = self.slots
+        idx = [slots[obj] for obj in objs]
+        if not idx:
+            return
+        params = numpy.array([_shape_params(obj.cshape) for obj in objs],
+                             dtype=numpy.float64)
+        self.kinds[idx] = params[:, 0]
+        self.geom[idx] = params[:, 1:]
+        self.boxes[idx] = [_box_params(obj.cshape) for obj in objs]
+        self._sorted = None
+
+    def they_collide(self, obj1, obj2):
+        return (categories_collide(collision_filter(obj1),
+                                   collision_filter(obj2)) and
+                obj1.cshape.overlaps(obj2.cshape))
+
+    def _get_sorted(self):
+        # known objects ordered by minx, used to find the candidates for
+        # single object questions
+        if self._sorted is None:
+            n = len(self.objs)
+            geom = self.geom[:n]
+            minx = geom[:, 0] - geom[:, 2]
+            order = numpy.argsort(minx)
+            max_ex = geom[:, 2].max() if n else 0.0
+            self._sorted = (order, minx[order], geom[order], max_ex)
+        return self._sorted
+
+    def _candidates(self, minx, maxx, miny, maxy):
+        # slots with AABB overlapping (borders included) the rect
+        order, sorted_minx, sorted_geom, max_ex = self._get_sorted()
+        lo = sorted_minx.searchsorted(minx - 2.0 * max_ex, 'left')
+        hi = sorted_minx.searchsorted(maxx, 'right')
+        g = sorted_geom[lo:hi]
+        mask = ((g[:, 0] + g[:, 2] >= minx) & (g[:, 1] - g[:, 3] <= maxy) &
+                (g[:, 1] + g[:, 3] >= miny))
+        return order[lo:hi][mask]
+
+    def _without(self, idx, obj):
+        # the slots in idx, except obj's, whose objects can interact with obj
+        i = self.slots.get(obj)
+        if i is not None:
+            idx = idx[idx != i]
+        category, mask = collision_filter(obj)
+        if self.filters or not category or not (mask & CATEGORY_DEFAULT):
+            idx = idx[((self.categories[idx] & mask) != 0) &
+                      ((self.masks[idx] & category) != 0)]
+        return idx
+
+    def _query_overlaps(self, obj, idx):
+        # slots in idx whose object overlaps obj
+        cshape = obj.cshape
+        objs = self.objs
+        if len(idx) < self.vectorize_threshold:
+            # array setup costs more than a few python calls
+            f_overlaps = cshape.overlaps
+            return [i for i in idx.tolist() if f_overlaps(objs[i].cshape)]
+        kind, x, y, ex, ey = _shape_params(cshape)
+        kinds = self.kinds[idx]
+        g = self.geom[idx]
+        mask = _np_overlaps(kind, x, y, ex, ey,
+                            kinds, g[:, 0], g[:, 1], g[:, 2], g[:, 3])
+        if kind == _KIND_OBB:
+            box_idx = numpy.nonzero(kinds != _KIND_OTHER)[0]
+        else:
+            box_idx = numpy.nonzero(kinds == _KIND_OBB)[0]
+        if len(box_idx):
+            b = idx[box_idx]
+            mask[box_idx] = _np_box_overlaps(
+                kind, x, y, numpy.array(_box_params(cshape)),
+                kinds[box_idx], g[box_idx, 0], g[box_idx, 1], self.boxes[b])
+        if kind == _KIND_OTHER:
+            slow_idx = range(len(idx))
+        else:
+            slow_idx = numpy.nonzero(kinds == _KIND_OTHER)[0]
+        if len(slow_idx):
+            f_overlaps = cshape.overlaps
+            for k in slow_idx:
+                mask[k] = f_overlaps(objs[idx[k]].cshape)
+        return idx[mask].tolist()
+
+    def _query_distances(self, obj, idx):
+        # distances from obj to the objects in slots idx
+        cshape = obj.cshape
+        kind, x, y, ex, ey = _shape_params(cshape)
+        kinds = self.kinds[idx]
+        g = self.geom[idx]
+        d = _np_distance(kind, x, y, ex, ey,
+                         kinds, g[:, 0], g[:, 1], g[:, 2], g[:, 3])
+        # distances involving polygons are not vectorized
+        if kind >= _KIND_OBB:
+            slow_idx = range(len(idx))
+        else:
+            slow_idx = numpy.nonzero(kinds >= _KIND_OBB)[0]
+        if len(slow_idx):
+            f_distance = cshape.distance
+            objs = self.objs
+            for k in slow_idx:
+                d[k] = f_distance(objs[idx[k]].cshape)
+        return d
+
+    def _near_candidates(self, obj, near_distance):
+        minx, maxx, miny, maxy = obj.cshape.minmax()
+        idx = self._candidates(minx - near_distance, maxx + near_distance,
+                               miny - near_distance, maxy + near_distance)
+        return self._without(idx, obj)
+
+    def objs_colliding(self, obj):
+        idx = self._without(self._candidates(*obj.cshape.minmax()), obj)
+        objs = self.objs
+        return [objs[i] for i in self._query_overlaps(obj, idx)]
+
+    def iter_colliding(self, obj):
+        for other in self.objs_colliding(obj):
+            yield other
+
+    def any_near(self, obj, near_distance):
+        idx = self._near_candidates(obj, near_distance)
+        d = self._query_distances(obj, idx)
+        near = numpy.nonzero(d <= near_distance)[0]
+        if len(near):
+            return self.objs[idx[near[0]]]
+        return None
+
+    def objs_near(self, obj, near_distance):
+        idx = self._near_candidates(obj, near_distance)
+        d = self._query_distances(obj, idx)
+        objs = self.objs
+        return [objs[i] for i in idx[d <= near_distance]]
+
+    def objs_near_wdistance(self, obj, near_distance):
+        idx = self._near_candidates(obj, near_distance)
+        d = self._query_distances(obj, idx)
+        mask = d <= near_distance
+        objs = self.objs
+        return [(objs[i], di) for i, di in zip(idx[mask].tolist(),
+                                               d[mask].tolist())]
+
+    def ranked_objs_near(self, obj, near_distance):
+        idx = self._near_candidates(obj, near_distance)
+        d = self._query_distances(obj, idx)
+        mask = d <= near_distance
+        idx = idx[mask]
+        d = d[mask]
+        order = numpy.argsort(d, kind='stable')
+        objs = self.objs
+        return [(objs[i], di) for i, di in zip(idx[order].tolist(),
+                                               d[order].tolist())]
+
+    def k_nearest(self, obj, k, max_distance=None):
+        if k < 1:
+            return []
+        if max_distance is None:
+            idx = self._without(numpy.arange(len(self.objs)), obj)
+        else:
+            idx = self._near_candidates(obj, max_distance)
+        if len(idx) > k and (_shape_params(obj.cshape)[0] >= _KIND_OBB or
+                             (self.kinds[idx] >= _KIND_OBB).any()):
+            idx, d = self._distances_by_gap(obj, idx, k)
+        else:
+            d = self._query_distances(obj, idx)
+        if max_distance is not None:
+            mask = d <= max_distance
+            idx = idx[mask]
+            d = d[mask]
+        if len(d) > k:
+            part = numpy.argpartition(d, k - 1)[:k]
+            idx = idx[part]
+            d = d[part]
+        order = numpy.argsort(d, kind='stable')
+        objs = self.objs
+        return [(objs[i], di) for i, di in zip(idx[order].tolist(),
+                                               d[order].tolist())]
+
+    def _distances_by_gap(self, obj, idx, k):
+        # when some distances are calculated in python, visit the slots in
+        # idx in increasing AABB gap, and stop when the remaining ones can't
+        # be nearer than the k-th best; returns (visited slots, distances)
+        minx, maxx, miny, maxy = obj.cshape.minmax()
+        g = self.geom[idx]
+        gap = numpy.maximum(
+            numpy.maximum(g[:, 0] - g[:, 2] - maxx, minx - g[:, 0] - g[:, 2]),
+            numpy.maximum(g[:, 1] - g[:, 3] - maxy, miny - g[:, 1] - g[:, 3]))
+        order = numpy.argsort(gap, kind='stable')
+        chunk = max(2 * k, 16)
+        visited = []
+        distances = []
+        kth = numpy.inf
+        start = 0
+        while start < len(order) and gap[order[start]] <= kth:
+            part = idx[order[start:start + chunk]]
+            visited.append(part)
+            distances.append(self._query_distances(obj, part))
+            start += chunk
+            d = numpy.concatenate(distances)
+            if len(d) >= k:
+                kth = numpy.partition(d, k - 1)[k - 1]
+        return numpy.concatenate(visited), numpy.concatenate(distances)
+
+    def nearest(self, obj, max_distance=None):
+        res = self.k_nearest(obj, 1, max_distance)
+        return res[0][0] if res else None
+
+    def _iter_candidate_pairs(self):
+        # sort and sweep; yields arrays (a, b) of slots whose AABBs overlap,
+        # each unordered pair seen once
+        n = len(self.objs)
+        if n < 2:
+            return
+        geom = self.geom[:n]
+        # sweep along the axis with more spread
+        if numpy.ptp(geom[:, 1]) > numpy.ptp(geom[:, 0]):
+            ax, ay = 1, 0
+        else:
+            ax, ay = 0, 1
+        lo = geom[:, ax] - geom[:, 2 + ax]
+        hi = geom[:, ax] + geom[:, 2 + ax]
+        order = numpy.argsort(lo)
+        s_lo = lo[order]
+        s_hi = hi[order]
+        # sorted positions i < j overlap along the sweep axis iff
+        # s_lo[j] <= s_hi[i]
+        ends = numpy.searchsorted(s_lo, s_hi, 'right')
+        for i, j in _iter_ranges(numpy.arange(1, n + 1), ends,
+                                 self.pairs_chunk):
+            a = order[i]
+            b = order[j]
+            mask = (numpy.abs(geom[a, ay] - geom[b, ay]) <=
+                    geom[a, 2 + ay] + geom[b, 2 + ay])
+            yield a[mask], b[mask]
+
+    def _filter_pairs(self, a, b, category_pairs):
+        # vectorized _make_pair_filter: keeps the pairs to report, swapping
+        # the ones to be reported as (b, a)
+        categories = self.categories
+        masks = self.masks
+        ca = categories[a]
+        cb = categories[b]
+        keep = ((ca & masks[b]) != 0) & ((cb & masks[a]) != 0)
+        if category_pairs is not None:
+            match = numpy.zeros(len(a), dtype=numpy.int8)
+            for x, y in category_pairs:
+                fwd = ((ca & x) != 0) & ((cb & y) != 0)
+                rev = ((cb & x) != 0) & ((ca & y) != 0)
+                match[(match == 0) & fwd] = 1
+                match[(match == 0) & rev] = -1
+            keep &= match != 0
+            swap = match == -1
+            a, b = numpy.where(swap, b, a), numpy.where(swap, a, b)
+        return a[keep], b[keep]
+
+    def iter_all_collisions(self, category_pairs=None):
+        objs = self.objs
+        kinds = self.kinds
+        geom = self.geom
+        filtering = bool(self.filters) or category_pairs is not None
+        for a, b in self._iter_candidate_pairs():
+            if filtering:
+                a, b = self._filter_pairs(a, b, category_pairs)
+            ka = kinds[a]
+            kb = kinds[b]
+            ga = geom[a]
+            gb = geom[b]
+            mask = _np_overlaps(ka, ga[:, 0], ga[:, 1], ga[:, 2], ga[:, 3],
+                                kb, gb[:, 0], gb[:, 1], gb[:, 2], gb[:, 3])
+            _np_fix_box_overlaps(mask, ka, ga, self.boxes[a], kb, gb,
+                                 self.boxes[b])
+            slow = numpy.nonzero((ka == _KIND_OTHER) | (kb == _KIND_OTHER))[0]
+            for k in slow:
+                mask[k] = objs[a[k]].cshape.overlaps(objs[b[k]].cshape)
+            for i, j in zip(a[mask].tolist(), b[mask].tolist()):
+                yield (objs[i], objs[j])
+
+    def _iter_candidates_many(self, minx, maxx, miny, maxy):
+        # batch version of _candidates, the params are arrays; yields
+        # arrays (q, idx) telling slot idx[k] is a candidate for query q[k]
+        order, sorted_minx, sorted_geom, max_ex = self._get_sorted()
+        lo = sorted_minx.searchsorted(minx - 2.0 * max_ex, 'left')
+        hi = sorted_minx.searchsorted(maxx, 'right')
+        for q, pos in _iter_ranges(lo, hi, self.pairs_chunk):
+            g = sorted_geom[pos]
+            mask = ((g[:, 0] + g[:, 2] >= minx[q]) &
+                    (g[:, 1] - g[:, 3] <= maxy[q]) &
+                    (g[:, 1] + g[:, 3] >= miny[q]))
+            yield q[mask], order[pos[mask]]
+
+    def _iter_pairs_many(self, objs, near_distance):
+        # yields arrays (q, idx, params) with the candidates for objs,
+        # excluding the trivial ones; params are the _shape_params for the
+        # queries, as columns
+        params = numpy.array([_shape_params(obj.cshape) for obj in objs],
+                             dtype=numpy.float64).reshape(-1, 5)
+        self_slots = numpy.array([self.slots.get(obj, -1) for obj in objs],
+                                 dtype=numpy.int64)
+        filters = [collision_filter(obj) for obj in objs]
+        filtering = bool(self.filters) or any(f != _DEFAULT_FILTER
+                                              for f in filters)
+        if filtering:
+            q_filters = numpy.array(filters, dtype=numpy.int64).reshape(-1, 2)
+        columns = params.T
+        unused, x, y, ex, ey = columns
+        m = near_distance
+        for q, idx in self._iter_candidates_many(x - ex - m, x + ex + m,
+                                                 y - ey - m, y + ey + m):
+            keep = idx != self_slots[q]
+            if filtering:
+                keep &= (((self.categories[idx] & q_filters[q, 1]) != 0) &
+                         ((self.masks[idx] & q_filters[q, 0]) != 0))
+            yield q[keep], idx[keep], columns
+
+    def objs_colliding_many(self, objs):
+        res = []
+        if not objs or not self.objs:
+            return res
+        known = self.objs
+        kinds = self.kinds
+        geom = self.geom
+        q_boxes = None
+        if (any(isinstance(obj.cshape, OBBShape) for obj in objs) or
+                (self.kinds[:len(known)] == _KIND_OBB).any()):
+            q_boxes = numpy.array([_box_params(obj.cshape) for obj in objs],
+                                  dtype=numpy.float64)
+        for q, idx, (qk, qx, qy, qe, qf) in self._iter_pairs_many(objs, 0.0):
+            qk = qk[q]
+            kb = kinds[idx]
+            g = geom[idx]
+            mask = _np_overlaps(qk, qx[q], qy[q], qe[q], qf[q],
+                                kb, g[:, 0], g[:, 1], g[:, 2], g[:, 3])
+            if q_boxes is not None:
+                centers = numpy.column_stack((qx[q], qy[q]))
+                _np_fix_box_overlaps(mask, qk, centers, q_boxes[q],
+                                     kb, g, self.boxes[idx])
+            slow = numpy.nonzero((qk == _KIND_OTHER) | (kb == _KIND_OTHER))[0]
+            for k in slow:
+                mask[k] = objs[q[k]].cshape.overlaps(known[idx[k]].cshape)
+            res.extend(zip(q[mask].tolist(),
+                           [known[i] for i in idx[mask].tolist()]))
+        return res
+
+    def objs_near_many(self, objs, near_distance):
+        res = []
+        if not objs or not self.objs:
+            return res
+        known = self.objs
+        kinds = self.kinds
+        geom = self.geom
+        for q, idx, (qk, qx, qy, qe, qf) in self._iter_pairs_many(
+                objs, near_distance):
+            qk = qk[q]
+            kb = kinds[idx]
+            g = geom[idx]
+            d = _np_distance(qk, qx[q], qy[q], qe[q], qf[q],
+                             kb, g[:, 0], g[:, 1], g[:, 2], g[:, 3])
+            slow = numpy.nonzero((qk >= _KIND_OBB) | (kb >= _KIND_OBB))[0]
+            for k in slow:
+                d[k] = objs[q[k]].cshape.distance(known[idx[k]].cshape)
+            mask = d <= near_distance
+            res.extend(zip(q[mask].tolist(),
+                           [known[i] for i in idx[mask].tolist()]))
+        return res
+
+    def objs_touching_points(self, points):
+        res = []
+        points = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 2)
+        if not len(points) or not self.objs:
+            return res
+        known = self.objs
+        px = points[:, 0]
+        py = points[:, 1]
+        for q, idx in self._iter_candidates_many(px, px, py, py):
+            kinds = self.kinds[idx]
+            g = self.geom[idx]
+            dx = g[:, 0] - px[q]
+            dy = g[:, 1] - py[q]
+            mask = numpy.where(kinds == _KIND_CIRCLE,
+                               numpy.sqrt(dx ** 2 + dy ** 2) <= g[:, 2],
+                               (numpy.abs(dx) < g[:, 2]) &
+                               (numpy.abs(dy) < g[:, 3]))
+            for k in numpy.nonzero(kinds >= _KIND_OBB)[0]:
+                mask[k] = known[idx[k]].cshape.touches_point(px[q[k]],
+                                                             py[q[k]])
+            res.extend(zip(q[mask].tolist(),
+                           [known[i] for i in idx[mask].tolist()]))
+        return res
+
+    def raycast(self, origin, direction, max_distance=None):
+        ray = _normalized_ray(direction, max_distance)
+        if ray is None or not self.objs:
+            return []
+        (dx, dy), max_distance = ray
+        ox, oy = origin
+        n = len(self.objs)
+        if max_distance == float('inf'):
+            idx = numpy.arange(n)
+        else:
+            ex = ox + dx * max_distance
+            ey = oy + dy * max_distance
+            idx = self._candidates(min(ox, ex), max(ox, ex),
+                                   min(oy, ey), max(oy, ey))
+        kinds = self.kinds[idx]
+        g = self.geom[idx]
+        mx = ox - g[:, 0]
+        my = oy - g[:, 1]
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            # circles, as in ray_hit_circle
+            c = mx ** 2 + my ** 2 - g[:, 2] ** 2
+            b = mx * dx + my * dy
+            discriminant = b * b - c
+            t_circle = numpy.where(
+                c <= 0.0, 0.0,
+                numpy.where((b < 0.0) & (discriminant >= 0.0),
+                            -b - numpy.sqrt(numpy.maximum(discriminant, 0.0)),
+                            numpy.inf))
+            # aarects, slabs as in ray_hit_aa_rect
+            t_enter = numpy.zeros(len(idx))
+            t_exit = numpy.full(len(idx), numpy.inf)
+            for o, d, center, r in ((ox, dx, g[:, 0], g[:, 2]),
+                                    (oy, dy, g[:, 1], g[:, 3])):
+                if d == 0.0:
+                    t_enter[numpy.abs(o - center) > r] = numpy.inf
+                    continue
+                t0 = (center - r - o) / d
+                t1 = (center + r - o) / d
+                t_enter = numpy.maximum(t_enter, numpy.minimum(t0, t1))
+                t_exit = numpy.minimum(t_exit, numpy.maximum(t0, t1))
+            t_rect = numpy.where(t_enter <= t_exit, t_enter, numpy.inf)
+        t = numpy.where(kinds == _KIND_CIRCLE, t_circle, t_rect)
+        objs = self.objs
+        for k in numpy.nonzero(kinds >= _KIND_OBB)[0]:
+            hit = objs[idx[k]].cshape.ray_hit(origin, (dx, dy))
+            t[k] = numpy.inf if hit is None else hit
+        mask = numpy.isfinite(t) & (t <= max_distance)
+        idx = idx[mask]
+        t = t[mask]
+        order = numpy.argsort(t, kind='stable')
+        return [(objs[i], ti) for i, ti in zip(idx[order].tolist(),
+                                               t[order].tolist())]
+
+    def segment_hits(self, p0, p1):
+        direction = (p1[0] - p0[0], p1[1] - p0[1])
+        return self.raycast(p0, direction, math.sqrt(direction[0] ** 2 +
+                                                     direction[1] ** 2))
+
+    def sweep_hits(self, obj, displacement):
+        cshape = obj.cshape
+        idx = self._without(self._candidates(*swept_aabb(cshape, displacement)),
+                            obj)
+        objs = self.objs
+        hits = []
+        for i in idx.tolist():
+            other = objs[i]
+            t = time_of_impact(cshape, displacement, other.cshape)
+            if t is not None:
+                hits.append((other, t))
+        hits.sort(key=op.itemgetter(1))
+        return hits
+
+    def update_contacts(self, category_pairs=None):
+        self.contacts, began, persisted, ended = _update_contacts(
+            self.contacts, self.iter_all_collisions(category_pairs))
+        return began, persisted, ended
+
+    def forget_contacts(self):
+        self.contacts = {}
+
+    def knows(self, obj):
+        return obj in self.slots
+
+    def known_objs(self):
+        return set(self.objs)
+
+    def objs_touching_point(self, x, y):
+        idx = self._candidates(x, x, y, y)
+        kinds = self.kinds[idx]
+        g = self.geom[idx]
+        dx = g[:, 0] - x
+        dy = g[:, 1] - y
+        mask = numpy.where(kinds == _KIND_CIRCLE,
+                           numpy.sqrt(dx ** 2 + dy ** 2) <= g[:, 2],
+                           (numpy.abs(dx) < g[:, 2]) & (numpy.abs(dy) < g[:, 3]))
+        objs = self.objs
+        for k in numpy.nonzero(kinds >= _KIND_OBB)[0]:
+            mask[k] = objs[idx[k]].cshape.touches_point(x, y)
+        return set(objs[i] for i in idx[mask])
+
+    def objs_into_box(self, minx, maxx, miny, maxy):
+        idx = self._candidates(minx, maxx, miny, maxy)
+        kinds = self.kinds[idx]
+        g = self.geom[idx]
+        # same expression for circles and aarects
+        mask = ((minx + g[:, 2] <= g[:, 0]) & (g[:, 0] <= maxx - g[:, 2]) &
+                (miny + g[:, 3] <= g[:, 1]) & (g[:, 1] <= maxy - g[:, 3]))
+        objs = self.objs
+        packed_box = minx, maxx, miny, maxy
+        for k in numpy.nonzero(kinds == _KIND_OTHER)[0]:
+            mask[k] = objs[idx[k]].cshape.fits_in_box(packed_box)
+        return set(objs[i] for i in idx[mask])
+
+
+class _TreeNode(object):
+    """
+    Node for CollisionManagerAABBTree.
+
+    Leaves store a known object and its fattened AABB, inner nodes the union
+    of its children AABBs.
+    """
+    __slots__ = ('minx', 'maxx', 'miny', 'maxy', 'parent', 'left', 'right',
+                 'height', 'obj', 'serial')
+
+    def __init__(self, minx, maxx, miny, maxy):
+        self.minx = minx
+        self.maxx = maxx
+        self.miny = miny
+        self.maxy = maxy
+        self.parent = None
+        self.left = None
+        self.right = None
+        self.height = 0
+        self.obj = None
+        self.serial = 0
+
+    def set_union(self, a, b):
+        self.minx = a.minx if a.minx < b.minx else b.minx
+        self.maxx = a.maxx if a.maxx > b.maxx else b.maxx
+        self.miny = a.miny if a.miny < b.miny else b.miny
+        self.maxy = a.maxy if a.maxy > b.maxy else b.maxy
+
+    def refit(self):
+        left = self.left
+        right = self.right
+        self.set_union(left, right)
+        self.height = 1 + max(left.height, right.height)
+
+
+def _union_perimeter(a, b):
+    # half the perimeter of the AABB containing the nodes a and b
+    return ((max(a.maxx, b.maxx) - min(a.minx, b.minx)) +
+            (max(a.maxy, b.maxy) - min(a.miny, b.miny)))
+
+
+class CollisionManagerAABBTree(CollisionManager):
+    """
+    Implements the CollisionManager interface with a dynamic bounding volume
+    hierarchy: a balanced binary tree whose leaves are the known objects,
+    and where each node stores an AABB containing all the objects below it.
+
+    Unlike CollisionManagerGrid it does not need to know the world bounds
+    and copes well with objects of very different sizes; questions cost
+    roughly log(number of known objects) plus the size of the answer.
+
+    Leaves store a fattened AABB, so update(obj) is almost free while
+    obj.cshape stays inside the fat AABB; otherwise the leaf is reinserted.
+
+    Look at CollisionManager for other class and methods documentation.
+    """
+
+    def __init__(self, margin=0.0, margin_ratio=0.25):
+        """
+        The fattened AABB for an object grows each side of the object's AABB
+        by margin + margin_ratio * (greater half side of the object's AABB)
+
+        :Parameters:
+            `margin` : float
+                fixed part of the fattening
+            `margin_ratio` : float
+                fattening proportional to the object size
+        """
+        self.margin = margin
+        self.margin_ratio = margin_ratio
+        self.root = None
+        # obj -> leaf node
+        self.leaves = {}
+        self._serial = 0
+        # obj -> (category, mask), only for non default values
+        self.filters = {}
+        # pair key -> pair, the collisions seen by the last update_contacts
+        self.contacts = {}
+
+    def _make_leaf(self, obj):
+        minx, maxx, miny, maxy = obj.cshape.minmax()
+        half = max(maxx - minx, maxy - miny) * 0.5
+        m = self.margin + self.margin_ratio * half
+        leaf = _TreeNode(minx - m, maxx + m, miny - m, maxy + m)
+        leaf.obj = obj
+        self._serial += 1
+        leaf.serial = self._serial
+        return leaf
+
+    def _insert_leaf(self, leaf):
+        if self.root is None:
+            self.root = leaf
+            return
+
+        # find the best sibling, using the surface area heuristic
+        node = self.root
+        while node.height > 0:
+            left = node.left
+            right = node.right
+            area = (node.maxx - node.minx) + (node.maxy - node.miny)
+            combined = _union_perimeter(node, leaf)
+            # cost of creating a new parent for node and leaf
+            cost = 2.0 * combined
+            # minimum cost of pushing leaf further down the tree
+            inheritance = 2.0 * (combined - area)
+            cost_left = _union_perimeter(left, leaf) + inheritance
+            if left.height > 0:
+                cost_left -= (left.maxx - left.minx) + (left.maxy - left.miny)
+            cost_right = _union_perimeter(right, leaf) + inheritance
+            if right.height > 0:
+                cost_right -= ((right.maxx - right.minx) +
+                               (right.maxy - right.miny))
+            if cost < cost_left and cost < cost_right:
+                break
+            node = left if cost_left < cost_right else right
+
+        sibling = node
+        old_parent = sibling.parent
+        new_parent = _TreeNode(0.0, 0.0, 0.0, 0.0)
+        new_parent.parent = old_parent
+        new_parent.set_union(leaf, sibling)
+        new_parent.height = sibling.height + 1
+        if old_parent is None:
+            self.root = new_parent
+        elif old_parent.left is sibling:
+            old_parent.left = new_parent
+        else:
+            old_parent.right = new_parent
+        new_parent.left = sibling
+        new_parent.right = leaf
+        sibling.parent = new_parent
+        leaf.parent = new_parent
+        self._fix_upwards(new_parent)
+
+    def _remove_leaf(self, leaf):
+        if leaf is self.root:
+            self.root = None
+            return
+        parent = leaf.parent
+        grand_parent = parent.parent
+        sibling = parent.right if parent.left is leaf else parent.left
+        leaf.parent = None
+        if grand_parent is None:
+            self.root = sibling
+            sibling.parent = None
+            return
+        if grand_parent.left is parent:
+            grand_parent.left = sibling
+        else:
+            grand_parent.right = sibling
+        sibling.parent = grand_parent
+        self._fix_upwards(grand_parent)
+
+    def _fix_upwards(self, node):
+        # refit AABBs and heights from node to root, balancing on the way
+        while node is not None:
+            node = self._balance(node)
+            node.refit()
+            node = node.parent
+
+    def _balance(self, a):
+        # if a is unbalanced rotate the higher child up; returns the node now
+        # in the position of a
+        if a.height < 2:
+            return a
+        b = a.left
+        c = a.right
+        balance = c.height - b.height
+        if balance > 1:
+            return self._rotate_up(a, c, b, 'right')
+        if balance < -1:
+            return self._rotate_up(a, b, c, 'left')
+        return a
+
+    def _rotate_up(self, a, up, other, side):
+        # up, a child of a at side, replaces a; a keeps other and the lower
+        # child of up, and becomes a child of up
+        f = up.left
+        g = up.right
+        up.left = a
+        up.parent = a.parent
+        a.parent = up
+        if up.parent is None:
+            self.root = up
+        elif up.parent.left is a:
+            up.parent.left = up
+        else:
+            up.parent.right = up
+        if f.height > g.height:
+            high, low = f, g
+        else:
+            high, low = g, f
+        up.right = high
+        setattr(a, side, low)
+        low.parent = a
+        a.refit()
+        up.refit()
+        return up
+
+    def add(self, obj):
+        if obj in self.leaves:
+            _store_filter(self.filters, obj)
+            self.update(obj)
+            return
+        _store_filter(self.filters, obj)
+        leaf = self._make_leaf(obj)
+        self.leaves[obj] = leaf
+        self._insert_leaf(leaf)
+
+    def remove_tricky(self, obj):
+        # the leaf is remembered, so it is safe even if obj.cshape changed
+        self._remove_leaf(self.leaves.pop(obj))
+        self.filters.pop(obj, None)
+
+    def clear(self):
+        self.root = None
+        self.leaves.clear()
+        self.filters.clear()
+
+    def update(self, obj):
+        leaf = self.leaves[obj]
+        minx, maxx, miny, maxy = obj.cshape.minmax()
+        if (leaf.minx <= minx and maxx <= leaf.maxx and
+                leaf.miny <= miny and maxy <= leaf.maxy):
+            # still inside the fattened AABB
+            return
+        self._remove_leaf(leaf)
+        leaf = self._make_leaf(obj)
+        self.leaves[obj] = leaf
+        self._insert_leaf(leaf)
+
+    def update_many(self, objs):
+        update = self.update
+        for obj in objs:
+            update(obj)
+
+    def they_collide(self, obj1, obj2):
+        return (categories_collide(collision_filter(obj1),
+                                   collision_filter(obj2)) and
+                obj1.cshape.overlaps(obj2.cshape))
+
+    def _iter_leaves_for_aabb(self, minx, maxx, miny, maxy):
+        # leaves with fat AABB overlapping (borders included) the rect
+        if self.root is None:
+            return
+        stack = [self.root]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            node = pop()
+            if (node.minx > maxx or node.maxx < minx or
+                    node.miny > maxy or node.maxy < miny):
+                continue
+            if node.height == 0:
+                yield node
+            else:
+                push(node.left)
+                push(node.right)
+
+    def _iter_others(self, obj, minx, maxx, miny, maxy):
+        # objects, except obj, that can interact with obj and are in leaves
+        # with fat AABB overlapping the rect
+        accepts = _make_accepts(self.filters, obj)
+        for leaf in self._iter_leaves_for_aabb(minx, maxx, miny, maxy):
+            other = leaf.obj
+            if other is not obj and (accepts is None or accepts(other)):
+                yield other
+
+    def objs_colliding(self, obj):
+        return list(self.iter_colliding(obj))
+
+    def iter_colliding(self, obj):
+        f_overlaps = obj.cshape.overlaps
+        for other in self._iter_others(obj, *obj.cshape.minmax()):
+            if f_overlaps(other.cshape):
+                yield other
+
+    def _iter_near_others(self, obj, near_distance):
+        minx, maxx, miny, maxy = obj.cshape.minmax()
+        return self._iter_others(obj, minx - near_distance,
+                                 maxx + near_distance,
+                                 miny - near_distance,
+                                 maxy + near_distance)
+
+    def any_near(self, obj, near_distance):
+        f_near_than = obj.cshape.near_than
+        for other in self._iter_near_others(obj, near_distance):
+            if f_near_than(other.cshape, near_distance):
+                return other
+        return None
+
+    def objs_near(self, obj, near_distance):
+        f_near_than = obj.cshape.near_than
+        return [other for other in self._iter_near_others(obj, near_distance)
+                if f_near_than(other.cshape, near_distance)]
+
+    def objs_near_wdistance(self, obj, near_distance):
+        f_distance = obj.cshape.distance
+        res = []
+        for other in self._iter_near_others(obj, near_distance):
+            d = f_distance(other.cshape)
+            if d <= near_distance:
+                res.append((other, d))
+        return res
+
+    def ranked_objs_near(self, obj, near_distance):
+        tmp = self.objs_near_wdistance(obj, near_distance)
+        tmp.sort(key=op.itemgetter(1))
+        return tmp
+
+    def k_nearest(self, obj, k, max_distance=None):
+        # best first traversal; the priority queue holds nodes keyed by the
+        # gap to their AABB and objects keyed by their exact distance, so
+        # when an object is popped no unvisited object can be nearer
+        if k < 1 or self.root is None:
+            return []
+        aabb = obj.cshape.minmax()
+        f_distance = obj.cshape.distance
+        accepts = _make_accepts(self.filters, obj)
+        counter = 0
+        queue = [(0.0, counter, self.root, None)]
+        res = []
+        while queue:
+            d, unused, node, other = heapq.heappop(queue)
+            if max_distance is not None and d > max_distance:
+                break
+            if other is not None:
+                res.append((other, d))
+                if len(res) == k:
+                    break
+            elif node.height == 0:
+                if node.obj is not obj and (accepts is None or
+                                            accepts(node.obj)):
+                    counter += 1
+                    heapq.heappush(queue, (f_distance(node.obj.cshape),
+                                           counter, None, node.obj))
+            else:
+                for child in (node.left, node.right):
+                    counter += 1
+                    gap = aabb_gap(aabb, (child.minx, child.maxx,
+                                          child.miny, child.maxy))
+                    heapq.heappush(queue, (gap, counter, child, None))
+        return res
+
+    def nearest(self, obj, max_distance=None):
+        res = self.k_nearest(obj, 1, max_distance)
+        return res[0][0] if res else None
+
+    def objs_colliding_many(self, objs):
+        res = []
+        for i, obj in enumerate(objs):
+            res.extend((i, other) for other in self.iter_colliding(obj))
+        return res
+
+    def objs_near_many(self, objs, near_distance):
+        res = []
+        for i, obj in enumerate(objs):
+            res.extend((i, other) for other in
+                       self.objs_near(obj, near_distance))
+        return res
+
+    def objs_touching_points(self, points):
+        res = []
+        iter_leaves = self._iter_leaves_for_aabb
+        for i, (x, y) in enumerate(points):
+            for leaf in iter_leaves(x, x, y, y):
+                if leaf.obj.cshape.touches_point(x, y):
+                    res.append((i, leaf.obj))
+        return res
+
+    def raycast(self, origin, direction, max_distance=None):
+        ray = _normalized_ray(direction, max_distance)
+        if ray is None or self.root is None:
+            return []
+        direction, max_distance = ray
+        hits = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if _ray_aabb_interval(origin, direction, node.minx, node.maxx,
+                                  node.miny, node.maxy,
+                                  0.0, max_distance) is None:
+                continue
+            if node.height == 0:
+                t = node.obj.cshape.ray_hit(origin, direction)
+                if t is not None and t <= max_distance:
+                    hits.append((node.obj, t))
+            else:
+                stack.append(node.left)
+                stack.append(node.right)
+        hits.sort(key=op.itemgetter(1))
+        return hits
+
+    def segment_hits(self, p0, p1):
+        direction = (p1[0] - p0[0], p1[1] - p0[1])
+        return self.raycast(p0, direction, math.sqrt(direction[0] ** 2 +
+                                                     direction[1] ** 2))
+
+    def sweep_hits(self, obj, displacement):
+        cshape = obj.cshape
+        hits = []
+        for other in self._iter_others(obj, *swept_aabb(cshape, displacement)):
+            t = time_of_impact(cshape, displacement, other.cshape)
+            if t is not None:
+                hits.append((other, t))
+        hits.sort(key=op.itemgetter(1))
+        return hits
+
+    def iter_all_collisions(self, category_pairs=None):
+        # each leaf asks for the leaves overlapping it; to not report a pair
+        # twice only leaves with greater serial are considered
+        pair_filter = _make_pair_filter(self.filters, category_pairs)
+        order = 1
+        iter_leaves = self._iter_leaves_for_aabb
+        for leaf in list(self.leaves.values()):
+            obj = leaf.obj
+            f_overlaps = obj.cshape.overlaps
+            serial = leaf.serial
+            for other_leaf in iter_leaves(*obj.cshape.minmax()):
+                if other_leaf.serial <= serial:
+                    continue
+                other = other_leaf.obj
+                if pair_filter is not None:
+                    order = pair_filter(obj, other)
+                    if not order:
+                        continue
+                if f_overlaps(other.cshape):
+                    if order > 0:
+                        yield (obj, other)
+                    else:
+                        yield (other, obj)
+
+    def update_contacts(self, category_pairs=None):
+        self.contacts, began, persisted, ended = _update_contacts(
+            self.contacts, self.iter_all_collisions(category_pairs))
+        return began, persisted, ended
+
+    def forget_contacts(self):
+        self.contacts = {}
+
+    def knows(self, obj):
+        return obj in self.leaves
+
+    def known_objs(self):
+        return set(self.leaves)
+
+    def objs_touching_point(self, x, y):
+        touching = set()
+        for leaf in self._iter_leaves_for_aabb(x, x, y, y):
+            if leaf.obj.cshape.touches_point(x, y):
+                touching.add(leaf.obj)
+        return touching
+
+    def objs_into_box(self, minx, maxx, miny, maxy):
+        into = set()
+        packed_box = (minx, maxx, miny, maxy)
+        for leaf in self._iter_leaves_for_aabb(minx, maxx, miny, maxy):
+            if leaf.obj.cshape.fits_in_box(packed_box):
+                into.add(leaf.obj)
+        return into
@@ -111,6 +111,9 @@
 
     * ``self.scene``: The scene currently active
 
+    * ``director.action_manager``: Steps the actions of all the running nodes
+      from a single clock callback.
+
 """
 
 from __future__ import division, print_function, unicode_literals
@@ -127,6 +130,7 @@
 import pyglet.clock
 
 import cocos
+from cocos.action_manager import ActionManager
 import cocos.audio
 import cocos.custom_clocks
 import cocos.fps
@@ -734,6 +738,9 @@ def set_depth_test(self, on=True):
 """The singleton; check `cocos.director.Director` for details on usage.
 Don't instantiate Director(). Just use this singleton."""
 
+#: steps the actions of all the nodes, see :class:`cocos.action_manager.ActionManager`
+director.action_manager = ActionManager()
+
 director.interpreter_locals["director"] = director
 director.interpreter_locals["cocos"] = cocos
 
@@ -84,6 +84,20 @@ class ExceptionNoEmptyParticle(Exception):
 """Function generating a random float beween -1.0 and 1.0."""
 
 
+def rand_array(shape, rng=numpy.random):
+    """Random floats between -1.0 and 1.0, the vectorized :func:`rand`.
+
+    Arguments:
+        shape (int or tuple): shape of the returned array.
+        rng (numpy.random.RandomState): the random generator. Defaults to
+            numpy's global random state.
+
+    Returns:
+        numpy.ndarray: the random values.
+    """
+    return rng.random_sample(shape) * 2.0 - 1.0
+
+
 # PointerToNumpy by Gary Herron
 # from pyglet's user list
 def PointerToNumpy(a, ptype=ctypes.c_float):
@@ -103,6 +117,266 @@ def PointerToNumpy(a, ptype=ctypes.c_float):
     return a.ctypes.data_as(ctypes.POINTER(ptype))  # Ugly and undocumented!
 
 
+def create_stream_buffer(array, use_vbo=True):
+    """Creates a buffer with room for the contents of a numpy array.
+
+    Arguments:
+        array (numpy.array): The Numpy array the buffer will mirror.
+        use_vbo (bool): Use a vertex buffer object if the driver supports it,
+            else a client side vertex array.
+
+    Returns:
+        pyglet.graphics.vertexbuffer.AbstractBuffer: the buffer.
+    """
+    # imported here so that headless code never needs pyglet.graphics
+    from pyglet.graphics import vertexbuffer
+    return vertexbuffer.create_buffer(array.nbytes, usage=gl.GL_STREAM_DRAW,
+                                      vbo=use_vbo)
+
+
+def stream_to_buffer(buffer, array, count):
+    """Copies the first count rows of a numpy array to the start of buffer.
+
+    A vertex buffer object gets fresh storage before the copy (orphaning),
+    so the driver does not need to wait for draws still using the old data.
+
+    Arguments:
+        buffer (pyglet.graphics.vertexbuffer.AbstractBuffer): The destination.
+        array (numpy.array): The Numpy array, rows are copied from its start.
+        count (int): number of rows to copy.
+    """
+    if buffer.ptr == 0:
+        # a vbo; a vertex array has the memory address in ptr
+        buffer.set_data(None)
+    data = numpy.ascontiguousarray(array[:count])
+    if data.nbytes:
+        buffer.set_data_region(data.ctypes.data, 0, data.nbytes)
+
+
+# (program, (particle_size, particle_rotation, particle_rect) attribute
+# locations), shared by all the systems
+_sprite_shader = None
+
+
+def _get_sprite_shader():
+    """Returns the point sprites shader program and the locations of its
+    particle_size, particle_rotation and particle_rect attributes; the
+    program is compiled only once."""
+    global _sprite_shader
+    if _sprite_shader is None:
+        _sprite_shader = _create_sprite_shader()
+    return _sprite_shader
+
+
+def _create_sprite_shader():
+    """Compiles the point sprites shader program; returns it and the
+    locations of its particle_size, particle_rotation and particle_rect
+    attributes."""
+    vertex_code = """
+    #version 120
+    attribute float particle_size;
+    attribute float particle_rotation;
+    attribute vec4 particle_rect;
+    varying vec2 rotation;
+    varying vec4 rect;
+
+    void main()
+    {
+        gl_PointSize = particle_size;
+        gl_Position = ftransform();
+        gl_FrontColor = gl_Color;
+        float angle = radians(particle_rotation);
+        rotation = vec2(cos(angle), sin(angle));
+        rect = particle_rect;
+    }
+    """
+    frag_code = """
+    #version 120
+    uniform sampler2D sprite_texture;
+    varying vec2 rotation;
+    varying vec4 rect;
+
+    void main()
+    {
+        // clockwise on screen; gl_PointCoord y goes down
+        vec2 p = gl_PointCoord - vec2(0.5);
+        vec2 coord = vec2(rotation.x * p.x + rotation.y * p.y,
+                          rotation.x * p.y - rotation.y * p.x) + vec2(0.5);
+        if (any(lessThan(coord, vec2(0.0))) || any(greaterThan(coord, vec2(1.0))))
+            discard;
+        // the texture rect, (u0, v0, u1, v1), of the particle frame
+        gl_FragColor = gl_Color * texture2D(sprite_texture, mix(rect.xy, rect.zw, coord));
+    }
+    """
+    sprite_shader = ShaderProgram.simple_program('sprite', vertex_code, frag_code)
+    particle_size_idx = gl.glGetAttribLocation(sprite_shader.program, b'particle_size')
+    particle_rotation_idx = gl.glGetAttribLocation(sprite_shader.program,
+                                                   b'particle_rotation')
+    particle_rect_idx = gl.glGetAttribLocation(sprite_shader.program, b'particle_rect')
+    return sprite_shader, (particle_size_idx, particle_rotation_idx, particle_rect_idx)
+
+
+def _draw_point_sprites(sprite_shader, attribute_idxs, texture, blend_additive,
+                        buffers, count, rect=(0.0, 0.0, 1.0, 1.0)):
+    """Draws count point sprites from the buffers (position, color, size,
+    rotation and texture rect; the last two can be None) with the current
+    modelview. Without rotation buffer the sprites are not rotated, without
+    texture rect buffer all use rect. attribute_idxs are the shader
+    particle_size, particle_rotation and particle_rect locations."""
+    pos_buffer, color_buffer, size_buffer, rotation_buffer, rect_buffer = buffers
+    particle_size_idx, particle_rotation_idx, particle_rect_idx = attribute_idxs
+
+    # color preserve - at least nvidia 6150SE needs that
+    gl.glPushAttrib(gl.GL_CURRENT_BIT)
+    # glPointSize(self.get_scaled_particle_size())
+
+    gl.glEnable(gl.GL_TEXTURE_2D)
+    gl.glEnable(gl.GL_PROGRAM_POINT_SIZE)
+    # glBindTexture(GL_TEXTURE_2D, self.texture.id)
+
+
+    gl.glEnable(gl.GL_POINT_SPRITE)
+    gl.glTexEnvi(gl.GL_POINT_SPRITE, gl.GL_COORD_REPLACE, gl.GL_TRUE)
+
+    gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+    pos_buffer.bind()
+    gl.glVertexPointer(2, gl.GL_FLOAT, 0, pos_buffer.ptr)
+
+    gl.glEnableClientState(gl.GL_COLOR_ARRAY)
+    color_buffer.bind()
+    gl.glColorPointer(4, gl.GL_FLOAT, 0, color_buffer.ptr)
+
+    gl.glEnableVertexAttribArray(particle_size_idx)
+
+    size_buffer.bind()
+    gl.glVertexAttribPointer(particle_size_idx, 1, gl.GL_FLOAT,
+                             False, 0, size_buffer.ptr)
+    size_buffer.unbind()
+
+    if rotation_buffer is not None:
+        gl.glEnableVertexAttribArray(particle_rotation_idx)
+        rotation_buffer.bind()
+        gl.glVertexAttribPointer(particle_rotation_idx, 1, gl.GL_FLOAT,
+                                 False, 0, rotation_buffer.ptr)
+        rotation_buffer.unbind()
+    else:
+        gl.glVertexAttrib1f(particle_rotation_idx, 0.0)
+
+    if rect_buffer is not None:
+        gl.glEnableVertexAttribArray(particle_rect_idx)
+        rect_buffer.bind()
+        gl.glVertexAttribPointer(particle_rect_idx, 4, gl.GL_FLOAT,
+                                 False, 0, rect_buffer.ptr)
+        rect_buffer.unbind()
+    else:
+        gl.glVertexAttrib4f(particle_rect_idx, *rect)
+
+    gl.glPushAttrib(gl.GL_COLOR_BUFFER_BIT)
+    gl.glEnable(gl.GL_BLEND)
+    if blend_additive:
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE)
+    else:
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+
+    # mode = GLint()
+    # glTexEnviv( GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, mode )
+    #
+    # if self.color_modulate:
+    #   glTexEnvi( GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE )
+    # else:
+    #   glTexEnvi( GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_REPLACE )
+
+    sprite_shader.install()
+    sprite_shader.usetTex('sprite_texture', 0,
+                          gl.GL_TEXTURE_2D, texture.id)
+
+    gl.glDrawArrays(gl.GL_POINTS, 0, count)
+
+    sprite_shader.uninstall()
+    # un -blend
+    gl.glPopAttrib()
+
+    # color restore
+    gl.glPopAttrib()
+
+    # restore env mode
+    # glTexEnvi( GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, mode)
+
+    # disable states
+    gl.glDisableVertexAttribArray(particle_size_idx)
+    if rotation_buffer is not None:
+        gl.glDisableVertexAttribArray(particle_rotation_idx)
+    if rect_buffer is not None:
+        gl.glDisableVertexAttribArray(particle_rect_idx)
+    gl.glDisableClientState(gl.GL_COLOR_ARRAY)
+    gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
+
+    gl.glDisable(gl.GL_POINT_SPRITE)
+    gl.glDisable(gl.GL_PROGRAM_POINT_SIZE)
+    gl.glDisable(gl.GL_TEXTURE_2D)
+
+
+def _draw_quads(texture, blend_additive, buffers, count):
+    """Draws count textured quads from the buffers (vertexs, colors,
+    tex coords) with the current modelview."""
+    vertexs_buffer, colors_buffer, tex_coords_buffer = buffers
+
+    # color preserve - at least intel 945G needs that
+    gl.glPushAttrib(gl.GL_CURRENT_BIT)
+
+    gl.glEnable(gl.GL_TEXTURE_2D)
+    gl.glBindTexture(gl.GL_TEXTURE_2D, texture.id)
+
+    gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+    vertexs_buffer.bind()
+    gl.glVertexPointer(2, gl.GL_FLOAT, 0, vertexs_buffer.ptr)
+
+    gl.glEnableClientState(gl.GL_COLOR_ARRAY)
+    colors_buffer.bind()
+    gl.glColorPointer(4, gl.GL_FLOAT, 0, colors_buffer.ptr)
+
+    gl.glEnableClientState(gl.GL_TEXTURE_COORD_ARRAY)
+    tex_coords_buffer.bind()
+    gl.glTexCoordPointer(2, gl.GL_FLOAT, 0, tex_coords_buffer.ptr)
+    tex_coords_buffer.unbind()
+
+    gl.glPushAttrib(gl.GL_COLOR_BUFFER_BIT)
+    gl.glEnable(gl.GL_BLEND)
+    if blend_additive:
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE)
+    else:
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+
+    gl.glDrawArrays(gl.GL_QUADS, 0, count * 4)
+
+    # un -blend
+    gl.glPopAttrib()
+
+    # color restore
+    gl.glPopAttrib()
+
+    # disable states
+    gl.glDisableClientState(gl.GL_TEXTURE_COORD_ARRAY)
+    gl.glDisableClientState(gl.GL_COLOR_ARRAY)
+    gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
+    gl.glDisable(gl.GL_TEXTURE_2D)
+
+
+def _texture_rect(texture):
+    """Texture coordinates rect, (u0, v0, u1, v1), of a pyglet texture or
+    texture region; (0, 0, 1, 1) for objects without tex_coords."""
+    tex_coords = getattr(texture, 'tex_coords', None)
+    if tex_coords is None:
+        return 0.0, 0.0, 1.0, 1.0
+    # corners bottom left, bottom right, top right, top left; u, v, r each
+    return tex_coords[0], tex_coords[1], tex_coords[6], tex_coords[7]
+
+
+def _texture_key(texture):
+    """Texture regions of one atlas share the owner texture id."""
+    return getattr(texture, 'id', texture)
+
+
 class Color(object):
     """Representation of a rgba color
 
@@ -130,24 +404,20 @@ def __repr__(self):
         return "Color({0:.2f}, {1:.2f}, {2:.2f}, {3:.2f})".format(self.r, self.g, self.b, self.a)
 
 
-class ParticleSystem(CocosNode):
+class ParticleSimulation(object):
     """
-    Base class for many flavors of cocos particle systems.
-
-    The easiest way to customize is to subclass and redefine some class attributes;
-    see :mod:`cocos.particle_systems` for examples.
+    The particles state and math of a :class:`ParticleSystem`: emission,
+    update and the class attributes defining the particles behavior, without
+    rendering, textures or scheduling.
 
-    To define a per-class custom texture, override :meth:`load_texture`.
-    To use a per-instance custom texture, pass it in the __init__ texture kw-param
+    It can run headless, without a window or GL context, by example to test
+    or profile the particle systems; see :func:`simulation_of` to get one
+    for a :class:`ParticleSystem` subclass.
 
     Arguments:
-        fallback (Optional[None, True, False]): Defaults to None.
-            
-            - False: use point sprites, faster, not always available
-            - True: use quads, slower but always available
-            - None: autodetect, use the fastest available
-        texture (Optional[pyglet.image.Texture]): The texture image to be used for
-            the particles.
+        seed (Optional[int]): seed for the random generator of this
+            simulation. Defaults to None, which uses numpy's global random
+            state.
     """
 
     #: type of particle
@@ -165,7 +435,10 @@ class ParticleSystem(CocosNode):
     #: Gravity of the particles
     gravity = Point2(0.0, 0.0)
 
-    # position is from "superclass" CocosNode
+    #: Emitter position, in a :class:`ParticleSystem` it is the node position
+    x = 0.0
+    y = 0.0
+
     #: Position variance
     pos_var = Point2(0.0, 0.0)
 
@@ -211,32 +484,48 @@ class ParticleSystem(CocosNode):
     #: Maximum particles
     total_particles = 0
 
-    #: texture for the particles, will be loaded in __init__ because Intel weakness, 
-    #: `#235 <https://github.com/los-cocos/cocos/issues/235>`_.
-    #: Either override the :meth:`load_texture` method in a subclass to define a common
-    #: texture for all particles system of this class, or provide a ``texture`` argument
-    #: to the ``__init__`` method to define a custom texture for that instance.
-    texture = None
+    #: position type. Defaults to :class:`POSITION_GROUPED`
+    position_type = POSITION_GROUPED
 
-    #: blend additive
-    blend_additive = False
+    #: keep the live particles packed at the front of the particle arrays;
+    #: update and draw then cost by live particles instead of by
+    #: :attr:`total_particles`. Dead particles are swap-removed, so the
+    #: order of the particles in the arrays is not stable.
+    compact_storage = False
 
-    #: color modulate
-    color_modulate = True
+    #: :class:`~cocos.particle_affectors.Affector` instances applied, in
+    #: order, to the particles at each update
+    affectors = ()
 
-    #: position type. Defaults to :class:`POSITION_GROUPED`
-    position_type = POSITION_GROUPED
+    #: rotation of each particle in degrees, None when the particles don't
+    #: rotate; see :class:`~cocos.particle_affectors.Rotation`
+    particle_rotation = None
 
+    #: texture frame of each particle, None when the particles use the first
+    #: frame; see :class:`~cocos.particle_affectors.FrameAnimation`
+    particle_frame = None
 
-    def __init__(self, fallback=None, texture=None):
-        """
-        fallback can be None, True, False; default is None
-            False: use point sprites, faster, not always available
-            True: use quads, slower but always available)
-            None: autodetect, use the faster available
-        texture: The texture image to be used for the particles.
-        """
-        super(ParticleSystem, self).__init__()
+    #: seconds simulated with :meth:`prewarm` when the system is created or
+    #: restarted, so that it starts already developed. Defaults to 0, starts
+    #: empty
+    prewarm_seconds = 0
+
+    # True while prewarm is stepping the simulation
+    _prewarming = False
+
+    # names of the per particle arrays, they are indexed by particle slot
+    _particle_arrays = ('particle_pos', 'particle_dir', 'particle_rad',
+                        'particle_tan', 'particle_grav', 'particle_color',
+                        'particle_delta_color', 'particle_life',
+                        'particle_size', 'start_pos')
+
+    def __init__(self, seed=None):
+        self._init_simulation(seed)
+        self._apply_prewarm()
+
+    def _init_simulation(self, seed):
+        #: the random generator, has the numpy.random.RandomState interface
+        self.rng = numpy.random if seed is None else numpy.random.RandomState(seed)
 
         # particles
         # position x 2
@@ -263,17 +552,427 @@ def __init__(self, fallback=None, texture=None):
         # start position
         self.start_pos = numpy.zeros((self.total_particles, 2), numpy.float32)
 
+        # scratch buffers for update_particles, so that it does not allocate
+        self._scratch_1 = numpy.zeros((self.total_particles, 1), numpy.float32)
+        self._scratch_2 = numpy.zeros((self.total_particles, 2), numpy.float32)
+        self._scratch_accel = numpy.zeros((self.total_particles, 2), numpy.float32)
+        self._scratch_4 = numpy.zeros((self.total_particles, 4), numpy.float32)
+        self._scratch_mask = numpy.zeros(self.total_particles, bool)
+
+        # arrays used by the affectors, they move along the particles
+        extra_arrays = []
+        for affector in self.affectors:
+            for name, columns in affector.arrays:
+                if name not in self._particle_arrays and name not in extra_arrays:
+                    setattr(self, name,
+                            numpy.zeros((self.total_particles, columns), numpy.float32))
+                    extra_arrays.append(name)
+        if extra_arrays:
+            self._particle_arrays = self._particle_arrays + tuple(extra_arrays)
+        self._affectors_change_size = any(a.changes_size for a in self.affectors)
+
         #: How many particles can be emitted per second
         self.emit_counter = 0
 
         #: Count of particles
         self.particle_count = 0
 
+    def _apply_prewarm(self):
+        if self.prewarm_seconds > 0:
+            self.prewarm(self.prewarm_seconds)
+
+    def step(self, delta):
+        """Emits the particles due and updates the particles.
+
+        Arguments:
+            delta (float): time in seconds since last step.
+        """
+        # update particle count; compact storage tracks it
+        if not self.compact_storage:
+            alive = numpy.greater_equal(self.particle_life[:, 0], 0, out=self._scratch_mask)
+            self.particle_count = numpy.count_nonzero(alive)
+
+        if self.active:
+            rate = 1.0 / self.emission_rate
+            self.emit_counter += delta
+
+            #            if random.random() < 0.01:
+            #                delta += 0.5
+
+            # all the particles due in this frame are emitted in one go;
+            # same count as emitting one by one while emit_counter > rate
+            due = int(math.ceil(self.emit_counter / rate - 1.0))
+            if due > 0:
+                emitted = self.add_particles(due)
+                self.emit_counter -= emitted * rate
+
+            self.elapsed += delta
+
+            if self.duration != -1 and self.duration < self.elapsed:
+                self.stop_system()
+
+        self.update_particles(delta)
+
+    def simulate(self, frames, dt):
+        """Advances the simulation by frames steps of fixed dt.
+
+        With a seeded simulation the results are reproducible.
+
+        Arguments:
+            frames (int): number of steps.
+            dt (float): time in seconds for each step.
+        """
+        for i in range(frames):
+            self.step(dt)
+
+    def prewarm(self, seconds, dt=0.1):
+        """Fast-forwards the simulation with large fixed steps, so that an
+        effect like smoke starts already developed instead of empty.
+
+        Systems with :attr:`prewarm_seconds` are prewarmed when created and
+        when restarted.
+
+        Arguments:
+            seconds (float): time to simulate.
+            dt (float): time in seconds for each step. Defaults to 0.1
+        """
+        frames = int(math.ceil(seconds / dt))
+        self._prewarming = True
+        try:
+            for i in range(frames):
+                self.step(dt)
+        finally:
+            self._prewarming = False
+
+    def snapshot(self):
+        """Copy of the live particles state.
+
+        Returns:
+            dict: maps the particle arrays names to arrays with a row
+            for each live particle.
+        """
+        live = self._live_slots()
+        return dict((name, getattr(self, name)[live].copy())
+                    for name in self._particle_arrays)
+
+    def _scale_particle_size(self):
+        """Size of the particles when drawn; no scaling without a node."""
+        self.particle_size_scaled = self.particle_size
+
+    def add_particle(self):
+        """
+        Code calling add_particle must either:
+            - be sure there is room for the particle
+            - be prepared to catch the exception :class:`ExceptionNoEmptyParticle`
+          
+        It is acceptable to ``try: ... except...: pass``
+        """
+        self.init_particle()
+        self.particle_count += 1
+
+    def add_particles(self, count):
+        """Emits up to count particles in one vectorized pass.
+
+        Unlike :meth:`add_particle` it does not raise when the system is
+        full, it emits as many particles as free slots are available.
+
+        Arguments:
+            count (int): how many particles to emit.
+
+        Returns:
+            int: the number of particles emitted.
+        """
+        if self.compact_storage:
+            idxs = numpy.arange(self.particle_count,
+                                min(self.particle_count + count, self.total_particles))
+        else:
+            idxs = (self.particle_life[:, 0] < 0).nonzero()[0][:count]
+        emitted = len(idxs)
+        if emitted:
+            self.init_particles(idxs)
+            self.particle_count += emitted
+        return emitted
+
+    def stop_system(self):
+        """Stop the particle system."""
+        self.active = False
+        self.elapsed = self.duration
+        self.emit_counter = 0
+
+    def reset_system(self):
+        """Resets the particle system."""
+        self.elapsed = self.duration
+        self.emit_counter = 0
+
+    def restart(self):
+        """Kills all the particles and starts the system again, as new;
+        the particle arrays are reused."""
+        self.particle_life.fill(-1.0)
+        self.particle_color[:, 3] = 0.0
+        self.particle_count = 0
+        self.emit_counter = 0
+        self.elapsed = 0
+        self.active = True
+        self._apply_prewarm()
+
+    def update_particles(self, delta):
+        """Updates particles position.
+
+        Arguments:
+            delta (float): time in seconds since last frame.
+        """
+        # all the math is done in place, over preallocated buffers; column
+        # by column where broadcasting would make numpy buffer internally
+        n = self._used_slots()
+        pos = self.particle_pos[:n]
+        direction = self.particle_dir[:n]
+        life = self.particle_life[:n]
+        color = self.particle_color[:n]
+        norm = self._scratch_1[:n]
+        tmp = self._scratch_2[:n]
+        accel = self._scratch_accel[:n]
+        mask = self._scratch_mask[:n]
+
+        # radial: posx + posy
+        numpy.multiply(pos, pos, out=tmp)
+        numpy.add(tmp[:, 0], tmp[:, 1], out=norm[:, 0])
+        numpy.sqrt(norm, out=norm)
+        # XXX prevent div by 0
+        numpy.copyto(norm, 0.0000001, where=numpy.equal(norm, 0, out=mask[:, numpy.newaxis]))
+        # unit vector from the emitter
+        unit = tmp
+        numpy.divide(pos[:, 0], norm[:, 0], out=unit[:, 0])
+        numpy.divide(pos[:, 1], norm[:, 0], out=unit[:, 1])
+
+        # update dir: radial + tangential + gravity
+        numpy.multiply(unit[:, 0], self.particle_rad[:n, 0], out=accel[:, 0])
+        numpy.multiply(unit[:, 1], self.particle_rad[:n, 0], out=accel[:, 1])
+        tangential = norm[:, 0]
+        numpy.multiply(unit[:, 1], self.particle_tan[:n, 0], out=tangential)
+        numpy.subtract(accel[:, 0], tangential, out=accel[:, 0])
+        numpy.multiply(unit[:, 0], self.particle_tan[:n, 0], out=tangential)
+        numpy.add(accel[:, 1], tangential, out=accel[:, 1])
+        numpy.add(accel, self.particle_grav[:n], out=accel)
+        numpy.multiply(accel, delta, out=accel)
+        numpy.add(direction, accel, out=direction)
+
+        # update pos with updated dir
+        numpy.multiply(direction, delta, out=tmp)
+        numpy.add(pos, tmp, out=pos)
+
+        # life
+        numpy.subtract(life, delta, out=life)
+
+        # position: free or grouped
+        if self.position_type == self.POSITION_FREE:
+            numpy.subtract(self.x, self.start_pos[:n, 0], out=tmp[:, 0])
+            numpy.subtract(self.y, self.start_pos[:n, 1], out=tmp[:, 1])
+            numpy.subtract(pos, tmp, out=pos)
+
+        # color
+        color_delta = self._scratch_4[:n]
+        numpy.multiply(self.particle_delta_color[:n], delta, out=color_delta)
+        numpy.add(color, color_delta, out=color)
+
+        for affector in self.affectors:
+            affector.update(self, delta, n)
+        if self._affectors_change_size:
+            self._scale_particle_size()
+
+        # if life < 0, set alpha in 0
+        numpy.copyto(color[:, 3], 0.0, where=numpy.less(life[:, 0], 0, out=mask))
+
+        if self.compact_storage:
+            self._remove_dead_particles()
+
+    def _used_slots(self):
+        """Number of particle slots, from the start, that can hold live particles."""
+        if self.compact_storage:
+            return self.particle_count
+        return self.total_particles
+
+    def _live_slots(self):
+        """Index into the particle arrays selecting the live particles."""
+        if self.compact_storage:
+            return slice(0, self.particle_count)
+        return (self.particle_life[:, 0] >= 0).nonzero()[0]
+
+    def _remove_dead_particles(self):
+        """Compact storage: fills the slots of the dead particles with the
+        live ones at the end, keeping live particles packed at the front."""
+        n = self.particle_count
+        dead = (self.particle_life[:n, 0] < 0).nonzero()[0]
+        if len(dead) == 0:
+            return
+        live_count = n - len(dead)
+        # as many dead particles before live_count as live ones after it
+        holes = dead[dead < live_count]
+        movers = live_count + (self.particle_life[live_count:n, 0] >= 0).nonzero()[0]
+        if len(holes):
+            for name in self._particle_arrays:
+                arr = getattr(self, name)
+                arr[holes] = arr[movers]
+            self._scale_particle_size()
+        self.particle_life[live_count:n] = -1.0
+        self.particle_color[live_count:n, 3] = 0.0
+        self.particle_count = live_count
+
+    def init_particle(self):
+        """Set initial particles state."""
+        if self.compact_storage:
+            idxs = numpy.arange(self.particle_count, self.total_particles)
+        else:
+            idxs = (self.particle_life[:, 0] < 0).nonzero()[0]
+        if len(idxs) == 0:
+            raise ExceptionNoEmptyParticle()
+        self.init_particles(idxs[:1])
+
+    def init_particles(self, idxs):
+        """Set initial state for the particles at idxs, all at once.
+
+        Arguments:
+            idxs (numpy.ndarray): indexes of free particle slots.
+        """
+        n = len(idxs)
+        # one draw for all the random values, each row feeds one attribute
+        r = rand_array((16, n), self.rng)
+
+        # position
+        self.particle_pos[idxs, 0] = self.pos_var.x * r[0]
+        self.particle_pos[idxs, 1] = self.pos_var.y * r[1]
+
+        # start position
+        self.start_pos[idxs, 0] = self.x
+        self.start_pos[idxs, 1] = self.y
+
+        # direction
+        a = numpy.radians(self.angle + self.angle_var * r[2])
+        s = self.speed + self.speed_var * r[3]
+        self.particle_dir[idxs, 0] = numpy.cos(a) * s
+        self.particle_dir[idxs, 1] = numpy.sin(a) * s
+
+        # radial accel
+        self.particle_rad[idxs, 0] = self.radial_accel + self.radial_accel_var * r[4]
+
+        # tangential accel
+        self.particle_tan[idxs, 0] = self.tangential_accel + self.tangential_accel_var * r[5]
+
+        # life
+        life = self.life + self.life_var * r[6]
+        self.particle_life[idxs, 0] = life
+
+        # Color
+        start = numpy.array(self.start_color.to_array())[:, numpy.newaxis]
+        start_var = numpy.array(self.start_color_var.to_array())[:, numpy.newaxis]
+        end = numpy.array(self.end_color.to_array())[:, numpy.newaxis]
+        end_var = numpy.array(self.end_color_var.to_array())[:, numpy.newaxis]
+        start_color = start + start_var * r[7:11]
+        end_color = end + end_var * r[11:15]
+        self.particle_color[idxs] = start_color.T
+        self.particle_delta_color[idxs] = ((end_color - start_color) / life).T
+
+        # size
+        self.particle_size[idxs, 0] = self.size + self.size_var * r[15]
+
+        # gravity
+        self.particle_grav[idxs, 0] = self.gravity.x
+        self.particle_grav[idxs, 1] = self.gravity.y
+
+        for affector in self.affectors:
+            affector.init_particles(self, idxs)
+        self._scale_particle_size()
+
+
+class ParticleSystem(CocosNode, ParticleSimulation):
+    """
+    Base class for many flavors of cocos particle systems.
+
+    The easiest way to customize is to subclass and redefine some class attributes;
+    see :mod:`cocos.particle_systems` for examples.
+
+    To define a per-class custom texture, override :meth:`load_texture`.
+    To use a per-instance custom texture, pass it in the __init__ texture kw-param
+
+    Arguments:
+        fallback (Optional[None, True, False]): Defaults to None.
+            
+            - False: use point sprites, faster, not always available
+            - True: use quads, slower but always available
+            - None: autodetect, use the fastest available
+        texture (Optional[pyglet.image.Texture]): The texture image to be used for
+            the particles.
+        seed (Optional[int]): seed for the random generator of the particles.
+            Defaults to None, which uses numpy's global random state.
+    """
+
+    #: texture for the particles, will be loaded in __init__ because Intel weakness, 
+    #: `#235 <https://github.com/los-cocos/cocos/issues/235>`_.
+    #: Either override the :meth:`load_texture` method in a subclass to define a common
+    #: texture for all particles system of this class, or provide a ``texture`` argument
+    #: to the ``__init__`` method to define a custom texture for that instance.
+    texture = None
+
+    #: blend additive
+    blend_additive = False
+
+    #: color modulate
+    color_modulate = True
+
+    #: keep the particle data in vertex buffer objects, streamed each frame
+    #: with only the used slots; if False or not supported by the driver
+    #: client side vertex arrays are used
+    use_buffer_objects = True
+
+    #: level of detail: when the system is :attr:`low_priority` or out of
+    #: view the particles are updated only once every lod_interval frames,
+    #: with the accumulated time. Defaults to 1, update every frame
+    lod_interval = 1
+
+    #: low priority systems are always updated at the :attr:`lod_interval` rate
+    low_priority = False
+
+    #: distance in pixels out of the window where the emitter still counts as
+    #: in view, see :meth:`is_in_view`
+    view_margin = 100
+
+    #: texture regions, all in the same texture, the particles can be drawn
+    #: with; by example frames of an animation in a pyglet.image.TextureGrid
+    #: or images in a pyglet atlas. The frame of each particle is chosen by
+    #: a :class:`~cocos.particle_affectors.FrameAnimation` affector.
+    #: Defaults to None, a single frame: the texture or texture region
+    frames = None
+
+    def __init__(self, fallback=None, texture=None, seed=None):
+        """
+        fallback can be None, True, False; default is None
+            False: use point sprites, faster, not always available
+            True: use quads, slower but always available)
+            None: autodetect, use the faster available
+        texture: The texture image to be used for the particles.
+        seed: seed for the particles random generator, None for numpy's global one.
+        """
+        super(ParticleSystem, self).__init__()
+        self._init_simulation(seed)
+
         # auto remove when particle finishes
         self.auto_remove_on_finish = False
 
+        # time and frames not yet simulated, see lod_interval
+        self._lod_dt = 0.0
+        self._lod_frames = 0
+
+        #: the :class:`ParticleSystemPool` the system goes back to when it
+        #: finishes, if any
+        self.pool = None
+
+        # rendering buffers, created at the first draw
+        self._buffers = None
+
         # resolve which texture will be used
-        if texture is None:
+        if texture is None and self.frames:
+            # the frames texture
+            self.texture = self.frames[0]
+        elif texture is None:
             # no explicit texture, the class default texture will be
             # implicitly used; ensure it is loaded
             if self.texture is None:
@@ -282,6 +981,17 @@ def __init__(self, fallback=None, texture=None):
             # the explicit texture provided will be used
             self.texture = texture
 
+        #: texture coordinates rect, (u0, v0, u1, v1), for each frame
+        self.texture_rects = numpy.array(
+            [_texture_rect(frame) for frame in (self.frames or [self.texture])],
+            numpy.float32)
+        if len(self.texture_rects) > 1 and self.particle_frame is not None:
+            # texture rect of each particle, from its frame
+            self.particle_rects = numpy.zeros((self.total_particles, 4), numpy.float32)
+            self._frame_idxs = numpy.zeros(self.total_particles, numpy.intp)
+        else:
+            self.particle_rects = None
+
         # rendering mode; True is quads, False is point_sprites, None is auto fallback
         if fallback is None:
             fallback = not point_sprites_available()
@@ -293,47 +1003,24 @@ def __init__(self, fallback=None, texture=None):
             self._init_shader()
 
         self.schedule(self.step)
+        self._apply_prewarm()
 
     def _init_shader(self):
-        vertex_code = """
-        #version 120
-        attribute float particle_size;
-
-        void main()
-        {
-            gl_PointSize = particle_size;
-            gl_Position = ftransform();
-            gl_FrontColor = gl_Color;
-        }
-        """
-        frag_code = """
-        #version 120
-        uniform sampler2D sprite_texture;
-
-        void main()
-        {
-            gl_FragColor = gl_Color * texture2D(sprite_texture, gl_PointCoord);
-        }
-        """
-        self.sprite_shader = ShaderProgram.simple_program('sprite', vertex_code, frag_code)
-        self.particle_size_idx = gl.glGetAttribLocation(self.sprite_shader.program, b'particle_size')
+        self.sprite_shader, self.attribute_idxs = _get_sprite_shader()
+        self.particle_size_idx = self.attribute_idxs[0]
 
     def load_texture(self):
         """Sets the default texture used by all instances of this particles system.
 
         Override this method to change the default texture.
 
-        Note:
-            By `issue #168 <https://github.com/los-cocos/cocos/issues/168>`_ 
-            the texture should hold only one image, so don't use::
+        The texture can be a texture region, by example an image in a pyglet
+        atlas::
 
-                texture = pyglet.resource.image('z.png').texture # (produces an atlas, ie multiple images in a texture)
+            texture = pyglet.resource.image('filename.png')
 
-            You can use instead::
-
-                texture = pyglet.image.load(...).get_texture()
-                # Or using pyglet resource mechanism
-                texture = pyglet.image.load('filename.png', file=pyglet.resource.file('filename.png')).get_texture()
+        the particles are drawn with the region only, and systems using images
+        of the same atlas can share draw calls in a :class:`ParticleBatchNode`.
         """
         pic = pyglet.image.load('fire.png', file=pyglet.resource.file('fire.png'))
         self.__class__.texture = pic.get_texture()
@@ -385,77 +1072,35 @@ def _scale_particle_size(self):
 
     def draw(self):
         """Draw the particles system"""
+        n = self._used_slots()
+        if self.particle_rects is not None:
+            self.update_particle_rects()
+        # rotations and rects are optional
+        arrays = [self.particle_pos, self.particle_color, self.particle_size_scaled,
+                  self.particle_rotation, self.particle_rects]
+        if self._buffers is None:
+            self._buffers = [None if a is None else
+                             create_stream_buffer(a, self.use_buffer_objects)
+                             for a in arrays]
+        for buffer, array in zip(self._buffers, arrays):
+            if buffer is not None:
+                stream_to_buffer(buffer, array, n)
+
         gl.glPushMatrix()
         self.transform()
-
-        # color preserve - at least nvidia 6150SE needs that
-        gl.glPushAttrib(gl.GL_CURRENT_BIT)
-        # glPointSize(self.get_scaled_particle_size())
-
-        gl.glEnable(gl.GL_TEXTURE_2D)
-        gl.glEnable(gl.GL_PROGRAM_POINT_SIZE)
-        # glBindTexture(GL_TEXTURE_2D, self.texture.id)
-
-
-        gl.glEnable(gl.GL_POINT_SPRITE)
-        gl.glTexEnvi(gl.GL_POINT_SPRITE, gl.GL_COORD_REPLACE, gl.GL_TRUE)
-
-        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
-        vertex_ptr = PointerToNumpy(self.particle_pos)
-        gl.glVertexPointer(2, gl.GL_FLOAT, 0, vertex_ptr)
-
-        gl.glEnableClientState(gl.GL_COLOR_ARRAY)
-        color_ptr = PointerToNumpy(self.particle_color)
-        gl.glColorPointer(4, gl.GL_FLOAT, 0, color_ptr)
-
-        gl.glEnableVertexAttribArray(self.particle_size_idx)
-
-        size_ptr = PointerToNumpy(self.particle_size_scaled)
-        gl.glVertexAttribPointer(self.particle_size_idx, 1, gl.GL_FLOAT,
-                                 False, 0, size_ptr)
-
-        gl.glPushAttrib(gl.GL_COLOR_BUFFER_BIT)
-        gl.glEnable(gl.GL_BLEND)
-        if self.blend_additive:
-            gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE)
-        else:
-            gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
-
-        # mode = GLint()
-        # glTexEnviv( GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, mode )
-        #
-        # if self.color_modulate:
-        #   glTexEnvi( GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE )
-        # else:
-        #   glTexEnvi( GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_REPLACE )
-
-        self.sprite_shader.install()
-        self.sprite_shader.usetTex('sprite_texture', 0,
-                                   gl.GL_TEXTURE_2D, self.texture.id)
-
-        gl.glDrawArrays(gl.GL_POINTS, 0, self.total_particles)
-
-        self.sprite_shader.uninstall()
-        # un -blend
-        gl.glPopAttrib()
-
-        # color restore
-        gl.glPopAttrib()
-
-        # restore env mode
-        # glTexEnvi( GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, mode)
-
-        # disable states
-        gl.glDisableVertexAttribArray(self.particle_size_idx)
-        gl.glDisableClientState(gl.GL_COLOR_ARRAY)
-        gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
-
-        gl.glDisable(gl.GL_POINT_SPRITE)
-        gl.glDisable(gl.GL_PROGRAM_POINT_SIZE)
-        gl.glDisable(gl.GL_TEXTURE_2D)
-
+        _draw_point_sprites(self.sprite_shader, self.attribute_idxs, self.texture,
+                            self.blend_additive, self._buffers, n,
+                            self.texture_rects[0])
         gl.glPopMatrix()
 
+    def update_particle_rects(self):
+        """Sets the texture rect of each particle from its frame."""
+        n = self._used_slots()
+        frames = self._frame_idxs[:n]
+        numpy.copyto(frames, self.particle_frame[:n, 0], casting='unsafe')
+        numpy.take(self.texture_rects, frames, axis=0, out=self.particle_rects[:n],
+                   mode='wrap')
+
     def step(self, delta):
         """Called every frame to create new particles if needed and
         update the particles position.
@@ -464,180 +1109,52 @@ def step(self, delta):
         if it needs to remove itself from its parent node when its time has 
         arrived.
 
+        With a :attr:`lod_interval` bigger than one, low priority or out of
+        view systems accumulate the time and update only every lod_interval
+        frames. While prewarming neither applies.
+
         Arguments:
             delta (float): time in seconds since last frame.
         """
-        # update particle count
-        self.particle_count = numpy.sum(self.particle_life >= 0)
-
-        if self.active:
-            rate = 1.0 / self.emission_rate
-            self.emit_counter += delta
-
-            #            if random.random() < 0.01:
-            #                delta += 0.5
-
-            while self.particle_count < self.total_particles and self.emit_counter > rate:
-                self.add_particle()
-                self.emit_counter -= rate
-
-            self.elapsed += delta
-
-            if self.duration != -1 and self.duration < self.elapsed:
-                self.stop_system()
-
-        self.update_particles(delta)
-
-        if (not self.active and
+        if self.lod_interval > 1 and not self._prewarming:
+            self._lod_dt += delta
+            self._lod_frames += 1
+            if (self._lod_frames < self.lod_interval and
+                    (self.low_priority or not self.is_in_view())):
+                return
+            delta = self._lod_dt
+            self._lod_dt = 0.0
+            self._lod_frames = 0
+
+        super(ParticleSystem, self).step(delta)
+
+        if (not self.active and not self._prewarming and
                     self.particle_count == 0 and self.auto_remove_on_finish is True):
-            self.unschedule(self.step)
-            self.parent.remove(self)
-
-    def add_particle(self):
-        """
-        Code calling add_particle must either:
-            - be sure there is room for the particle
-            - be prepared to catch the exception :class:`ExceptionNoEmptyParticle`
-          
-        It is acceptable to ``try: ... except...: pass``
-        """
-        self.init_particle()
-        self.particle_count += 1
+            if self.pool is None:
+                self.unschedule(self.step)
+                self.parent.remove(self)
+            else:
+                # keeps the schedule, it resumes when added again
+                self.parent.remove(self)
+                self.pool.release(self)
+
+    def restart(self):
+        """Kills all the particles and starts the system again, as new;
+        the particle arrays and GL resources are reused."""
+        self._lod_dt = 0.0
+        self._lod_frames = 0
+        super(ParticleSystem, self).restart()
+
+    def is_in_view(self):
+        """Tells if the emitter is in the window, or near it by :attr:`view_margin`.
 
-    def stop_system(self):
-        """Stop the particle system."""
-        self.active = False
-        self.elapsed = self.duration
-        self.emit_counter = 0
-
-    def reset_system(self):
-        """Resets the particle system."""
-        self.elapsed = self.duration
-        self.emit_counter = 0
-
-    def update_particles(self, delta):
-        """Updates particles position.
-
-        Arguments:
-            delta (float): time in seconds since last frame.
+        Returns:
+            bool: True if the emitter world position is in view.
         """
-        # radial: posx + posy
-        norm = numpy.sqrt(self.particle_pos[:, 0] ** 2 + self.particle_pos[:, 1] ** 2)
-        # XXX prevent div by 0
-        norm = numpy.select([norm == 0], [0.0000001], default=norm)
-        posx = self.particle_pos[:, 0] / norm
-        posy = self.particle_pos[:, 1] / norm
-
-        radial = numpy.array([posx, posy])
-        tangential = numpy.array([-posy, posx])
-
-        # update dir
-        radial = numpy.swapaxes(radial, 0, 1)
-        radial *= self.particle_rad
-        tangential = numpy.swapaxes(tangential, 0, 1)
-        tangential *= self.particle_tan
-
-        self.particle_dir += (tangential + radial + self.particle_grav) * delta
-
-        # update pos with updated dir
-        self.particle_pos += self.particle_dir * delta
-
-        # life
-        self.particle_life -= delta
-
-        # position: free or grouped
-        if self.position_type == self.POSITION_FREE:
-            tuple = numpy.array([self.x, self.y])
-            tmp = tuple - self.start_pos
-            self.particle_pos -= tmp
-
-        # color
-        self.particle_color += self.particle_delta_color * delta
-
-        # if life < 0, set alpha in 0
-        self.particle_color[:, 3] = numpy.select([self.particle_life[:, 0] < 0], [0],
-                                                 default=self.particle_color[:, 3])
-
-        # print self.particles[0]
-        # print self.pas[0,0:4]
-
-    def init_particle(self):
-        """Set initial particles state."""
-        # position
-        # p=self.particles[idx]
-
-        a = self.particle_life < 0
-        idxs = a.nonzero()
-
-        idx = -1
-
-        if len(idxs[0]) > 0:
-            idx = idxs[0][0]
-        else:
-            raise ExceptionNoEmptyParticle()
-
-        # position
-        self.particle_pos[idx][0] = self.pos_var.x * rand()
-        self.particle_pos[idx][1] = self.pos_var.y * rand()
-
-        # start position
-        self.start_pos[idx][0] = self.x
-        self.start_pos[idx][1] = self.y
-
-        a = math.radians(self.angle + self.angle_var * rand())
-        v = Point2(math.cos(a), math.sin(a))
-        s = self.speed + self.speed_var * rand()
-
-        dir = v * s
-
-        # direction
-        self.particle_dir[idx][0] = dir.x
-        self.particle_dir[idx][1] = dir.y
-
-        # radial accel
-        self.particle_rad[idx] = self.radial_accel + self.radial_accel_var * rand()
-
-        # tangential accel
-        self.particle_tan[idx] = self.tangential_accel + self.tangential_accel_var * rand()
-
-        # life
-        life = self.particle_life[idx] = self.life + self.life_var * rand()
-
-        # Color
-        # start
-        sr = self.start_color.r + self.start_color_var.r * rand()
-        sg = self.start_color.g + self.start_color_var.g * rand()
-        sb = self.start_color.b + self.start_color_var.b * rand()
-        sa = self.start_color.a + self.start_color_var.a * rand()
-
-        self.particle_color[idx][0] = sr
-        self.particle_color[idx][1] = sg
-        self.particle_color[idx][2] = sb
-        self.particle_color[idx][3] = sa
-
-        # end
-        er = self.end_color.r + self.end_color_var.r * rand()
-        eg = self.end_color.g + self.end_color_var.g * rand()
-        eb = self.end_color.b + self.end_color_var.b * rand()
-        ea = self.end_color.a + self.end_color_var.a * rand()
-
-        delta_color_r = (er - sr) / life
-        delta_color_g = (eg - sg) / life
-        delta_color_b = (eb - sb) / life
-        delta_color_a = (ea - sa) / life
-
-        self.particle_delta_color[idx][0] = delta_color_r
-        self.particle_delta_color[idx][1] = delta_color_g
-        self.particle_delta_color[idx][2] = delta_color_b
-        self.particle_delta_color[idx][3] = delta_color_a
-
-        # size
-        self.particle_size[idx] = self.size + self.size_var * rand()
-        self._scale_particle_size()
-
-        # gravity
-        self.particle_grav[idx][0] = self.gravity.x
-        self.particle_grav[idx][1] = self.gravity.y
+        x, y = self.point_to_world((0, 0))
+        width, height = director.get_window_size()
+        margin = self.view_margin
+        return -margin <= x <= width + margin and -margin <= y <= height + margin
 
     # Below only fallback functionality.
     # It uses quads instehad of point sprites, doing a transformation
@@ -647,9 +1164,8 @@ def init_particle(self):
 
     def _fallback_init(self):
         self.vertexs = numpy.zeros((self.total_particles, 4, 2), numpy.float32)
-        tex_coords_for_quad = numpy.array([[0.0, 1.0], [0.0, 0.0], [1.0, 0.0], [1.0, 1.0]], numpy.float32)
         self.tex_coords = numpy.zeros((self.total_particles, 4, 2), numpy.float32)
-        self.tex_coords[:] = tex_coords_for_quad[numpy.newaxis, :, :]
+        _rects_to_tex_coords(self.texture_rects[:1], self.tex_coords)
         self.per_vertex_colors = numpy.zeros((self.total_particles, 4, 4), numpy.float32)
         self.delta_pos_to_vertex = numpy.zeros((self.total_particles, 4, 2), numpy.float32)
 
@@ -661,76 +1177,459 @@ def draw_fallback(self):
         self.update_vertexs_from_pos()
         self.update_per_vertex_colors()
 
+        n = self._used_slots()
+        if self._buffers is None:
+            self._buffers = [create_stream_buffer(a, self.use_buffer_objects) for a in
+                             (self.vertexs, self.per_vertex_colors, self.tex_coords)]
+            # tex coords change only with frames
+            stream_to_buffer(self._buffers[2], self.tex_coords, self.total_particles)
+        stream_to_buffer(self._buffers[0], self.vertexs, n)
+        stream_to_buffer(self._buffers[1], self.per_vertex_colors, n)
+        if self.particle_rects is not None:
+            self.update_tex_coords()
+            stream_to_buffer(self._buffers[2], self.tex_coords, n)
+
         gl.glPushMatrix()
         self.transform()
-
-        # color preserve - at least intel 945G needs that
-        gl.glPushAttrib(gl.GL_CURRENT_BIT)
-
-        gl.glEnable(gl.GL_TEXTURE_2D)
-        gl.glBindTexture(gl.GL_TEXTURE_2D, self.texture.id)
-
-        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
-        vertexs_ptr = PointerToNumpy(self.vertexs)
-        gl.glVertexPointer(2, gl.GL_FLOAT, 0, vertexs_ptr)
-
-        gl.glEnableClientState(gl.GL_COLOR_ARRAY)
-        color_ptr = PointerToNumpy(self.per_vertex_colors)
-        # gl.glColorPointer(4, gl.GL_UNSIGNED_BYTE, 0, color_ptr)
-        gl.glColorPointer(4, gl.GL_FLOAT, 0, color_ptr)
-
-        gl.glEnableClientState(gl.GL_TEXTURE_COORD_ARRAY)
-        tex_coord_ptr = PointerToNumpy(self.tex_coords)
-        gl.glTexCoordPointer(2, gl.GL_FLOAT, 0, tex_coord_ptr)
-
-        gl.glPushAttrib(gl.GL_COLOR_BUFFER_BIT)
-        gl.glEnable(gl.GL_BLEND)
-        if self.blend_additive:
-            gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE)
-        else:
-            gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
-
-        gl.glDrawArrays(gl.GL_QUADS, 0, len(self.vertexs) * 4)
-
-        # un -blend
-        gl.glPopAttrib()
-
-        # color restore
-        gl.glPopAttrib()
-
-        # disable states
-        gl.glDisableClientState(gl.GL_TEXTURE_COORD_ARRAY)
-        gl.glDisableClientState(gl.GL_COLOR_ARRAY)
-        gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
-        gl.glDisable(gl.GL_TEXTURE_2D)
-
+        _draw_quads(self.texture, self.blend_additive, self._buffers, n)
         gl.glPopMatrix()
 
     def update_vertexs_from_pos(self):
         """Helper function to update particle quad vertices based
         on particle position.
         """
-        vertexs = self.vertexs
-        delta = self.delta_pos_to_vertex
-        pos = self.particle_pos
-        vertexs[:] = delta + pos[:, numpy.newaxis, :]
+        n = self._used_slots()
+        vertexs = self.vertexs[:n]
+        delta = self.delta_pos_to_vertex[:n]
+        pos = self.particle_pos[:n]
+        numpy.add(delta, pos[:, numpy.newaxis, :], out=vertexs)
+
+    def update_tex_coords(self):
+        """Helper function to update particle quad tex coords based
+        on particle frame.
+        """
+        n = self._used_slots()
+        self.update_particle_rects()
+        _rects_to_tex_coords(self.particle_rects[:n], self.tex_coords[:n])
 
     def update_per_vertex_colors(self):
         """Helper function to update particle quad colors based
         on particle color.
         """
-        colors = self.particle_color
-        per_vertex_colors = self.per_vertex_colors
+        n = self._used_slots()
+        colors = self.particle_color[:n]
+        per_vertex_colors = self.per_vertex_colors[:n]
         per_vertex_colors[:] = colors[:, numpy.newaxis, :]
 
     def make_delta_pos_to_vertex(self):
         """Helper function creating quad vertices based on particles
         position.
         """
-        size2 = self.particle_size / 2.0
+        n = self._used_slots()
+        delta = self.delta_pos_to_vertex[:n]
+        if self.particle_rotation is not None:
+            self._make_rotated_delta_pos_to_vertex(n, delta)
+            return
+
+        # counter-clockwise: NW, SW, SE, NE; built in place
+        plus = delta[:, 3, 0]
+        numpy.multiply(self.particle_size[:n, 0], 0.5, out=plus)
+        minus = delta[:, 0, 0]
+        numpy.negative(plus, out=minus)
+        delta[:, 0, 1] = plus  # NW
+        delta[:, 1, 0] = minus  # SW
+        delta[:, 1, 1] = minus
+        delta[:, 2, 0] = plus  # SE
+        delta[:, 2, 1] = minus
+        delta[:, 3, 1] = plus  # NE
+
+    def _make_rotated_delta_pos_to_vertex(self, n, delta):
+        """The quad corners of rotating particles, built in place."""
+        half_size = self._scratch_1[:n, 0]
+        numpy.multiply(self.particle_size[:n, 0], 0.5, out=half_size)
+        # clockwise degrees to counter-clockwise radians
+        c = self._scratch_2[:n, 0]
+        s = self._scratch_2[:n, 1]
+        numpy.radians(self.particle_rotation[:n, 0], out=c)
+        numpy.negative(c, out=c)
+        numpy.sin(c, out=s)
+        numpy.cos(c, out=c)
+        numpy.multiply(c, half_size, out=c)
+        numpy.multiply(s, half_size, out=s)
+        # corner (cx, cy) rotates to (cx * c - cy * s, cx * s + cy * c)
+        a = delta[:, 2, 0]
+        numpy.add(c, s, out=a)
+        b = delta[:, 3, 0]
+        numpy.subtract(c, s, out=b)
+        numpy.negative(a, out=delta[:, 0, 0])  # NW
+        delta[:, 0, 1] = b
+        numpy.negative(b, out=delta[:, 1, 0])  # SW
+        numpy.negative(a, out=delta[:, 1, 1])
+        numpy.negative(b, out=delta[:, 2, 1])  # SE
+        delta[:, 3, 1] = a  # NE
+
+
+def simulation_of(system_class, seed=None):
+    """Headless simulation of a :class:`ParticleSystem` subclass.
+
+    Example::
+
+        fireworks = simulation_of(Fireworks, seed=1)
+        fireworks.simulate(600, 1.0 / 60)
+        state = fireworks.snapshot()
+
+    Arguments:
+        system_class (class): a :class:`ParticleSystem` subclass, by example
+            one from :mod:`cocos.particle_systems`.
+        seed (Optional[int]): seed for the random generator.
+
+    Returns:
+        ParticleSimulation: with the class attributes and methods defined in
+        system_class and its bases up to :class:`ParticleSystem`.
+    """
+    members = {}
+    for klass in reversed(system_class.__mro__):
+        if issubclass(klass, ParticleSystem) and klass is not ParticleSystem:
+            members.update((name, value) for name, value in vars(klass).items()
+                           if not name.startswith('__'))
+    simulation_class = type(str(system_class.__name__), (ParticleSimulation,), members)
+    return simulation_class(seed)
+
+
+class ParticleSystemPool(object):
+    """Recycles finished particle systems, so that spawning many short
+    lived effects does not allocate new particle arrays and GL resources.
+
+    Systems are pooled by class. A system got from :meth:`acquire` has
+    ``auto_remove_on_finish`` set: when it finishes it removes itself from
+    its parent and goes back to the pool. A system not in the scene can
+    also be given back explicitly with :meth:`release`.
+
+    Example::
+
+        pool = ParticleSystemPool()
+        ...
+        explosion = pool.acquire(Explosion)
+        explosion.position = x, y
+        layer.add(explosion)
+
+    Arguments:
+        max_per_class (int): maximum number of idle systems kept for each
+            class; systems released over that are discarded. Defaults to 16.
+    """
+    def __init__(self, max_per_class=16):
+        self.max_per_class = max_per_class
+        # class -> list of idle systems
+        self.idle = {}
+        #: acquires served by an idle system
+        self.hits = 0
+        #: acquires that created a new system
+        self.misses = 0
+        #: systems given back to the pool
+        self.released = 0
+        #: released systems not kept because the pool was full
+        self.discarded = 0
+
+    def acquire(self, system_class, **kwargs):
+        """Returns an idle system of class system_class, or a new one.
+
+        Arguments:
+            system_class (class): a :class:`ParticleSystem` subclass.
+            kwargs: passed to system_class when a new system is created.
+
+        Returns:
+            ParticleSystem: a system not in the scene, ready to be added.
+        """
+        idle = self.idle.get(system_class)
+        if idle:
+            self.hits += 1
+            system = idle.pop()
+        else:
+            self.misses += 1
+            system = system_class(**kwargs)
+            system.pool = self
+        system.auto_remove_on_finish = True
+        return system
 
-        # counter-clockwise
-        self.delta_pos_to_vertex[:, 0] = numpy.array([-size2, +size2]).T  # NW
-        self.delta_pos_to_vertex[:, 1] = numpy.array([-size2, -size2]).T  # SW
-        self.delta_pos_to_vertex[:, 2] = numpy.array([+size2, -size2]).T  # SE
-        self.delta_pos_to_vertex[:, 3] = numpy.array([+size2, +size2]).T  # NE
+    def release(self, system):
+        """Gives back a system to the pool, where it is restarted.
+
+        Arguments:
+            system (ParticleSystem): a system from :meth:`acquire`, not in
+                the scene.
+        """
+        self.released += 1
+        idle = self.idle.setdefault(type(system), [])
+        if len(idle) >= self.max_per_class:
+            self.discarded += 1
+            system.pool = None
+            return
+        system.restart()
+        idle.append(system)
+
+    @property
+    def hit_rate(self):
+        """Fraction of the acquires served by an idle system, 0.0 if none."""
+        acquires = self.hits + self.misses
+        return self.hits / acquires if acquires else 0.0
+
+    def stats(self):
+        """Returns the pool counters.
+
+        Returns:
+            dict: hits, misses, hit_rate, released, discarded and idle, the
+            number of idle systems.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'released': self.released,
+            'discarded': self.discarded,
+            'idle': sum(len(idle) for idle in self.idle.values()),
+            }
+
+    def clear(self):
+        """Forgets the idle systems, freeing their memory."""
+        for idle in self.idle.values():
+            for system in idle:
+                system.pool = None
+        self.idle = {}
+
+
+def _rects_to_tex_coords(rects, out):
+    """Quad tex coords, NW, SW, SE, NE as the quad vertexs, from (u0, v0,
+    u1, v1) rects; a single rect is repeated for all the quads in out."""
+    u0, v0, u1, v1 = rects[:, 0], rects[:, 1], rects[:, 2], rects[:, 3]
+    out[:, 0, 0] = u0
+    out[:, 0, 1] = v1
+    out[:, 1, 0] = u0
+    out[:, 1, 1] = v0
+    out[:, 2, 0] = u1
+    out[:, 2, 1] = v0
+    out[:, 3, 0] = u1
+    out[:, 3, 1] = v1
+
+
+def _transform_points(matrix, points, out):
+    """Applies an :class:`.euclid.Matrix3` affine transform to points,
+    an array with x, y in the last axis; the result goes to out."""
+    x = points[..., 0]
+    y = points[..., 1]
+    out[..., 0] = matrix.a * x + matrix.b * y + matrix.c
+    out[..., 1] = matrix.e * x + matrix.f * y + matrix.g
+
+
+class ParticleBatchGroup(object):
+    """The particles of the :class:`ParticleBatchNode` children sharing
+    texture and blend mode, merged to be drawn in one call. Children using
+    different regions of one texture, like frames or atlas images, share
+    the group.
+
+    Arguments:
+        texture (pyglet.image.Texture): texture shared by the group.
+        blend_additive (bool): blend mode shared by the group.
+        fallback (bool): True for quads, False for point sprites.
+    """
+    def __init__(self, texture, blend_additive, fallback):
+        self.texture = texture
+        self.blend_additive = blend_additive
+        self.fallback = fallback
+        #: number of particles in the group
+        self.count = 0
+        #: rows allocated in the arrays
+        self.capacity = 0
+        #: True if some of the particles rotate
+        self.rotates = False
+        #: True if the particles don't share a texture rect
+        self.per_particle_rects = False
+        self.buffers = None
+        self.arrays = ()
+        self._reserve(64)
+
+    def _reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        self.capacity = max(capacity, 2 * self.capacity)
+        old_arrays = self.arrays
+        if self.fallback:
+            #: quads vertexs, per vertex colors and tex coords
+            self.arrays = (numpy.zeros((self.capacity, 4, 2), numpy.float32),
+                           numpy.zeros((self.capacity, 4, 4), numpy.float32),
+                           numpy.zeros((self.capacity, 4, 2), numpy.float32))
+        else:
+            #: point positions, colors, sizes, rotations and texture rects
+            self.arrays = (numpy.zeros((self.capacity, 2), numpy.float32),
+                           numpy.zeros((self.capacity, 4), numpy.float32),
+                           numpy.zeros((self.capacity, 1), numpy.float32),
+                           numpy.zeros((self.capacity, 1), numpy.float32),
+                           numpy.zeros((self.capacity, 4), numpy.float32))
+        for old, new in zip(old_arrays, self.arrays):
+            new[:self.count] = old[:self.count]
+        # buffers are recreated with the new size
+        self.delete_buffers()
+
+    def delete_buffers(self):
+        """Releases the buffers, they are created again at the next draw"""
+        if self.buffers is not None:
+            for buffer in self.buffers:
+                buffer.delete()
+            self.buffers = None
+
+    def append(self, system):
+        """Appends the live particles of a system, in the coordinates
+        of its parent.
+
+        Arguments:
+            system (ParticleSystem): the system to append.
+        """
+        live = system._live_slots()
+        n = len(system.particle_life[live])
+        if n == 0:
+            return
+        start = self.count
+        self._reserve(start + n)
+        self.count = end = start + n
+        matrix = system.get_local_transform()
+        if self.fallback:
+            system.make_delta_pos_to_vertex()
+            system.update_vertexs_from_pos()
+            if system.particle_rects is not None:
+                system.update_tex_coords()
+            vertexs, colors, tex_coords = self.arrays
+            _transform_points(matrix, system.vertexs[live], vertexs[start:end])
+            colors[start:end] = system.particle_color[live][:, numpy.newaxis, :]
+            tex_coords[start:end] = system.tex_coords[live]
+        else:
+            pos, colors, sizes, rotations, rects = self.arrays
+            _transform_points(matrix, system.particle_pos[live], pos[start:end])
+            colors[start:end] = system.particle_color[live]
+            sizes[start:end] = system.particle_size_scaled[live]
+            if system.particle_rotation is None:
+                rotations[start:end] = 0.0
+            else:
+                rotations[start:end] = system.particle_rotation[live]
+                self.rotates = True
+            if system.particle_rects is None:
+                rects[start:end] = system.texture_rects[0]
+                if not numpy.array_equal(system.texture_rects[0], rects[0]):
+                    self.per_particle_rects = True
+            else:
+                system.update_particle_rects()
+                rects[start:end] = system.particle_rects[live]
+                self.per_particle_rects = True
+
+    def draw(self, batch):
+        """Draws the group with the current modelview.
+
+        Arguments:
+            batch (ParticleBatchNode): the batch node owning the group.
+        """
+        if self.buffers is None:
+            self.buffers = [create_stream_buffer(a, batch.use_buffer_objects)
+                            for a in self.arrays]
+        stream_to_buffer(self.buffers[0], self.arrays[0], self.count)
+        stream_to_buffer(self.buffers[1], self.arrays[1], self.count)
+        stream_to_buffer(self.buffers[2], self.arrays[2], self.count)
+        if self.fallback:
+            _draw_quads(self.texture, self.blend_additive, self.buffers, self.count)
+        else:
+            # rotations and rects only when needed
+            buffers = self.buffers[:3] + [None, None]
+            if self.rotates:
+                stream_to_buffer(self.buffers[3], self.arrays[3], self.count)
+                buffers[3] = self.buffers[3]
+            if self.per_particle_rects:
+                stream_to_buffer(self.buffers[4], self.arrays[4], self.count)
+                buffers[4] = self.buffers[4]
+            _draw_point_sprites(batch.sprite_shader, batch.attribute_idxs,
+                                self.texture, self.blend_additive, buffers,
+                                self.count, self.arrays[4][0])
+
+
+class ParticleBatchNode(CocosNode):
+    """Draws the particles of many :class:`ParticleSystem` children with a
+    single draw call for each texture and blend mode combination.
+
+    The children simulate as usual, only the drawing is done by the batch:
+    their live particles are merged, with the child position, rotation,
+    scale and anchor applied, and drawn in the batch node coordinates.
+    Groups are drawn in the order of their first child, so children z-order
+    holds only between groups. The children cameras, grids and own children
+    are not used.
+
+    Arguments:
+        fallback (Optional[None, True, False]): as in :class:`ParticleSystem`,
+            it applies to all the children. Defaults to None.
+    """
+
+    #: same as :attr:`ParticleSystem.use_buffer_objects`
+    use_buffer_objects = True
+
+    def __init__(self, fallback=None):
+        super(ParticleBatchNode, self).__init__()
+        if fallback is None:
+            fallback = not point_sprites_available()
+        self.fallback = fallback
+        if not fallback:
+            self.sprite_shader, self.attribute_idxs = _get_sprite_shader()
+        # (texture id, blend_additive) -> ParticleBatchGroup
+        self.groups = {}
+
+    def add(self, child, z=0, name=None):
+        if not isinstance(child, ParticleSystem):
+            raise Exception("Children node of a ParticleBatchNode must be of class ParticleSystem")
+        if self.fallback and getattr(child, 'vertexs', None) is None:
+            # the batch draws quads, a point sprites child needs the arrays
+            # to build them
+            child._fallback_init()
+        super(ParticleBatchNode, self).add(child, z, name)
+
+    def remove(self, child):
+        super(ParticleBatchNode, self).remove(child)
+        # forget groups without members
+        keys = set((_texture_key(c.texture), c.blend_additive)
+                   for c in self.get_children())
+        for key in list(self.groups):
+            if key not in keys:
+                self.groups.pop(key).delete_buffers()
+
+    def collect(self):
+        """Merges the live particles of the visible children by texture
+        and blend mode.
+
+        Returns:
+            list: the :class:`ParticleBatchGroup` to draw, in draw order.
+        """
+        in_order = []
+        for group in self.groups.values():
+            group.count = 0
+            group.rotates = False
+            group.per_particle_rects = False
+        for child in self.get_children():
+            if not child.visible:
+                continue
+            key = (_texture_key(child.texture), child.blend_additive)
+            group = self.groups.get(key)
+            if group is None:
+                group = ParticleBatchGroup(child.texture, child.blend_additive,
+                                           self.fallback)
+                self.groups[key] = group
+            if group not in in_order:
+                in_order.append(group)
+            group.append(child)
+        return [group for group in in_order if group.count]
+
+    def visit(self):
+        """All children are drawn by the batch, so nothing to visit"""
+        if not self.visible:
+            return
+        groups = self.collect()
+        gl.glPushMatrix()
+        self.transform()
+        for group in groups:
+            group.draw(self)
+        gl.glPopMatrix()
+
+    def draw(self):
+        pass  # All drawing done in visit!
@@ -0,0 +1,405 @@
+# ----------------------------------------------------------------------------
+# cocos2d
+# Copyright (c) 2008-2012 Daniel Moisset, Ricardo Quesada, Rayentray Tappa,
+# Lucio Torre
+# Copyright (c) 2009-2023  Richard Jones, Claudio Canepa
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#   * Neither the name of cocos2d nor the names of its
+#     contributors may be used to endorse or promote products
+#     derived from this software without specific prior written
+#     permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Affectors, vectorized per particle behaviors for particle systems.
+
+An affector changes the particles of a
+:class:`~cocos.particle.ParticleSimulation` every update with whole array
+numpy operations over the live particles, so adding behaviors keeps the
+update cost scaling as the built-in gravity, radial and tangential terms.
+
+Affectors are listed in the ``affectors`` class attribute of a particle
+system, and run in that order after the built-in terms::
+
+    class Sparks(ParticleSystem):
+        ...
+        affectors = (SizeOverLife([(0.0, 0.2), (0.1, 1.0), (1.0, 0.0)]),
+                     Bounce(normal=(0.0, 1.0), point=(0.0, -100.0),
+                            restitution=0.6),
+                     KillRegion(-500.0, -500.0, 1000.0, 300.0))
+
+Positions are those of the particles, relative to the emitter, unless
+the affector is built with ``relative=False``: then they are in the
+coordinates of the emitter parent, so by example a ground line stays put
+when the emitter moves.
+
+An affector holds only parameters, it is shared by all the systems of
+the class. Per particle state lives in particle arrays the affector
+declares in :attr:`Affector.arrays`; the system allocates them and keeps
+them along the particle when compact storage reorders the particles.
+"""
+
+from __future__ import division, print_function, unicode_literals
+
+__docformat__ = 'restructuredtext'
+
+__all__ = ['Affector', 'SizeOverLife', 'Rotation', 'FrameAnimation', 'Drag',
+           'VelocityDamping', 'Bounce', 'KillRegion']
+
+import math
+
+import numpy
+
+
+class Affector(object):
+    """Base class for affectors.
+
+    Subclasses override :meth:`update`, and :meth:`init_particles` if they
+    need to set per particle state at emission.
+    """
+
+    #: per particle arrays used by the affector, as (name, columns) pairs;
+    #: affectors can share arrays by name
+    arrays = ()
+
+    #: True if the affector changes particle_size
+    changes_size = False
+
+    def init_particles(self, system, idxs):
+        """Called after the system has initialized the particles at idxs.
+
+        Arguments:
+            system (ParticleSimulation): the particles owner.
+            idxs (numpy.ndarray): indexes of the new particles.
+        """
+        pass
+
+    def update(self, system, delta, n):
+        """Applies the affector to the first n particle slots. Slots of dead
+        particles can be changed too, they are not drawn.
+
+        The system scratch buffers, ``_scratch_1``, ``_scratch_2`` and
+        ``_scratch_mask``, are free to use.
+
+        Arguments:
+            system (ParticleSimulation): the particles owner.
+            delta (float): time in seconds since last update.
+            n (int): number of particle slots in use.
+        """
+        raise NotImplementedError
+
+
+def _random(system, n):
+    """n random values in [-1, 1), from the system random generator."""
+    return system.rng.random_sample(n) * 2.0 - 1.0
+
+
+def _parent_offset(affector, system):
+    """Offset from the emitter parent coordinates to the particles ones."""
+    if affector.relative:
+        return 0.0, 0.0
+    return system.x, system.y
+
+
+class SizeOverLife(Affector):
+    """Scales the particles size along their life.
+
+    Arguments:
+        keyframes (list): (age, factor) pairs sorted by age, age going from
+            0.0 at emission to 1.0 at death. The emission size is multiplied
+            by factor, linearly interpolated between keyframes and constant
+            before the first and after the last one.
+    """
+
+    arrays = (('particle_size_start', 1), ('particle_inverse_life', 1))
+
+    changes_size = True
+
+    def __init__(self, keyframes):
+        if not keyframes:
+            raise ValueError("SizeOverLife needs at least one keyframe")
+        ages = [age for age, factor in keyframes]
+        if ages != sorted(ages):
+            raise ValueError("SizeOverLife keyframes must be sorted by age")
+        self.keyframes = list(keyframes)
+        self.first_factor = keyframes[0][1]
+        # (start age, length, slope) of each segment
+        self.segments = []
+        for (a0, f0), (a1, f1) in zip(keyframes, keyframes[1:]):
+            if a1 > a0:
+                self.segments.append((a0, a1 - a0, (f1 - f0) / (a1 - a0)))
+
+    def init_particles(self, system, idxs):
+        system.particle_size_start[idxs] = system.particle_size[idxs]
+        system.particle_inverse_life[idxs] = 1.0 / numpy.maximum(system.particle_life[idxs],
+                                                                1e-6)
+        system.particle_size[idxs] *= self.first_factor
+
+    def update(self, system, delta, n):
+        age = system._scratch_2[:n, 0]
+        tmp = system._scratch_2[:n, 1]
+        factor = system._scratch_1[:n, 0]
+        # age = 1 - life / life at emission
+        numpy.multiply(system.particle_life[:n, 0], system.particle_inverse_life[:n, 0],
+                       out=age)
+        numpy.subtract(1.0, age, out=age)
+        # piecewise linear, each segment adds its clipped contribution
+        factor.fill(self.first_factor)
+        for start, length, slope in self.segments:
+            numpy.subtract(age, start, out=tmp)
+            numpy.clip(tmp, 0.0, length, out=tmp)
+            numpy.multiply(tmp, slope, out=tmp)
+            numpy.add(factor, tmp, out=factor)
+        numpy.multiply(system.particle_size_start[:n, 0], factor,
+                       out=system.particle_size[:n, 0])
+
+
+class Rotation(Affector):
+    """Spins the particles.
+
+    Rotations are in degrees, clockwise as in
+    :attr:`~cocos.cocosnode.CocosNode.rotation`; particle systems draw
+    the particles rotated when they have this affector.
+
+    Arguments:
+        speed (float): rotation speed in degrees per second.
+        speed_var (float): speed variance. Defaults to 0.0
+        start (float): rotation at emission. Defaults to 0.0
+        start_var (float): start variance. Defaults to 0.0
+    """
+
+    arrays = (('particle_rotation', 1), ('particle_rotation_speed', 1))
+
+    def __init__(self, speed, speed_var=0.0, start=0.0, start_var=0.0):
+        self.speed = speed
+        self.speed_var = speed_var
+        self.start = start
+        self.start_var = start_var
+
+    def init_particles(self, system, idxs):
+        n = len(idxs)
+        system.particle_rotation[idxs, 0] = self.start + self.start_var * _random(system, n)
+        system.particle_rotation_speed[idxs, 0] = (self.speed +
+                                                   self.speed_var * _random(system, n))
+
+    def update(self, system, delta, n):
+        rotation = system.particle_rotation[:n]
+        turn = system._scratch_1[:n]
+        numpy.multiply(system.particle_rotation_speed[:n], delta, out=turn)
+        numpy.add(rotation, turn, out=rotation)
+
+
+class FrameAnimation(Affector):
+    """Chooses the texture frame of the particles, animated over their life
+    or fixed; particle systems draw each particle with its frame from
+    :attr:`~cocos.particle.ParticleSystem.frames`.
+
+    Arguments:
+        frame_count (int): number of frames.
+        cycles (float): times the frames play over the particle life; 0.0
+            keeps the start frame. Defaults to 1.0
+        random_start (bool): if True each particle starts at a random frame,
+            else at the first one. Defaults to False
+    """
+
+    arrays = (('particle_frame', 1), ('particle_frame_start', 1),
+              ('particle_inverse_life', 1))
+
+    def __init__(self, frame_count, cycles=1.0, random_start=False):
+        if frame_count < 1:
+            raise ValueError("FrameAnimation needs at least one frame")
+        self.frame_count = frame_count
+        self.cycles = cycles
+        self.random_start = random_start
+
+    def init_particles(self, system, idxs):
+        if self.random_start:
+            start = numpy.floor(system.rng.random_sample(len(idxs)) * self.frame_count)
+        else:
+            start = 0.0
+        system.particle_frame_start[idxs, 0] = start
+        system.particle_frame[idxs, 0] = start
+        system.particle_inverse_life[idxs] = 1.0 / numpy.maximum(system.particle_life[idxs],
+                                                                1e-6)
+
+    def update(self, system, delta, n):
+        if self.cycles == 0.0:
+            return
+        frame = system.particle_frame[:n, 0]
+        # age = 1 - life / life at emission
+        numpy.multiply(system.particle_life[:n, 0], system.particle_inverse_life[:n, 0],
+                       out=frame)
+        numpy.subtract(1.0, frame, out=frame)
+        numpy.multiply(frame, self.cycles * self.frame_count, out=frame)
+        numpy.add(frame, system.particle_frame_start[:n, 0], out=frame)
+        numpy.floor(frame, out=frame)
+        numpy.fmod(frame, self.frame_count, out=frame)
+
+
+class Drag(Affector):
+    """Air drag, slows the particles proportionally to their squared speed.
+
+    Arguments:
+        coefficient (float): deceleration at unit speed; a particle at
+            speed v decelerates by coefficient * v * v.
+    """
+
+    def __init__(self, coefficient):
+        self.coefficient = coefficient
+
+    def update(self, system, delta, n):
+        direction = system.particle_dir[:n]
+        factor = system._scratch_1[:n, 0]
+        numpy.hypot(direction[:, 0], direction[:, 1], out=factor)
+        # implicit step, 1 / (1 + k * v * dt), stable for any dt
+        numpy.multiply(factor, self.coefficient * delta, out=factor)
+        numpy.add(factor, 1.0, out=factor)
+        numpy.reciprocal(factor, out=factor)
+        numpy.multiply(direction[:, 0], factor, out=direction[:, 0])
+        numpy.multiply(direction[:, 1], factor, out=direction[:, 1])
+
+
+class VelocityDamping(Affector):
+    """Exponential velocity damping, independent of the frame rate.
+
+    Arguments:
+        kept (float): fraction of the velocity kept after one second, by
+            example 0.5 halves the speed each second.
+    """
+
+    def __init__(self, kept):
+        self.kept = kept
+
+    def update(self, system, delta, n):
+        direction = system.particle_dir[:n]
+        numpy.multiply(direction, self.kept ** delta, out=direction)
+
+
+class Bounce(Affector):
+    """Bounces the particles on a line; they stay on the side the normal
+    points to.
+
+    Arguments:
+        normal (tuple): the line normal, need not be unit length.
+        point (tuple): a point in the line. Defaults to (0.0, 0.0)
+        restitution (float): fraction of the normal speed kept by the
+            bounce. Defaults to 0.5
+        friction (float): fraction of the speed along the line lost by the
+            bounce. Defaults to 0.0
+        relative (bool): if True normal and point are relative to the
+            emitter, else in the emitter parent coordinates. Defaults to True
+    """
+
+    def __init__(self, normal, point=(0.0, 0.0), restitution=0.5, friction=0.0,
+                 relative=True):
+        length = math.hypot(normal[0], normal[1])
+        if length == 0.0:
+            raise ValueError("Bounce normal can't be (0, 0)")
+        self.normal = normal[0] / length, normal[1] / length
+        self.point = tuple(point)
+        self.restitution = restitution
+        self.friction = friction
+        self.relative = relative
+
+    def update(self, system, delta, n):
+        pos = system.particle_pos[:n]
+        direction = system.particle_dir[:n]
+        distance = system._scratch_2[:n, 0]
+        normal_speed = system._scratch_2[:n, 1]
+        tmp = system._scratch_1[:n, 0]
+        hit = system._scratch_mask[:n]
+        nx, ny = self.normal
+        ox, oy = _parent_offset(self, system)
+        c = nx * (self.point[0] - ox) + ny * (self.point[1] - oy)
+
+        # signed distance to the line, negative behind it
+        numpy.multiply(pos[:, 0], nx, out=distance)
+        numpy.multiply(pos[:, 1], ny, out=tmp)
+        numpy.add(distance, tmp, out=distance)
+        numpy.subtract(distance, c, out=distance)
+        numpy.less(distance, 0.0, out=hit)
+        if not hit.any():
+            return
+
+        # back to the line
+        for axis, component in enumerate(self.normal):
+            numpy.multiply(distance, component, out=tmp)
+            numpy.subtract(pos[:, axis], tmp, out=pos[:, axis], where=hit)
+
+        # v = (1 - friction) * v_along - restitution * v_normal, for
+        # particles moving into the line; the others only get friction
+        numpy.multiply(direction[:, 0], nx, out=normal_speed)
+        numpy.multiply(direction[:, 1], ny, out=tmp)
+        numpy.add(normal_speed, tmp, out=normal_speed)
+        numpy.minimum(normal_speed, 0.0, out=normal_speed)
+        kept = 1.0 - self.friction
+        for axis, component in enumerate(self.normal):
+            numpy.multiply(normal_speed, (kept + self.restitution) * component, out=tmp)
+            numpy.multiply(direction[:, axis], kept, out=direction[:, axis], where=hit)
+            numpy.subtract(direction[:, axis], tmp, out=direction[:, axis], where=hit)
+
+
+class KillRegion(Affector):
+    """Kills the particles inside a rectangle, or outside it.
+
+    Arguments:
+        x (float): left of the rectangle.
+        y (float): bottom of the rectangle.
+        width (float): width of the rectangle.
+        height (float): height of the rectangle.
+        inside (bool): if True kills the particles inside the rectangle, if
+            False the ones outside. Defaults to True
+        relative (bool): if True the rectangle is relative to the emitter,
+            else in the emitter parent coordinates. Defaults to True
+    """
+
+    def __init__(self, x, y, width, height, inside=True, relative=True):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.inside = inside
+        self.relative = relative
+
+    def update(self, system, delta, n):
+        pos = system.particle_pos[:n]
+        outside_x = system._scratch_2[:n, 0]
+        outside_y = system._scratch_2[:n, 1]
+        outside = system._scratch_1[:n, 0]
+        region = system._scratch_mask[:n]
+        ox, oy = _parent_offset(self, system)
+        half_width = self.width * 0.5
+        half_height = self.height * 0.5
+        # how far out of the rectangle, negative inside
+        numpy.subtract(pos[:, 0], self.x - ox + half_width, out=outside_x)
+        numpy.absolute(outside_x, out=outside_x)
+        numpy.subtract(outside_x, half_width, out=outside_x)
+        numpy.subtract(pos[:, 1], self.y - oy + half_height, out=outside_y)
+        numpy.absolute(outside_y, out=outside_y)
+        numpy.subtract(outside_y, half_height, out=outside_y)
+        numpy.maximum(outside_x, outside_y, out=outside)
+        if self.inside:
+            numpy.less(outside, 0.0, out=region)
+        else:
+            numpy.greater(outside, 0.0, out=region)
+        numpy.copyto(system.particle_life[:n, 0], -1.0, where=region)
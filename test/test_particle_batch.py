@@ -0,0 +1,44 @@
+from __future__ import division, print_function, unicode_literals
+
+# This code is so you can run the samples without installing the package
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+#
+
+testinfo = "f 10 0.033, s, f 20 0.033, s, f 30 0.033, s, f 30 0.033, s, q"
+tags = "particles, ParticleBatchNode, Fire, Smoke"
+
+import pyglet
+import cocos
+from cocos.director import director
+from cocos.layer import *
+from cocos.particle import ParticleBatchNode
+from cocos.particle_systems import *
+
+class L(Layer):
+    def __init__(self):
+        super( L, self).__init__()
+
+        # 10 fires and 10 smokes, drawn with two draw calls
+        batch = ParticleBatchNode()
+        for i in range(10):
+            p = Fire()
+            p.position = (40 + 60 * i, 100)
+            batch.add( p )
+            p = Smoke()
+            p.position = (40 + 60 * i, 300)
+            p.rotation = 20
+            batch.add( p )
+        self.add( batch )
+
+def main():
+    director.init( resizable=True )
+    main_scene = cocos.scene.Scene()
+
+    main_scene.add( L() )
+
+    director.run( main_scene )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+from __future__ import division, print_function, unicode_literals
+
+# set the desired pyglet mockup
+import sys
+sys.path.insert(0,'pyglet_mockup1')
+import pyglet
+assert pyglet.mock_level == 1
+
+import copy
+
+import pytest
+
+from cocos.director import director
+from cocos.cocosnode import CocosNode
+import cocos.actions as ac
+
+director.init()
+
+
+class Follow(ac.IntervalAction):
+    shared_members = ('leader',)
+
+    def init(self, leader, duration):
+        self.leader = leader
+        self.offsets = [0.0]
+        self.duration = duration
+
+    def update(self, t):
+        self.offsets.append(t)
+        self.target.x = self.leader.x + t
+
+
+def test_composite_copy_is_independent():
+    move = ac.MoveBy((10.0, 0.0), 1.0)
+    template = (move + ac.RotateBy(90.0, 1.0)) | ac.FadeOut(2.0)
+    worker = copy.deepcopy(template)
+    assert type(worker) is type(template)
+    sequence = worker.actions[0]
+    assert sequence is not template.actions[0]
+    # members aliasing other members are copied once
+    assert sequence.actions[0] is sequence.one
+    assert sequence.actions[1] is sequence.two
+    assert sequence.one.delta == move.delta
+    assert sequence.one.delta is not template.actions[0].one.delta
+
+
+def test_shared_members():
+    leader = CocosNode()
+    leader.x = 100.0
+    template = Follow(leader, 1.0) * 2
+    worker = copy.deepcopy(template)
+    assert worker.one.leader is leader
+    assert worker.one.offsets == [0.0]
+    assert worker.one.offsets is not template.one.offsets
+
+
+def test_workers_from_one_template():
+    template = ac.MoveBy((10.0, 0.0), 1.0) * 2 + ac.Delay(0.5) + ac.Place((0.0, 0.0))
+    nodes = [CocosNode() for i in range(3)]
+    workers = [node.do(template) for node in nodes]
+    assert len(set(id(w) for w in workers)) == 3
+    for i, node in enumerate(nodes):
+        for k in range(i + 1):
+            node._step(0.5)
+    assert [node.x for node in nodes] == pytest.approx([5.0, 10.0, 15.0])
+    assert template.target is None
+    for k in range(4):
+        nodes[0]._step(0.5)
+    assert nodes[0].position == (0.0, 0.0)
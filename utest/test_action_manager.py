@@ -0,0 +1,87 @@
+from __future__ import division, print_function, unicode_literals
+
+# set the desired pyglet mockup
+import sys
+sys.path.insert(0,'pyglet_mockup1')
+import pyglet
+assert pyglet.mock_level == 1
+
+import pytest
+
+from cocos.director import director
+from cocos.cocosnode import CocosNode
+from cocos.action_manager import ActionManager
+import cocos.actions as ac
+
+director.init()
+
+
+@pytest.fixture(autouse=True)
+def fresh_manager(monkeypatch):
+    monkeypatch.setattr(director, 'action_manager', ActionManager())
+
+
+def running_node():
+    node = CocosNode()
+    node.on_enter()
+    # on_enter resumes the actions: a tick is skipped, the next one finds
+    # no actions and unregisters the node
+    director.action_manager.step(0.0)
+    director.action_manager.step(0.0)
+    return node
+
+
+def test_nodes_share_the_manager():
+    manager = director.action_manager
+    nodes = [running_node() for i in range(50)]
+    assert len(manager) == 0 and not manager.scheduled
+    for i, node in enumerate(nodes):
+        node.do(ac.MoveBy((10.0, 0.0), 1.0 + i % 2))
+    assert len(manager) == 50 and manager.scheduled
+    manager.step(0.5)
+    assert [node.x for node in nodes[:2]] == [5.0, 2.5]
+    manager.step(0.5)
+    # the actions done are removed at the next step, then the node goes
+    manager.step(0.0)
+    assert len(manager) == 25
+    assert all(nodes[i] in manager for i in range(1, 50, 2))
+    manager.step(1.0)
+    manager.step(0.0)
+    manager.step(0.0)
+    assert len(manager) == 0 and not manager.scheduled
+    assert all(node.x == 10.0 for node in nodes)
+
+
+def test_pause_resume_and_exit():
+    manager = director.action_manager
+    node, other = running_node(), running_node()
+    node.do(ac.MoveBy((10.0, 0.0), 1.0))
+    other.do(ac.MoveBy((10.0, 0.0), 1.0))
+    manager.step(0.1)
+    node.pause()
+    assert node not in manager and other in manager
+    manager.step(0.1)
+    assert node.x == 1.0 and other.x == 2.0
+    node.resume()
+    # skips a frame after resume
+    manager.step(0.1)
+    manager.step(0.1)
+    assert node.x == 2.0
+    other.on_exit()
+    assert other not in manager
+    manager.step(0.1)
+    assert other.x == 4.0
+    node.stop()
+    manager.step(0.0)
+    manager.step(0.0)
+    assert len(manager) == 0
+
+
+def test_node_paused_while_stepping_is_not_stepped():
+    manager = director.action_manager
+    node, other = running_node(), running_node()
+    node.do(ac.Delay(0.25) + ac.CallFunc(lambda: other.pause()))
+    other.do(ac.MoveBy((10.0, 0.0), 1.0))
+    manager.step(0.5)
+    assert other.x == 0.0
+    assert other not in manager
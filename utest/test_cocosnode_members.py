@@ -0,0 +1,68 @@
+from __future__ import division, print_function, unicode_literals
+
+# set the desired pyglet mockup
+import sys
+sys.path.insert(0,'pyglet_mockup1')
+import pyglet
+assert pyglet.mock_level == 1
+
+import copy
+
+from cocos.director import director
+from cocos.cocosnode import CocosNode
+from cocos.camera import Camera
+from cocos import euclid
+import cocos.actions as ac
+
+director.init()
+
+lazy_members = ['children', 'children_names', 'camera', 'actions', 'to_remove',
+                'scheduled_calls', 'scheduled_interval_calls',
+                'transform_matrix', 'inverse_transform_matrix']
+
+
+def test_members_created_on_first_use():
+    node = CocosNode()
+    assert all(name not in node.__dict__ for name in lazy_members)
+    assert node.children == [] and node.children_names == {}
+    assert isinstance(node.camera, Camera)
+    assert node.actions == [] and node.to_remove == []
+    assert node.scheduled_calls == [] and node.scheduled_interval_calls == []
+    assert isinstance(node.transform_matrix, euclid.Matrix3)
+    assert node.get_local_inverse() is node.inverse_transform_matrix
+    assert all(name in node.__dict__ for name in lazy_members)
+    # each node gets its own
+    other = CocosNode()
+    assert other.children is not node.children
+    assert other.camera is not node.camera
+    assert (node.x, node.y, node.scale, node.rotation, node.visible,
+            node.grid, node.is_running) == (0, 0, 1.0, 0.0, True, None, False)
+
+
+def test_enter_exit_and_visit_keep_leaves_lean():
+    parent = CocosNode()
+    leaves = [CocosNode() for i in range(3)]
+    for i, leaf in enumerate(leaves):
+        parent.add(leaf, z=i - 1, name='leaf%d' % i)
+    parent.on_enter()
+    parent.visit()
+    assert parent.get('leaf1') is leaves[1]
+    parent.remove('leaf2')
+    parent.on_exit()
+    assert [leaf for leaf in leaves if set(leaf.__dict__) & set(lazy_members)] == []
+    assert not leaves[0].are_actions_running()
+    leaves[0].stop()
+    leaves[0].unschedule(len)
+    assert 'scheduled_calls' not in leaves[0].__dict__
+
+
+def test_assignment_and_copy():
+    node = CocosNode()
+    node.children = [(0, CocosNode())]
+    assert len(node.get_children()) == 1
+    node.do(ac.MoveBy((10.0, 0.0), 1.0))
+    node.scale = 2.0
+    twin = copy.copy(node)
+    assert twin.actions is node.actions
+    assert twin.scale == 2.0
+    assert CocosNode.children.name == 'children'
@@ -0,0 +1,117 @@
+from __future__ import division, print_function, unicode_literals
+
+# set the desired pyglet mockup
+import sys
+sys.path.insert(0,'pyglet_mockup1')
+import pyglet
+assert pyglet.mock_level == 1
+
+import pytest
+
+from cocos.director import director
+from cocos.cocosnode import CocosNode
+from cocos.euclid import Point2
+
+director.init()
+
+
+def chain(depth):
+    nodes = [CocosNode()]
+    for i in range(depth):
+        node = CocosNode()
+        node.position = (10.0, 5.0 * i)
+        node.rotation = 15.0 * i
+        node.scale = 1.0 + 0.1 * i
+        nodes[-1].add(node)
+        nodes.append(node)
+    return nodes
+
+
+def walked_world(node):
+    # world position of the local origin, walking the ancestors
+    x, y = 0.0, 0.0
+    while node is not None:
+        x, y = node.get_local_transform() * Point2(x, y)
+        node = node.parent
+    return x, y
+
+
+def assert_consistent(node):
+    assert tuple(node.point_to_world((0.0, 0.0))) == pytest.approx(walked_world(node))
+    back = node.point_to_local(node.point_to_world((3.0, -2.0)))
+    assert tuple(back) == pytest.approx((3.0, -2.0))
+
+
+def test_world_matrices_are_cached():
+    nodes = chain(5)
+    leaf = nodes[-1]
+    assert leaf.get_world_transform() is leaf.get_world_transform()
+    assert leaf.get_world_inverse() is leaf.get_world_inverse()
+    assert_consistent(leaf)
+
+
+@pytest.mark.parametrize("attrib, value", [
+    ('position', (-40.0, 7.0)),
+    ('x', 3.0),
+    ('y', -3.0),
+    ('rotation', 33.0),
+    ('scale', 0.5),
+    ('scale_x', 2.0),
+    ('scale_y', 0.25),
+    ('transform_anchor', (20.0, 10.0)),
+    ('transform_anchor_x', 20.0),
+    ('anchor_y', 12.0),
+    ])
+def test_ancestor_change_invalidates(attrib, value):
+    nodes = chain(4)
+    leaf = nodes[-1]
+    world = leaf.get_world_transform()
+    inverse = leaf.get_world_inverse()
+    setattr(nodes[1], attrib, value)
+    assert leaf.get_world_transform() is not world
+    assert leaf.get_world_inverse() is not inverse
+    assert_consistent(leaf)
+    # untouched branches keep their cache
+    assert nodes[0].get_world_transform() is nodes[0].get_world_transform()
+
+
+def test_reparent():
+    first, second = chain(2), chain(3)
+    node = first[-1]
+    node.get_world_transform()
+    first[-2].remove(node)
+    second[-1].add(node)
+    assert_consistent(node)
+    second[0].rotation = 90.0
+    assert_consistent(node)
+
+
+def test_removed_node_follows_former_parent():
+    parent, child = chain(1)
+    grandchild = CocosNode()
+    child.add(grandchild)
+    parent.remove(child)
+    # the removed nodes keep the parent reference, as before the cache
+    assert child.parent is parent
+    for node in (child, grandchild):
+        assert tuple(node.point_to_world((0.0, 0.0))) == pytest.approx((10.0, 0.0))
+    parent.position = (100.0, 0.0)
+    for node in (child, grandchild):
+        assert tuple(node.point_to_world((0.0, 0.0))) == pytest.approx((110.0, 0.0))
+        assert_consistent(node)
+    # added again, caching resumes
+    parent.add(child)
+    assert child.get_world_transform() is child.get_world_transform()
+    assert grandchild.get_world_inverse() is grandchild.get_world_inverse()
+
+
+def test_points_to_world_and_local():
+    numpy = pytest.importorskip('numpy')
+    leaf = chain(4)[-1]
+    points = numpy.array([(0.0, 0.0), (1.0, 2.0), (-5.0, 3.5)])
+    world = leaf.points_to_world(points)
+    assert world.shape == (3, 2)
+    for p, w in zip(points, world):
+        assert tuple(w) == pytest.approx(tuple(leaf.point_to_world(p)))
+    assert leaf.points_to_local(world) == pytest.approx(points)
+    assert leaf.points_to_world([(1.0, 2.0)]) == pytest.approx(world[1:2])
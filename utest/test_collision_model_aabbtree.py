@@ -0,0 +1,117 @@
+from __future__ import division, print_function, unicode_literals
+
+# CollisionManagerAABBTree must give the same answers as the brute force
+# collision manager, and keep the tree well formed
+
+import random
+
+import cocos.collision_model as cm
+import cocos.euclid as eu
+
+
+class Obj_with_shape(object):
+    def __init__(self, name, cshape):
+        self.name = name
+        self.cshape = cshape
+
+
+def random_objs(seed, quantity):
+    # mostly tiny objects plus some huge ones, in a big world
+    rnd = random.Random(seed)
+    objs = []
+    for i in range(quantity):
+        center = eu.Vector2(rnd.uniform(-5000.0, 5000.0),
+                            rnd.uniform(-3000.0, 3000.0))
+        size = 400.0 if i % 50 == 0 else rnd.uniform(2.0, 40.0)
+        if i % 2:
+            cshape = cm.CircleShape(center, size)
+        else:
+            cshape = cm.AARectShape(center, size, rnd.uniform(0.5, 1.5) * size)
+        objs.append(Obj_with_shape(i, cshape))
+    return objs
+
+
+def pair_ids(pairs):
+    return [frozenset([a.name, b.name]) for a, b in pairs]
+
+
+def check_tree(collman):
+    # returns the number of leaves; asserts heights, parents and AABBs
+    def visit(node):
+        if node.height == 0:
+            assert node.left is None and node.right is None
+            minx, maxx, miny, maxy = node.obj.cshape.minmax()
+            assert (node.minx <= minx and maxx <= node.maxx and
+                    node.miny <= miny and maxy <= node.maxy)
+            assert collman.leaves[node.obj] is node
+            return 1
+        for child in (node.left, node.right):
+            assert child.parent is node
+            assert (node.minx <= child.minx and child.maxx <= node.maxx and
+                    node.miny <= child.miny and child.maxy <= node.maxy)
+        assert node.height == 1 + max(node.left.height, node.right.height)
+        assert abs(node.left.height - node.right.height) <= 1
+        return visit(node.left) + visit(node.right)
+
+    if collman.root is None:
+        return 0
+    assert collman.root.parent is None
+    return visit(collman.root)
+
+
+def check_same_answers(collman, brute, objs):
+    assert collman.known_objs() == brute.known_objs()
+    got = pair_ids(collman.iter_all_collisions())
+    assert len(got) == len(set(got))
+    assert set(got) == set(pair_ids(brute.iter_all_collisions()))
+    for obj in objs[:40]:
+        assert set(collman.objs_colliding(obj)) == set(brute.objs_colliding(obj))
+        assert (set(collman.objs_near(obj, 30.0)) ==
+                set(brute.objs_near(obj, 30.0)))
+        assert ([d for other, d in collman.ranked_objs_near(obj, 60.0)] ==
+                [d for other, d in brute.ranked_objs_near(obj, 60.0)])
+        x, y = obj.cshape.center
+        assert collman.objs_touching_point(x, y) == brute.objs_touching_point(x, y)
+    box = (-2000.0, 1500.0, -1000.0, 2500.0)
+    assert collman.objs_into_box(*box) == brute.objs_into_box(*box)
+
+
+def test_same_answers_as_brute_force():
+    objs = random_objs(31, 600)
+    collman = cm.CollisionManagerAABBTree()
+    brute = cm.CollisionManagerBruteForce()
+    for obj in objs:
+        collman.add(obj)
+        brute.add(obj)
+    assert check_tree(collman) == len(objs)
+    check_same_answers(collman, brute, objs)
+
+    # move all, some stay inside the fat AABB and some need reinsertion
+    rnd = random.Random(5)
+    for obj in objs:
+        obj.cshape.center = obj.cshape.center + (rnd.uniform(-60.0, 60.0),
+                                                 rnd.uniform(-60.0, 60.0))
+    collman.update_many(objs)
+    assert check_tree(collman) == len(objs)
+    check_same_answers(collman, brute, objs)
+
+    for obj in objs[::3]:
+        collman.remove_tricky(obj)
+        brute.remove_tricky(obj)
+    assert check_tree(collman) == len(brute.known_objs())
+    check_same_answers(collman, brute, objs[1::3])
+
+    collman.clear()
+    assert collman.known_objs() == set()
+    assert list(collman.iter_all_collisions()) == []
+    assert collman.objs_colliding(objs[0]) == []
+
+
+def test_no_world_bounds_needed():
+    collman = cm.CollisionManagerAABBTree()
+    far = Obj_with_shape('far', cm.CircleShape(eu.Vector2(1.0e7, -1.0e7), 1.0))
+    near = Obj_with_shape('near', cm.CircleShape(eu.Vector2(0.0, 0.0), 1.0))
+    collman.add(far)
+    collman.add(near)
+    probe = Obj_with_shape('probe', cm.CircleShape(eu.Vector2(1.0e7, -1.0e7 + 1.5), 1.0))
+    assert collman.objs_colliding(probe) == [far]
@@ -205,6 +205,10 @@ def params_for_test_collman_aarects():
             ('CollisionManagerGrid', [0.0, 100.0, 0.0, 100.0, 4.0, 4.0], (4.0, 4.0)),
         "target bigger than cell":
             ('CollisionManagerGrid', [0.0, 100.0, 0.0, 100.0, 2.0, 2.0], (2.0, 2.0)),
+        "numpy arrays":
+            ('CollisionManagerNumpy', [], (2.2, 3.7)),
+        "aabb tree":
+            ('CollisionManagerAABBTree', [], (2.2, 3.7)),
         }
     sufixes_parametrized_tests = []
     params = []
@@ -225,6 +229,8 @@ def test_collman_aarects(cls_name, ctor_args, offset):
       - 'ctor_args' provide the parameters needed to instantiate the
         collision manager.
     """
+    if cls_name == 'CollisionManagerNumpy':
+        pytest.importorskip('numpy')
     emptyset = set()
     (center_aarect, ring_touching, ring_near, ring_far,
      near_distance, far_distance, rays) = aarect_data1(eu.Vector2(*offset))
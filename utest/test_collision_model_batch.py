@@ -0,0 +1,71 @@
+from __future__ import division, print_function, unicode_literals
+
+# the batch queries must give the same answers as the single object ones
+
+import random
+
+import pytest
+
+import cocos.collision_model as cm
+import cocos.euclid as eu
+
+
+class Obj_with_shape(object):
+    def __init__(self, name, cshape):
+        self.name = name
+        self.cshape = cshape
+
+
+def random_objs(seed, quantity):
+    rnd = random.Random(seed)
+    objs = []
+    for i in range(quantity):
+        center = eu.Vector2(rnd.uniform(0.0, 200.0), rnd.uniform(0.0, 150.0))
+        if i % 2:
+            cshape = cm.CircleShape(center, rnd.uniform(1.0, 8.0))
+        else:
+            cshape = cm.AARectShape(center, rnd.uniform(1.0, 8.0),
+                                    rnd.uniform(1.0, 8.0))
+        objs.append(Obj_with_shape(i, cshape))
+    return objs
+
+
+def as_pairs(queries, single_query):
+    return set((i, other) for i, q in enumerate(queries)
+               for other in single_query(q))
+
+
+@pytest.mark.parametrize("cls_name, ctor_args", [
+    ('CollisionManagerBruteForce', []),
+    ('CollisionManagerGrid', [0.0, 200.0, 0.0, 150.0, 10.0, 10.0]),
+    ('CollisionManagerNumpy', []),
+    ('CollisionManagerAABBTree', []),
+    ])
+def test_batch_same_as_single(cls_name, ctor_args):
+    if cls_name == 'CollisionManagerNumpy':
+        pytest.importorskip('numpy')
+    objs = random_objs(3, 300)
+    collman = getattr(cm, cls_name)(*ctor_args)
+    for obj in objs[:250]:
+        collman.add(obj)
+    # a mix of known and not known objects
+    queries = objs[200:]
+
+    res = collman.objs_colliding_many(queries)
+    assert len(res) == len(set(res))
+    assert set(res) == as_pairs(queries, collman.objs_colliding)
+
+    res = collman.objs_near_many(queries, 5.0)
+    assert len(res) == len(set(res))
+    assert set(res) == as_pairs(queries, lambda q: collman.objs_near(q, 5.0))
+
+    rnd = random.Random(8)
+    points = [(rnd.uniform(0.0, 200.0), rnd.uniform(0.0, 150.0))
+              for i in range(200)]
+    res = collman.objs_touching_points(points)
+    assert len(res) == len(set(res))
+    assert set(res) == as_pairs(points,
+                                lambda p: collman.objs_touching_point(*p))
+
+    assert collman.objs_colliding_many([]) == []
+    assert collman.objs_touching_points([]) == []
@@ -0,0 +1,160 @@
+from __future__ import division, print_function, unicode_literals
+
+# objects with collision_category and collision_mask members only interact
+# when the category of each one is in the mask of the other
+
+import random
+
+import pytest
+
+import cocos.collision_model as cm
+import cocos.euclid as eu
+
+# CATEGORY_DEFAULT is 1, and no mask includes it
+PLAYER = 2
+PLAYER_BULLET = 4
+ENEMY = 8
+ENEMY_BULLET = 16
+
+masks = {
+    PLAYER: ENEMY | ENEMY_BULLET,
+    PLAYER_BULLET: ENEMY,
+    ENEMY: PLAYER | PLAYER_BULLET,
+    ENEMY_BULLET: PLAYER,
+    }
+
+
+class Obj_with_shape(object):
+    def __init__(self, name, cshape, category=None):
+        self.name = name
+        self.cshape = cshape
+        if category is not None:
+            self.collision_category = category
+            self.collision_mask = masks[category]
+
+
+def random_objs(seed, quantity):
+    rnd = random.Random(seed)
+    objs = []
+    for i in range(quantity):
+        center = eu.Vector2(rnd.uniform(0.0, 200.0), rnd.uniform(0.0, 150.0))
+        if i % 2:
+            cshape = cm.CircleShape(center, rnd.uniform(1.0, 8.0))
+        else:
+            cshape = cm.AARectShape(center, rnd.uniform(1.0, 8.0),
+                                    rnd.uniform(1.0, 8.0))
+        # some objects without members, they use the defaults
+        category = rnd.choice([None, PLAYER, PLAYER_BULLET, ENEMY,
+                               ENEMY_BULLET])
+        objs.append(Obj_with_shape(i, cshape, category))
+    return objs
+
+
+def interact(a, b):
+    return cm.categories_collide(cm.collision_filter(a), cm.collision_filter(b))
+
+
+managers = [
+    ('CollisionManagerBruteForce', []),
+    ('CollisionManagerGrid', [0.0, 200.0, 0.0, 150.0, 10.0, 10.0]),
+    ('CollisionManagerNumpy', []),
+    ('CollisionManagerAABBTree', []),
+    ]
+
+
+def make_collman(cls_name, ctor_args):
+    if cls_name == 'CollisionManagerNumpy':
+        pytest.importorskip('numpy')
+    return getattr(cm, cls_name)(*ctor_args)
+
+
+def test_defaults():
+    obj = Obj_with_shape(0, cm.CircleShape(eu.Vector2(0.0, 0.0), 1.0))
+    assert cm.collision_filter(obj) == (cm.CATEGORY_DEFAULT, cm.MASK_ALL)
+    assert interact(obj, obj)
+    bullet = Obj_with_shape(1, cm.CircleShape(eu.Vector2(0.0, 0.0), 1.0),
+                            PLAYER_BULLET)
+    # the default category is not in a player bullet's mask
+    assert not interact(obj, bullet)
+    enemy = Obj_with_shape(2, cm.CircleShape(eu.Vector2(0.0, 0.0), 1.0),
+                           ENEMY)
+    assert interact(bullet, enemy)
+    assert not interact(obj, enemy)
+
+
+@pytest.mark.parametrize("cls_name, ctor_args", managers)
+def test_filtered_queries(cls_name, ctor_args):
+    objs = random_objs(5, 300)
+    collman = make_collman(cls_name, ctor_args)
+    for obj in objs[:250]:
+        collman.add(obj)
+    known = objs[:250]
+
+    expected = set(frozenset((a.name, b.name))
+                   for i, a in enumerate(known) for b in known[:i]
+                   if interact(a, b) and a.cshape.overlaps(b.cshape))
+    got = [frozenset((a.name, b.name)) for a, b in collman.iter_all_collisions()]
+    assert len(got) == len(set(got))
+    assert set(got) == expected
+
+    for obj in objs[200:]:
+        others = [other for other in known if other is not obj and
+                  interact(obj, other)]
+        assert (set(collman.objs_colliding(obj)) ==
+                set(o for o in others if obj.cshape.overlaps(o.cshape)))
+        assert (set(collman.iter_colliding(obj)) ==
+                set(collman.objs_colliding(obj)))
+        for other in known[:20]:
+            assert (collman.they_collide(obj, other) ==
+                    (interact(obj, other) and
+                     obj.cshape.overlaps(other.cshape)))
+        near = collman.ranked_objs_near(obj, 6.0)
+        assert (set(other for other, d in near) ==
+                set(o for o in others if obj.cshape.distance(o.cshape) <= 6.0))
+        if near:
+            assert interact(obj, collman.any_near(obj, 6.0 + 1e-6))
+        nearest = collman.k_nearest(obj, 3)
+        distances = sorted(obj.cshape.distance(o.cshape) for o in others)
+        assert [d for other, d in nearest] == distances[:3]
+        for other, t in collman.sweep_hits(obj, (15.0, -5.0)):
+            assert interact(obj, other)
+
+    queries = objs[200:]
+    res = collman.objs_colliding_many(queries)
+    assert set(res) == set((i, other) for i, q in enumerate(queries)
+                           for other in collman.objs_colliding(q))
+    res = collman.objs_near_many(queries, 5.0)
+    assert set(res) == set((i, other) for i, q in enumerate(queries)
+                           for other, d in collman.objs_near_wdistance(q, 5.0))
+
+    # after removal the filters are still consistent
+    for obj in known[::3]:
+        collman.remove_tricky(obj)
+    known = [obj for obj in known if collman.knows(obj)]
+    expected = set(frozenset((a.name, b.name))
+                   for i, a in enumerate(known) for b in known[:i]
+                   if interact(a, b) and a.cshape.overlaps(b.cshape))
+    assert (set(frozenset((a.name, b.name))
+                for a, b in collman.iter_all_collisions()) == expected)
+
+
+@pytest.mark.parametrize("cls_name, ctor_args", managers)
+def test_category_pairs(cls_name, ctor_args):
+    objs = random_objs(9, 300)
+    collman = make_collman(cls_name, ctor_args)
+    for obj in objs:
+        collman.add(obj)
+    category_pairs = [(PLAYER_BULLET, ENEMY), (ENEMY_BULLET, PLAYER)]
+    got = list(collman.iter_all_collisions(category_pairs))
+    for a, b in got:
+        assert ((a.collision_category, b.collision_category) in
+                category_pairs)
+    expected = set((a.name, b.name) for a, b in collman.iter_all_collisions()
+                   if getattr(a, 'collision_category', None) in
+                   (PLAYER_BULLET, ENEMY_BULLET) or
+                   getattr(b, 'collision_category', None) in
+                   (PLAYER_BULLET, ENEMY_BULLET))
+    assert len(got) == len(expected)
+    assert (set(frozenset((a.name, b.name)) for a, b in got) ==
+            set(frozenset(pair) for pair in expected))
+    assert got
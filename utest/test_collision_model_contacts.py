@@ -0,0 +1,121 @@
+from __future__ import division, print_function, unicode_literals
+
+# update_contacts reports the began, persisted and ended collisions
+
+import random
+
+import pytest
+
+import cocos.collision_model as cm
+import cocos.euclid as eu
+
+
+class Obj_with_shape(object):
+    def __init__(self, name, cshape):
+        self.name = name
+        self.cshape = cshape
+
+
+def random_objs(rnd, quantity):
+    objs = []
+    for i in range(quantity):
+        center = eu.Vector2(rnd.uniform(20.0, 180.0), rnd.uniform(20.0, 130.0))
+        if i % 2:
+            cshape = cm.CircleShape(center, rnd.uniform(2.0, 8.0))
+        else:
+            cshape = cm.AARectShape(center, rnd.uniform(2.0, 8.0),
+                                    rnd.uniform(2.0, 8.0))
+        objs.append(Obj_with_shape(i, cshape))
+    return objs
+
+
+def keys(pairs):
+    return set(frozenset((a.name, b.name)) for a, b in pairs)
+
+
+managers = [
+    ('CollisionManagerBruteForce', []),
+    ('CollisionManagerGrid', [0.0, 200.0, 0.0, 150.0, 10.0, 10.0]),
+    ('CollisionManagerNumpy', []),
+    ('CollisionManagerAABBTree', []),
+    ]
+
+
+def make_collman(cls_name, ctor_args):
+    if cls_name == 'CollisionManagerNumpy':
+        pytest.importorskip('numpy')
+    return getattr(cm, cls_name)(*ctor_args)
+
+
+@pytest.mark.parametrize("cls_name, ctor_args", managers)
+def test_contacts_across_frames(cls_name, ctor_args):
+    rnd = random.Random(8)
+    objs = random_objs(rnd, 150)
+    collman = make_collman(cls_name, ctor_args)
+    for obj in objs:
+        collman.add(obj)
+
+    previous = set()
+    for frame in range(6):
+        current = keys(collman.iter_all_collisions())
+        began, persisted, ended = collman.update_contacts()
+        assert keys(began) == current - previous
+        assert keys(persisted) == current & previous
+        assert keys(ended) == previous - current
+        assert len(began) + len(persisted) == len(current)
+        previous = current
+        for obj in objs:
+            obj.cshape.center = obj.cshape.center + (rnd.uniform(-3.0, 3.0),
+                                                     rnd.uniform(-3.0, 3.0))
+        collman.update_many(objs)
+
+    # no changes, all persist
+    began, persisted, ended = collman.update_contacts()
+    began, persisted, ended = collman.update_contacts()
+    assert began == [] and ended == []
+    assert keys(persisted) == keys(collman.iter_all_collisions())
+
+
+@pytest.mark.parametrize("cls_name, ctor_args", managers)
+def test_contacts_remove_clear_forget(cls_name, ctor_args):
+    collman = make_collman(cls_name, ctor_args)
+    a = Obj_with_shape('a', cm.CircleShape(eu.Vector2(50.0, 50.0), 5.0))
+    b = Obj_with_shape('b', cm.CircleShape(eu.Vector2(55.0, 50.0), 5.0))
+    c = Obj_with_shape('c', cm.AARectShape(eu.Vector2(45.0, 50.0), 2.0, 2.0))
+    for obj in (a, b, c):
+        collman.add(obj)
+    began, persisted, ended = collman.update_contacts()
+    assert keys(began) == set([frozenset('ab'), frozenset('ac')])
+
+    # the clear and re-add pattern keeps the contacts
+    collman.clear()
+    for obj in (a, b, c):
+        collman.add(obj)
+    began, persisted, ended = collman.update_contacts()
+    assert began == [] and ended == []
+    assert len(persisted) == 2
+
+    # removing an object ends its contacts
+    collman.remove_tricky(b)
+    began, persisted, ended = collman.update_contacts()
+    assert keys(ended) == set([frozenset('ab')])
+    assert keys(persisted) == set([frozenset('ac')])
+
+    collman.forget_contacts()
+    began, persisted, ended = collman.update_contacts()
+    assert keys(began) == set([frozenset('ac')])
+    assert persisted == [] and ended == []
+
+
+@pytest.mark.parametrize("cls_name, ctor_args", managers)
+def test_contacts_with_category_pairs(cls_name, ctor_args):
+    collman = make_collman(cls_name, ctor_args)
+    bullet = Obj_with_shape('bullet', cm.CircleShape(eu.Vector2(50.0, 50.0), 2.0))
+    bullet.collision_category = 2
+    enemy = Obj_with_shape('enemy', cm.CircleShape(eu.Vector2(51.0, 50.0), 5.0))
+    enemy.collision_category = 4
+    rock = Obj_with_shape('rock', cm.CircleShape(eu.Vector2(52.0, 50.0), 5.0))
+    for obj in (bullet, enemy, rock):
+        collman.add(obj)
+    began, persisted, ended = collman.update_contacts([(2, 4)])
+    assert began == [(bullet, enemy)]
@@ -106,3 +106,61 @@ def test_CollisionManagerGrid_fulfil_obj_can_be_not_known():
 
     for e in collman.ranked_objs_near(not_known, 1.0):
         assert e[0] is known
+
+
+def grid_buckets_snapshot(collman):
+    return [set(bucket) for bucket in collman.buckets]
+
+
+def test_CollisionManagerGrid_update_matches_fresh_add():
+    w_width = 200.0
+    w_height = 100.0
+    cell_side = 20.00
+    collman = cm.CollisionManagerGrid(0.0, w_width, 0.0, w_height, cell_side,
+                                      cell_side)
+    objs = [create_obj_with_circle(i, eu.Vector2(15.0 + 9.0 * i, 30.0), 7.0)
+            for i in range(15)]
+    for obj in objs:
+        collman.add(obj)
+
+    # small moves, big moves and objects going partially out of world
+    for i, obj in enumerate(objs):
+        obj.cshape.center = obj.cshape.center + (3.0 * i - 20.0, 2.0 * i)
+    collman.update_many(objs)
+
+    fresh = cm.CollisionManagerGrid(0.0, w_width, 0.0, w_height, cell_side,
+                                    cell_side)
+    for obj in objs:
+        fresh.add(obj)
+    assert grid_buckets_snapshot(collman) == grid_buckets_snapshot(fresh)
+    assert collman.known_objs() == set(objs)
+
+
+def test_CollisionManagerGrid_update_only_touches_changed_cells():
+    collman = cm.CollisionManagerGrid(0.0, 200.0, 0.0, 100.0, 20.0, 20.0)
+    obj = create_obj_with_circle('obj', eu.Vector2(30.0, 30.0), 5.0)
+    collman.add(obj)
+    before = collman.cells[obj]
+
+    # moving inside the same cells does not change storage
+    obj.cshape.center = eu.Vector2(31.0, 29.0)
+    collman.update(obj)
+    assert collman.cells[obj] == before
+
+    # crossing a cell border
+    obj.cshape.center = eu.Vector2(38.0, 30.0)
+    collman.update(obj)
+    assert collman.cells[obj] != before
+    assert obj in collman.buckets[1 + 1 * collman.cols]
+    assert obj in collman.buckets[2 + 1 * collman.cols]
+
+
+def test_CollisionManagerGrid_remove_after_cshape_changed_does_not_leak():
+    collman = cm.CollisionManagerGrid(0.0, 200.0, 0.0, 100.0, 20.0, 20.0)
+    obj = create_obj_with_circle('obj', eu.Vector2(30.0, 30.0), 5.0)
+    collman.add(obj)
+    obj.cshape.center = eu.Vector2(150.0, 70.0)
+    collman.remove_tricky(obj)
+    assert not collman.knows(obj)
+    for bucket in collman.buckets:
+        assert obj not in bucket
@@ -0,0 +1,85 @@
+from __future__ import division, print_function, unicode_literals
+
+# k_nearest and nearest must agree with a full ranking of all the objects
+
+import random
+
+import pytest
+
+import cocos.collision_model as cm
+import cocos.euclid as eu
+
+
+class Obj_with_shape(object):
+    def __init__(self, name, cshape):
+        self.name = name
+        self.cshape = cshape
+
+
+def random_objs(seed, quantity):
+    rnd = random.Random(seed)
+    objs = []
+    for i in range(quantity):
+        center = eu.Vector2(rnd.uniform(0.0, 400.0), rnd.uniform(0.0, 300.0))
+        if i % 2:
+            cshape = cm.CircleShape(center, rnd.uniform(1.0, 8.0))
+        else:
+            cshape = cm.AARectShape(center, rnd.uniform(1.0, 8.0),
+                                    rnd.uniform(1.0, 8.0))
+        objs.append(Obj_with_shape(i, cshape))
+    return objs
+
+
+def all_distances(objs, obj, max_distance=None):
+    f_distance = obj.cshape.distance
+    ds = [f_distance(other.cshape) for other in objs if other is not obj]
+    if max_distance is not None:
+        ds = [d for d in ds if d <= max_distance]
+    ds.sort()
+    return ds
+
+
+@pytest.mark.parametrize("cls_name, ctor_args", [
+    ('CollisionManagerBruteForce', []),
+    ('CollisionManagerGrid', [0.0, 400.0, 0.0, 300.0, 20.0, 20.0]),
+    ('CollisionManagerNumpy', []),
+    ('CollisionManagerAABBTree', []),
+    ])
+def test_k_nearest(cls_name, ctor_args):
+    if cls_name == 'CollisionManagerNumpy':
+        pytest.importorskip('numpy')
+    objs = random_objs(17, 300)
+    collman = getattr(cm, cls_name)(*ctor_args)
+    for obj in objs:
+        collman.add(obj)
+
+    # known and not known objs, inside and partially outside the grid
+    probes = objs[:30] + [
+        Obj_with_shape('probe', cm.CircleShape(eu.Vector2(-5.0, 150.0), 3.0)),
+        Obj_with_shape('probe', cm.AARectShape(eu.Vector2(200.0, 140.0), 2.0, 2.0)),
+        ]
+    for obj in probes:
+        for k in (1, 5, 40):
+            res = collman.k_nearest(obj, k)
+            assert len(res) == k
+            assert obj not in [other for other, d in res]
+            assert [d for other, d in res] == all_distances(objs, obj)[:k]
+            for other, d in res:
+                assert d == obj.cshape.distance(other.cshape)
+
+            res = collman.k_nearest(obj, k, 12.0)
+            assert [d for other, d in res] == all_distances(objs, obj, 12.0)[:k]
+
+        nearest = collman.nearest(obj)
+        assert obj.cshape.distance(nearest.cshape) == all_distances(objs, obj)[0]
+
+    assert collman.k_nearest(objs[0], 0) == []
+    far_away = Obj_with_shape('far', cm.CircleShape(eu.Vector2(200.0, 150.0), 1.0))
+    collman.clear()
+    assert collman.nearest(far_away) is None
+    collman.add(objs[1])
+    assert collman.nearest(far_away) is objs[1]
+    d = far_away.cshape.distance(objs[1].cshape)
+    assert d > 1.0
+    assert collman.nearest(far_away, d) is objs[1]
+    assert collman.nearest(far_away, d - 1.0) is None
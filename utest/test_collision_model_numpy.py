@@ -0,0 +1,141 @@
+from __future__ import division, print_function, unicode_literals
+
+# CollisionManagerNumpy must give the same answers as the brute force
+# collision manager
+
+import random
+
+import pytest
+pytest.importorskip('numpy')
+
+import cocos.collision_model as cm
+import cocos.euclid as eu
+
+
+class Obj_with_shape(object):
+    def __init__(self, name, cshape):
+        self.name = name
+        self.cshape = cshape
+
+
+class OpaqueShape(cm.Cshape):
+    """AARectShape behavior that the numpy manager can't recognize"""
+    def __init__(self, center, rx, ry):
+        self.rect = cm.AARectShape(center, rx, ry)
+
+    def overlaps(self, other):
+        return self.rect.overlaps(other.rect)
+
+    def distance(self, other):
+        return self.rect.distance(other.rect)
+
+    def near_than(self, other, near_distance):
+        return self.distance(other) <= near_distance
+
+    def touches_point(self, x, y):
+        return self.rect.touches_point(x, y)
+
+    def fits_in_box(self, packed_box):
+        return self.rect.fits_in_box(packed_box)
+
+    def minmax(self):
+        return self.rect.minmax()
+
+
+def random_objs(seed, quantity, makers):
+    rnd = random.Random(seed)
+    objs = []
+    for i in range(quantity):
+        center = eu.Vector2(rnd.uniform(0.0, 300.0), rnd.uniform(0.0, 200.0))
+        maker = makers[i % len(makers)]
+        objs.append(Obj_with_shape(i, maker(rnd, center)))
+    return objs
+
+
+def make_circle(rnd, center):
+    return cm.CircleShape(center, rnd.uniform(1.0, 10.0))
+
+
+def make_aarect(rnd, center):
+    return cm.AARectShape(center, rnd.uniform(1.0, 10.0), rnd.uniform(1.0, 10.0))
+
+
+def make_opaque(rnd, center):
+    return OpaqueShape(center, rnd.uniform(1.0, 10.0), rnd.uniform(1.0, 10.0))
+
+
+def pair_ids(pairs):
+    return [frozenset([a.name, b.name]) for a, b in pairs]
+
+
+@pytest.mark.parametrize("makers, vectorize_threshold, pairs_chunk", [
+    ([make_circle], 16, 1 << 18),
+    ([make_aarect], 16, 1 << 18),
+    ([make_circle, make_aarect], 16, 1 << 18),
+    ([make_circle, make_aarect], 0, 7),
+    ([make_opaque], 0, 1 << 18),
+    ])
+def test_same_answers_as_brute_force(makers, vectorize_threshold, pairs_chunk):
+    objs = random_objs(123, 400, makers)
+    brute = cm.CollisionManagerBruteForce()
+    collman = cm.CollisionManagerNumpy(capacity=4)
+    collman.vectorize_threshold = vectorize_threshold
+    collman.pairs_chunk = pairs_chunk
+    for obj in objs:
+        brute.add(obj)
+        collman.add(obj)
+
+    expected = set(pair_ids(brute.iter_all_collisions()))
+    got = pair_ids(collman.iter_all_collisions())
+    assert len(got) == len(set(got))
+    assert set(got) == expected
+
+    for obj in objs[:60]:
+        assert set(collman.objs_colliding(obj)) == set(brute.objs_colliding(obj))
+        assert set(collman.objs_near(obj, 4.0)) == set(brute.objs_near(obj, 4.0))
+        ranked = collman.ranked_objs_near(obj, 8.0)
+        assert ([d for other, d in ranked] ==
+                [d for other, d in brute.ranked_objs_near(obj, 8.0)])
+        x, y = obj.cshape.minmax()[::2]
+        assert (collman.objs_touching_point(x + 0.5, y + 0.5) ==
+                brute.objs_touching_point(x + 0.5, y + 0.5))
+
+    box = (20.0, 150.0, 30.0, 120.0)
+    assert collman.objs_into_box(*box) == brute.objs_into_box(*box)
+
+    # swap removal keeps the arrays consistent
+    for obj in objs[::2]:
+        collman.remove_tricky(obj)
+        brute.remove_tricky(obj)
+    assert collman.known_objs() == brute.known_objs()
+    assert not collman.knows(objs[0])
+    assert (set(pair_ids(collman.iter_all_collisions())) ==
+            set(pair_ids(brute.iter_all_collisions())))
+
+    collman.clear()
+    assert collman.known_objs() == set()
+    assert list(collman.iter_all_collisions()) == []
+
+
+def test_update_many_same_as_new_manager():
+    objs = random_objs(7, 200, [make_circle, make_aarect])
+    collman = cm.CollisionManagerNumpy()
+    for obj in objs:
+        collman.add(obj)
+    # queries done before the update must not leave stale data
+    collman.objs_colliding(objs[0])
+    rnd = random.Random(11)
+    for obj in objs:
+        obj.cshape.center = obj.cshape.center + (rnd.uniform(-20.0, 20.0),
+                                                 rnd.uniform(-20.0, 20.0))
+    collman.update_many(objs[:100])
+    for obj in objs[100:]:
+        collman.update(obj)
+
+    brute = cm.CollisionManagerBruteForce()
+    for obj in objs:
+        brute.add(obj)
+    assert (set(pair_ids(collman.iter_all_collisions())) ==
+            set(pair_ids(brute.iter_all_collisions())))
+    for obj in objs[:20]:
+        assert set(collman.objs_colliding(obj)) == set(brute.objs_colliding(obj))
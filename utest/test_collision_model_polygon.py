@@ -0,0 +1,221 @@
+from __future__ import division, print_function, unicode_literals
+
+# OBBShape and ConvexPolygonShape
+
+import math
+import random
+
+import pytest
+
+import cocos.collision_model as cm
+import cocos.euclid as eu
+
+
+class Obj_with_shape(object):
+    def __init__(self, name, cshape):
+        self.name = name
+        self.cshape = cshape
+
+
+def test_obb_without_rotation_same_as_aa_rect():
+    rnd = random.Random(1)
+    for i in range(500):
+        c1 = eu.Vector2(rnd.uniform(0.0, 20.0), rnd.uniform(0.0, 20.0))
+        c2 = eu.Vector2(rnd.uniform(0.0, 20.0), rnd.uniform(0.0, 20.0))
+        rect = cm.AARectShape(c1, rnd.uniform(1.0, 5.0), rnd.uniform(1.0, 5.0))
+        obb = cm.OBBShape(c1, rect.rx, rect.ry)
+        other = cm.AARectShape(c2, rnd.uniform(1.0, 5.0),
+                               rnd.uniform(1.0, 5.0))
+        circle = cm.CircleShape(c2, rnd.uniform(1.0, 5.0))
+        assert obb.minmax() == rect.minmax()
+        assert obb.overlaps(other) == rect.overlaps(other) == other.overlaps(obb)
+        assert obb.overlaps(circle) == rect.overlaps(circle) == circle.overlaps(obb)
+        assert abs(obb.distance(circle) - rect.distance(circle)) < 1e-9
+        assert circle.distance(obb) == obb.distance(circle)
+
+
+def test_rotation_is_clockwise_degrees():
+    obb = cm.OBBShape(eu.Vector2(0.0, 0.0), 4.0, 1.0, 90.0)
+    minx, maxx, miny, maxy = obb.minmax()
+    assert abs(maxx - 1.0) < 1e-9 and abs(maxy - 4.0) < 1e-9
+    polygon = cm.ConvexPolygonShape(eu.Vector2(0.0, 0.0),
+                                    [(0.0, 0.0), (2.0, 0.0), (2.0, 1.0)], 90.0)
+    x, y = polygon.world_vertices()[1]
+    assert abs(x) < 1e-9 and abs(y + 2.0) < 1e-9
+
+
+def test_cached_aabb_follows_changes():
+    obb = cm.OBBShape(eu.Vector2(10.0, 20.0), 2.0, 1.0)
+    assert obb.minmax() == (8.0, 12.0, 19.0, 21.0)
+    obb.center = eu.Vector2(0.0, 0.0)
+    assert obb.minmax() == (-2.0, 2.0, -1.0, 1.0)
+    obb.rotation = 45.0
+    r = 3.0 * math.sqrt(0.5)
+    assert all(abs(a - b) < 1e-9 for a, b in zip(obb.minmax(), (-r, r, -r, r)))
+    obb.rotation = 0.0
+    obb.rx = 5.0
+    assert obb.minmax() == (-5.0, 5.0, -1.0, 1.0)
+
+
+def test_winding_and_points():
+    # clockwise input is accepted
+    triangle = cm.ConvexPolygonShape(eu.Vector2(1.0, 1.0),
+                                     [(0.0, 0.0), (0.0, 2.0), (2.0, 0.0)])
+    assert triangle.touches_point(1.5, 1.5)
+    assert triangle.touches_point(1.0, 1.0)
+    assert not triangle.touches_point(2.5, 2.5)
+    assert triangle.fits_in_box((1.0, 3.0, 1.0, 3.0))
+    assert not triangle.fits_in_box((1.5, 3.0, 1.0, 3.0))
+    with pytest.raises(ValueError):
+        cm.ConvexPolygonShape(eu.Vector2(0.0, 0.0), [(0.0, 0.0), (1.0, 1.0)])
+
+
+def test_rotated_overlap_and_distance():
+    # a diamond, rotated square, touches the aarect only near the corner
+    diamond = cm.OBBShape(eu.Vector2(0.0, 0.0), 1.0, 1.0, 45.0)
+    half_diagonal = math.sqrt(2.0)
+    far = cm.AARectShape(eu.Vector2(1.9, 1.9), 0.5, 0.5)
+    assert not diamond.overlaps(far)
+    assert not far.overlaps(diamond)
+    near = cm.AARectShape(eu.Vector2(half_diagonal + 0.4, 0.0), 0.5, 0.5)
+    assert diamond.overlaps(near)
+    d = diamond.distance(far)
+    # nearest point of far is (1.4, 1.4), diamond edge is x + y = sqrt(2)
+    expected = (2.8 - half_diagonal) / math.sqrt(2.0)
+    assert abs(d - expected) < 1e-9
+    circle = cm.CircleShape(eu.Vector2(3.0, 0.0), 1.0)
+    assert abs(diamond.distance(circle) - (3.0 - half_diagonal - 1.0)) < 1e-9
+    assert diamond.near_than(circle, 0.6)
+    assert not diamond.near_than(circle, 0.5)
+
+
+def test_ray_hit_and_time_of_impact():
+    obb = cm.OBBShape(eu.Vector2(10.0, 0.0), 1.0, 1.0, 45.0)
+    t = obb.ray_hit((0.0, 0.0), (1.0, 0.0))
+    assert abs(t - (10.0 - math.sqrt(2.0))) < 1e-9
+    assert obb.ray_hit((0.0, 5.0), (1.0, 0.0)) is None
+    assert obb.ray_hit((10.0, 0.0), (1.0, 0.0)) == 0.0
+
+    rnd = random.Random(4)
+    for i in range(200):
+        start = eu.Vector2(rnd.uniform(0.0, 20.0), rnd.uniform(0.0, 20.0))
+        mover = rnd.choice([
+            cm.OBBShape(start, rnd.uniform(1.0, 3.0), rnd.uniform(1.0, 3.0),
+                        rnd.uniform(0.0, 360.0)),
+            cm.CircleShape(start, rnd.uniform(1.0, 3.0))])
+        center = eu.Vector2(rnd.uniform(0.0, 20.0), rnd.uniform(0.0, 20.0))
+        other = rnd.choice([
+            cm.OBBShape(center, 2.0, 1.0, rnd.uniform(0.0, 360.0)),
+            cm.AARectShape(center, 2.0, 1.0),
+            cm.CircleShape(center, 1.5)])
+        displacement = (rnd.uniform(-20.0, 20.0), rnd.uniform(-20.0, 20.0))
+        t = cm.time_of_impact(mover, displacement, other)
+        # first sampled position that overlaps
+        sampled = None
+        moved = mover.copy()
+        for k in range(1001):
+            s = k / 1000.0
+            moved.center = eu.Vector2(start.x + s * displacement[0],
+                                      start.y + s * displacement[1])
+            if moved.overlaps(other):
+                sampled = s
+                break
+        if sampled is None:
+            # only a grazing contact can be missed by the sampling
+            assert t is None or not mover.copy().overlaps(other)
+        else:
+            assert t is not None and t <= sampled <= t + 2e-3
+
+
+def random_objs(seed, quantity):
+    rnd = random.Random(seed)
+    objs = []
+    for i in range(quantity):
+        # fully inside the grid world
+        center = eu.Vector2(rnd.uniform(10.0, 190.0), rnd.uniform(10.0, 140.0))
+        kind = i % 4
+        if kind == 0:
+            cshape = cm.CircleShape(center, rnd.uniform(1.0, 8.0))
+        elif kind == 1:
+            cshape = cm.AARectShape(center, rnd.uniform(1.0, 8.0),
+                                    rnd.uniform(1.0, 8.0))
+        elif kind == 2:
+            cshape = cm.OBBShape(center, rnd.uniform(1.0, 8.0),
+                                 rnd.uniform(1.0, 8.0), rnd.uniform(0.0, 360.0))
+        else:
+            r = rnd.uniform(2.0, 8.0)
+            vertices = [(r * math.cos(a), r * math.sin(a)) for a in
+                        sorted(rnd.uniform(0.0, 2.0 * math.pi)
+                               for k in range(5))]
+            cshape = cm.ConvexPolygonShape(center, vertices,
+                                           rnd.uniform(0.0, 360.0))
+        objs.append(Obj_with_shape(i, cshape))
+    return objs
+
+
+@pytest.mark.parametrize("cls_name, ctor_args", [
+    ('CollisionManagerBruteForce', []),
+    ('CollisionManagerGrid', [0.0, 200.0, 0.0, 150.0, 10.0, 10.0]),
+    ('CollisionManagerNumpy', []),
+    ('CollisionManagerAABBTree', []),
+    ])
+def test_managers_with_polygons(cls_name, ctor_args):
+    if cls_name == 'CollisionManagerNumpy':
+        pytest.importorskip('numpy')
+    objs = random_objs(6, 200)
+    collman = getattr(cm, cls_name)(*ctor_args)
+    if cls_name == 'CollisionManagerNumpy':
+        # always use the array code
+        collman.vectorize_threshold = 0
+    known = objs[:160]
+    for obj in known:
+        collman.add(obj)
+
+    expected = set(frozenset((a.name, b.name))
+                   for i, a in enumerate(known) for b in known[:i]
+                   if a.cshape.overlaps(b.cshape))
+    got = [frozenset((a.name, b.name)) for a, b in collman.iter_all_collisions()]
+    assert len(got) == len(set(got))
+    assert set(got) == expected
+
+    queries = objs[140:]
+    for obj in queries:
+        assert (set(collman.objs_colliding(obj)) ==
+                set(other for other in known if other is not obj and
+                    obj.cshape.overlaps(other.cshape)))
+        assert (set(other for other, d in collman.ranked_objs_near(obj, 5.0)) ==
+                set(other for other in known if other is not obj and
+                    obj.cshape.distance(other.cshape) <= 5.0))
+    res = collman.objs_colliding_many(queries)
+    assert set(res) == set((i, other) for i, q in enumerate(queries)
+                           for other in collman.objs_colliding(q))
+    x, y = objs[2].cshape.center
+    assert objs[2] in collman.objs_touching_point(x, y)
+    hits = collman.raycast((0.0, 75.0), (1.0, 0.0))
+    assert (set(other for other, t in hits) ==
+            set(other for other in known
+                if other.cshape.ray_hit((0.0, 75.0), (1.0, 0.0)) is not None))
+    assert [t for other, t in hits] == sorted(t for other, t in hits)
+
+
+@pytest.mark.parametrize("cls_name, ctor_args", [
+    ('CollisionManagerBruteForce', []),
+    ('CollisionManagerGrid', [0.0, 200.0, 0.0, 150.0, 10.0, 10.0]),
+    ('CollisionManagerNumpy', []),
+    ('CollisionManagerAABBTree', []),
+    ])
+def test_k_nearest_with_polygons(cls_name, ctor_args):
+    if cls_name == 'CollisionManagerNumpy':
+        pytest.importorskip('numpy')
+    objs = random_objs(7, 200)
+    collman = getattr(cm, cls_name)(*ctor_args)
+    known = objs[:160]
+    for obj in known:
+        collman.add(obj)
+    for obj in objs[150:]:
+        distances = sorted(obj.cshape.distance(other.cshape) for other in known
+                           if other is not obj)
+        for k in (1, 7, 40):
+            assert [d for other, d in collman.k_nearest(obj, k)] == distances[:k]
+        assert ([d for other, d in collman.k_nearest(obj, 7, 10.0)] ==
+                [d for d in distances[:7] if d <= 10.0])
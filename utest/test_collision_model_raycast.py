@@ -0,0 +1,129 @@
+from __future__ import division, print_function, unicode_literals
+
+# ray, segment and swept shape queries
+
+import math
+import random
+
+import pytest
+
+import cocos.collision_model as cm
+import cocos.euclid as eu
+
+fe = 1.0e-6
+
+
+class Obj_with_shape(object):
+    def __init__(self, name, cshape):
+        self.name = name
+        self.cshape = cshape
+
+
+def random_objs(seed, quantity):
+    rnd = random.Random(seed)
+    objs = []
+    for i in range(quantity):
+        # fully inside the grid world
+        center = eu.Vector2(rnd.uniform(10.0, 190.0), rnd.uniform(10.0, 140.0))
+        if i % 2:
+            cshape = cm.CircleShape(center, rnd.uniform(1.0, 6.0))
+        else:
+            cshape = cm.AARectShape(center, rnd.uniform(1.0, 6.0),
+                                    rnd.uniform(1.0, 6.0))
+        objs.append(Obj_with_shape(i, cshape))
+    return objs
+
+
+def test_ray_hit_cshapes():
+    circle = cm.CircleShape(eu.Vector2(10.0, 0.0), 2.0)
+    assert abs(circle.ray_hit((0.0, 0.0), (1.0, 0.0)) - 8.0) < fe
+    assert abs(circle.ray_hit((0.0, 0.0), (2.0, 0.0)) - 4.0) < fe
+    assert circle.ray_hit((0.0, 0.0), (-1.0, 0.0)) is None
+    assert circle.ray_hit((0.0, 3.0), (1.0, 0.0)) is None
+    assert circle.ray_hit((10.0, 1.0), (1.0, 0.0)) == 0.0
+
+    rect = cm.AARectShape(eu.Vector2(10.0, 0.0), 2.0, 1.0)
+    assert abs(rect.ray_hit((0.0, 0.0), (1.0, 0.0)) - 8.0) < fe
+    assert abs(rect.ray_hit((10.0, 5.0), (0.0, -1.0)) - 4.0) < fe
+    assert rect.ray_hit((0.0, 2.0), (1.0, 0.0)) is None
+    assert rect.ray_hit((0.0, 0.0), (-1.0, 0.0)) is None
+    assert rect.ray_hit((10.0, 0.5), (0.0, 1.0)) == 0.0
+
+
+def overlaps_at(cshape, displacement, other, t):
+    moved = cshape.copy()
+    moved.center = cshape.center + t * eu.Vector2(*displacement)
+    return moved.overlaps(other)
+
+
+def test_time_of_impact():
+    rnd = random.Random(2)
+    makers = [
+        lambda c: cm.CircleShape(c, rnd.uniform(1.0, 5.0)),
+        lambda c: cm.AARectShape(c, rnd.uniform(1.0, 5.0), rnd.uniform(1.0, 5.0)),
+        ]
+    hits = 0
+    for i in range(400):
+        cshape = makers[i % 2](eu.Vector2(rnd.uniform(-20.0, 20.0),
+                                          rnd.uniform(-20.0, 20.0)))
+        other = makers[(i // 2) % 2](eu.Vector2(0.0, 0.0))
+        displacement = (rnd.uniform(-60.0, 60.0), rnd.uniform(-60.0, 60.0))
+        t = cm.time_of_impact(cshape, displacement, other)
+        if t is None:
+            # sampling the path finds no overlap
+            for k in range(101):
+                assert not overlaps_at(cshape, displacement, other, k / 100.0)
+            continue
+        hits += 1
+        assert 0.0 <= t <= 1.0
+        if t > 0.0:
+            assert not overlaps_at(cshape, displacement, other, t - 1.0e-4)
+        assert (overlaps_at(cshape, displacement, other, t + 1.0e-4) or
+                t + 1.0e-4 > 1.0)
+    assert hits > 20
+
+
+@pytest.mark.parametrize("cls_name, ctor_args", [
+    ('CollisionManagerBruteForce', []),
+    ('CollisionManagerGrid', [0.0, 200.0, 0.0, 150.0, 10.0, 10.0]),
+    ('CollisionManagerGrid', [0.0, 200.0, 0.0, 150.0, 33.0, 7.0]),
+    ('CollisionManagerNumpy', []),
+    ('CollisionManagerAABBTree', []),
+    ])
+def test_same_answers_as_brute_force(cls_name, ctor_args):
+    if cls_name == 'CollisionManagerNumpy':
+        pytest.importorskip('numpy')
+    objs = random_objs(4, 250)
+    brute = cm.CollisionManagerBruteForce()
+    collman = getattr(cm, cls_name)(*ctor_args)
+    for obj in objs:
+        brute.add(obj)
+        collman.add(obj)
+
+    def same(res, expected):
+        assert len(res) == len(expected)
+        assert set(a for a, t in res) == set(a for a, t in expected)
+        for (a, t), (b, u) in zip(res, expected):
+            assert abs(t - u) < fe
+        for (a, t), (b, u) in zip(res, res[1:]):
+            assert t <= u
+
+    rnd = random.Random(9)
+    for i in range(60):
+        # origins inside and outside the grid, axis aligned rays included
+        origin = (rnd.uniform(-50.0, 250.0), rnd.uniform(-50.0, 200.0))
+        angle = rnd.uniform(0.0, 2 * math.pi) if i % 4 else (i // 4) * math.pi / 2
+        direction = (math.cos(angle), math.sin(angle))
+        same(collman.raycast(origin, direction),
+             brute.raycast(origin, direction))
+        same(collman.raycast(origin, direction, 80.0),
+             brute.raycast(origin, direction, 80.0))
+        p1 = (origin[0] + 90.0 * direction[0], origin[1] + 90.0 * direction[1])
+        same(collman.segment_hits(origin, p1), brute.segment_hits(origin, p1))
+
+    for obj in objs[:40]:
+        displacement = (rnd.uniform(-40.0, 40.0), rnd.uniform(-40.0, 40.0))
+        same(collman.sweep_hits(obj, displacement),
+             brute.sweep_hits(obj, displacement))
+
+    assert collman.raycast((10.0, 10.0), (0.0, 0.0)) == []
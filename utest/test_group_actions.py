@@ -0,0 +1,111 @@
+from __future__ import division, print_function, unicode_literals
+
+# set the desired pyglet mockup
+import sys
+sys.path.insert(0,'pyglet_mockup1')
+import pyglet
+assert pyglet.mock_level == 1
+
+import copy
+
+import pytest
+numpy = pytest.importorskip('numpy')
+
+from cocos.director import director
+from cocos.cocosnode import CocosNode
+import cocos.actions as ac
+
+director.init()
+
+
+def make_nodes(count):
+    nodes = []
+    for i in range(count):
+        node = CocosNode()
+        node.position = (10.0 * i, 5.0)
+        node.rotation = 30.0 * i
+        node.opacity = 255
+        nodes.append(node)
+    return nodes
+
+
+def run(action, steps, dt):
+    host = CocosNode()
+    worker = host.do(action)
+    for i in range(steps):
+        host._step(dt)
+    return worker
+
+
+def test_move_by_matches_single_node_action():
+    nodes = make_nodes(5)
+    single = make_nodes(5)
+    host = CocosNode()
+    host.do(ac.GroupMoveBy(nodes, (100.0, -20.0), 2.0))
+    for node in single:
+        node.do(ac.MoveBy((100.0, -20.0), 2.0))
+    for i in range(3):
+        host._step(0.5)
+        for node in single:
+            node._step(0.5)
+        for a, b in zip(nodes, single):
+            assert a.position == pytest.approx(b.position)
+    assert nodes[2].position == pytest.approx((95.0, -10.0))
+
+
+def test_per_node_end_values():
+    nodes = make_nodes(3)
+    ends = [(0.0, 0.0), (10.0, 10.0), (-30.0, 50.0)]
+    run(ac.GroupMoveTo(nodes, ends, 1.0) | ac.GroupScaleTo(nodes, [2.0, 3.0, 4.0], 1.0),
+        3, 0.5)
+    assert [node.position for node in nodes] == ends
+    assert [node.scale for node in nodes] == [2.0, 3.0, 4.0]
+
+
+def test_rotate_fade_and_time_alter():
+    nodes = make_nodes(4)
+    run(ac.GroupRotateBy(nodes, 350.0, 1.0) + ac.Reverse(ac.GroupRotateBy(nodes, 20.0, 1.0)),
+        5, 0.5)
+    assert [node.rotation for node in nodes] == pytest.approx([330.0, 0.0, 30.0, 60.0])
+    run(ac.Accelerate(ac.GroupFadeTo(nodes, 55, 2.0), 2.0), 2, 0.5)
+    # t = 0.5 accelerated is 0.25
+    assert nodes[0].opacity == pytest.approx(205.0)
+
+
+def test_template_shares_nodes():
+    nodes = make_nodes(2)
+    template = ac.GroupMoveBy(nodes, (1.0, 0.0), 1.0) * 2
+    worker = copy.deepcopy(template)
+    assert worker.one.nodes is template.one.nodes
+    run(template, 5, 0.5)
+    assert [node.x for node in nodes] == pytest.approx([2.0, 12.0])
+
+
+def test_empty_group():
+    worker = run(ac.GroupMoveBy([], (5.0, 0.0), 1.0) + ac.GroupFadeTo([], 0, 1.0),
+                 5, 0.5)
+    assert worker.done()
+
+
+def test_end_values_not_matching_nodes():
+    nodes = make_nodes(3)
+    with pytest.raises(ValueError, match='2 end values for 3 nodes'):
+        ac.GroupMoveTo(nodes, [(0.0, 0.0), (1.0, 1.0)], 1.0)
+    with pytest.raises(ValueError, match='2 number'):
+        ac.GroupMoveBy(nodes, (1.0, 2.0, 3.0), 1.0)
+    # one value for all, or one per node
+    ac.GroupScaleTo(nodes, 2.0, 1.0)
+    ac.GroupScaleTo(nodes, [1.0, 2.0, 3.0], 1.0)
+
+
+def test_custom_node_group():
+    class Buffer(ac.NodeGroup):
+        def set_values(self, attrib, values):
+            self.written = values.copy()
+
+    nodes = make_nodes(3)
+    group = Buffer(nodes)
+    run(ac.GroupMoveBy(group, (10.0, 0.0), 1.0), 1, 0.5)
+    assert group.written.shape == (3, 2)
+    assert group.written[:, 0].tolist() == [5.0, 15.0, 25.0]
+    assert nodes[1].position == (10.0, 5.0)
@@ -0,0 +1,599 @@
+from __future__ import division, print_function, unicode_literals
+
+# set the desired pyglet mockup
+import sys
+sys.path.insert(0,'pyglet_mockup1')
+import pyglet
+assert pyglet.mock_level == 1
+
+import math
+
+import pytest
+numpy = pytest.importorskip('numpy')
+
+from cocos.cocosnode import CocosNode
+from cocos.director import director
+from cocos.euclid import Point2
+import cocos.particle as particle
+import cocos.particle_affectors as affectors
+
+director.init()
+
+
+class Emitter(particle.ParticleSystem):
+    total_particles = 2000
+    duration = -1
+    gravity = Point2(3.0, -5.0)
+    pos_var = Point2(10.0, 20.0)
+    angle = 90.0
+    angle_var = 30.0
+    speed = 100.0
+    speed_var = 20.0
+    radial_accel = 4.0
+    radial_accel_var = 1.0
+    tangential_accel = -2.0
+    tangential_accel_var = 0.5
+    size = 8.0
+    size_var = 2.0
+    life = 2.0
+    life_var = 0.5
+    start_color = particle.Color(0.5, 0.4, 0.3, 1.0)
+    start_color_var = particle.Color(0.1, 0.1, 0.1, 0.0)
+    end_color = particle.Color(0.1, 0.1, 0.1, 0.0)
+    end_color_var = particle.Color(0.05, 0.0, 0.0, 0.0)
+    emission_rate = 100.0
+
+
+def make_emitter():
+    # quads rendering and an explicit texture avoid any gl call
+    return Emitter(fallback=True, texture=object())
+
+
+def alive(system):
+    return system.particle_life[:, 0] >= 0
+
+
+def test_bulk_emission_distributions():
+    numpy.random.seed(1)
+    system = make_emitter()
+    system.position = (30.0, 40.0)
+    assert system.add_particles(1500) == 1500
+    assert system.particle_count == 1500
+    live = alive(system)
+    assert live.sum() == 1500
+
+    def check(values, center, var):
+        assert numpy.all(values >= center - var - 1e-4)
+        assert numpy.all(values <= center + var + 1e-4)
+        # uniform in [center - var, center + var]
+        assert abs(values.mean() - center) < 0.1 * var + 1e-6
+        assert abs(values.std() - var / math.sqrt(3.0)) < 0.1 * var + 1e-6
+
+    check(system.particle_pos[live, 0], 0.0, 10.0)
+    check(system.particle_pos[live, 1], 0.0, 20.0)
+    check(system.particle_life[live, 0], 2.0, 0.5)
+    check(system.particle_size[live, 0], 8.0, 2.0)
+    check(system.particle_rad[live, 0], 4.0, 1.0)
+    check(system.particle_tan[live, 0], -2.0, 0.5)
+    check(system.particle_color[live, 0], 0.5, 0.1)
+    assert numpy.all(system.particle_color[live, 3] == 1.0)
+    dirs = system.particle_dir[live]
+    check(numpy.degrees(numpy.arctan2(dirs[:, 1], dirs[:, 0])), 90.0, 30.0)
+    check(numpy.hypot(dirs[:, 0], dirs[:, 1]), 100.0, 20.0)
+    assert numpy.all(system.start_pos[live] == (30.0, 40.0))
+    assert numpy.all(system.particle_grav[live] == (3.0, -5.0))
+    # the color reaches the end color when the life ends
+    end = (system.particle_color[live] +
+           system.particle_delta_color[live] * system.particle_life[live])
+    assert numpy.all(numpy.abs(end[:, 3]) < 1e-5)
+    assert numpy.all(numpy.abs(end[:, 1] - 0.1) < 1e-5)
+
+
+def test_add_particles_respects_capacity():
+    system = make_emitter()
+    assert system.add_particles(1900) == 1900
+    assert system.add_particles(500) == 100
+    assert system.add_particles(1) == 0
+    assert system.particle_count == 2000
+    with pytest.raises(particle.ExceptionNoEmptyParticle):
+        system.add_particle()
+
+    # dead particles free their slots
+    system.particle_life[:300] = -1.0
+    system.add_particle()
+    assert system.particle_life[0, 0] >= 0
+    assert system.add_particles(1000) == 299
+
+
+class LongLived(Emitter):
+    total_particles = 300
+    life = 100.0
+    life_var = 0.0
+
+
+def test_step_emits_like_one_by_one():
+    system = LongLived(fallback=True, texture=object())
+    rate = 1.0 / system.emission_rate
+    emit_counter = 0.0
+    count = 0
+    for delta in [0.016, 0.5, 0.0, 0.033, 1.0 / 60, 0.25, 0.1, 3.0, 0.2]:
+        system.step(delta)
+        # the previous emitter, one particle per iteration
+        emit_counter += delta
+        while count < system.total_particles and emit_counter > rate:
+            count += 1
+            emit_counter -= rate
+        assert system.particle_count == count
+        assert numpy.sum(alive(system)) == count
+        assert abs(system.emit_counter - emit_counter) < 1e-9
+    assert count == system.total_particles
+
+
+class CompactEmitter(Emitter):
+    compact_storage = True
+
+
+def live_rows(system):
+    live = alive(system)
+    rows = numpy.hstack([getattr(system, name)[live]
+                         for name in system._particle_arrays])
+    return rows[numpy.lexsort(rows.T[::-1])]
+
+
+def test_compact_storage_same_particles():
+    systems = []
+    for cls in (Emitter, CompactEmitter):
+        numpy.random.seed(3)
+        system = cls(fallback=True, texture=object())
+        system.position = (10.0, 20.0)
+        systems.append(system)
+    normal, compact = systems
+    deltas = [0.1, 0.5, 0.4, 1.0, 0.05, 0.7, 0.3, 2.5, 0.2, 1.2]
+    for delta in deltas:
+        numpy.random.seed(int(delta * 100))
+        normal.step(delta)
+        numpy.random.seed(int(delta * 100))
+        compact.step(delta)
+        n = compact.particle_count
+        # live particles packed at the front
+        assert numpy.all(compact.particle_life[:n, 0] >= 0)
+        assert numpy.all(compact.particle_life[n:, 0] < 0)
+        assert n == numpy.sum(alive(normal))
+        assert numpy.allclose(live_rows(normal), live_rows(compact))
+
+    # the quads are built only for the live particles
+    compact.make_delta_pos_to_vertex()
+    compact.update_vertexs_from_pos()
+    compact.update_per_vertex_colors()
+    n = compact.particle_count
+    assert numpy.allclose(compact.vertexs[:n, 2] - compact.vertexs[:n, 0],
+                          [1.0, -1.0] * compact.particle_size[:n])
+    assert numpy.all(compact.per_vertex_colors[:n, 3] == compact.particle_color[:n])
+
+
+def test_compact_storage_add_particle():
+    system = CompactEmitter(fallback=True, texture=object())
+    system.add_particle()
+    assert system.add_particles(3000) == 1999
+    with pytest.raises(particle.ExceptionNoEmptyParticle):
+        system.add_particle()
+    system.particle_life[::2] = -1.0
+    system.update_particles(0.0)
+    assert system.particle_count == 1000
+    assert numpy.all(system.particle_life[:1000, 0] >= 0)
+    system.add_particle()
+    assert system.particle_life[1000, 0] >= 0
+
+
+def test_fallback_quads_in_place():
+    numpy.random.seed(5)
+    system = make_emitter()
+    system.add_particles(700)
+    arrays = [system.vertexs, system.delta_pos_to_vertex, system.per_vertex_colors]
+    system.make_delta_pos_to_vertex()
+    system.update_vertexs_from_pos()
+    system.update_per_vertex_colors()
+    assert [system.vertexs, system.delta_pos_to_vertex,
+            system.per_vertex_colors] == arrays
+    size2 = system.particle_size / 2.0
+    pos = system.particle_pos
+    # counter-clockwise from NW
+    for k, (sx, sy) in enumerate([(-1, 1), (-1, -1), (1, -1), (1, 1)]):
+        assert numpy.allclose(system.vertexs[:, k, 0], pos[:, 0] + sx * size2[:, 0])
+        assert numpy.allclose(system.vertexs[:, k, 1], pos[:, 1] + sy * size2[:, 0])
+        assert numpy.all(system.per_vertex_colors[:, k] == system.particle_color)
+
+
+class RecordingBuffer(object):
+    # same interface as pyglet's VertexBufferObject; ptr is 0 for a vbo
+    ptr = 0
+
+    def __init__(self):
+        self.calls = []
+
+    def set_data(self, data):
+        self.calls.append(('set_data', data))
+
+    def set_data_region(self, data, start, length):
+        self.calls.append(('set_data_region', start, length))
+
+    def delete(self):
+        self.calls.append(('delete',))
+
+
+def test_stream_to_buffer_sends_used_rows():
+    buffer = RecordingBuffer()
+    colors = numpy.zeros((100, 4), numpy.float32)
+    particle.stream_to_buffer(buffer, colors, 30)
+    # orphan, then only the used rows
+    assert buffer.calls == [('set_data', None), ('set_data_region', 0, 30 * 16)]
+    buffer.calls = []
+    particle.stream_to_buffer(buffer, colors, 0)
+    assert buffer.calls == [('set_data', None)]
+
+
+class AdditiveEmitter(Emitter):
+    blend_additive = True
+
+
+@pytest.mark.parametrize("fallback", [True, False])
+def test_batch_node_merges_by_texture_and_blend(fallback):
+    numpy.random.seed(7)
+    texture, other_texture = object(), object()
+    batch = particle.ParticleBatchNode(fallback=True)
+    # point sprites mode without the gl shader setup
+    batch.fallback = fallback
+    systems = [Emitter(fallback=True, texture=texture),
+               CompactEmitter(fallback=True, texture=texture),
+               AdditiveEmitter(fallback=True, texture=texture),
+               Emitter(fallback=True, texture=other_texture)]
+    for i, system in enumerate(systems):
+        system.position = (10.0 * i, 5.0)
+        system.rotation = 30.0 * i
+        system.scale = 1.0 + i
+        batch.add(system)
+        system.add_particles(100 * (i + 1))
+    systems[0].particle_life[:50] = -1.0
+    with pytest.raises(Exception):
+        batch.add(particle.ParticleBatchNode(fallback=True))
+
+    groups = batch.collect()
+    assert [(g.texture, g.blend_additive) for g in groups] == [
+        (texture, False), (texture, True), (other_texture, False)]
+    assert [g.count for g in groups] == [50 + 200, 300, 400]
+
+    first = groups[0]
+    for system, start in ((systems[0], 0), (systems[1], 50)):
+        live = system.particle_life[:, 0] >= 0
+        matrix = system.get_local_transform()
+        pos = system.particle_pos[live]
+        expected = numpy.array([tuple(matrix * Point2(x, y)) for x, y in pos])
+        n = len(pos)
+        if fallback:
+            size2 = system.particle_size[live, 0] / 2.0
+            # NE corner
+            ne = numpy.array([tuple(matrix * Point2(x + s, y + s))
+                              for (x, y), s in zip(pos, size2)])
+            got = first.arrays[0][start:start + n]
+            assert numpy.allclose(got[:, 3], ne, atol=1e-3)
+            assert numpy.allclose(got.mean(axis=1), expected, atol=1e-3)
+            assert numpy.all(first.arrays[1][start:start + n, 2] ==
+                             system.particle_color[live])
+        else:
+            assert numpy.allclose(first.arrays[0][start:start + n], expected,
+                                  atol=1e-3)
+            assert numpy.all(first.arrays[1][start:start + n] ==
+                             system.particle_color[live])
+            assert numpy.all(first.arrays[2][start:start + n] ==
+                             system.particle_size_scaled[live])
+
+    # invisible children and removed groups
+    systems[2].visible = False
+    batch.remove(systems[3])
+    groups = batch.collect()
+    assert [g.count for g in groups] == [250]
+    assert len(batch.groups) == 2
+
+
+def test_quads_batch_accepts_point_sprites_children(monkeypatch):
+    # point sprites children without the gl shader setup
+    monkeypatch.setattr(particle, '_sprite_shader', (object(), (1, 2, 3)))
+    batch = particle.ParticleBatchNode(fallback=True)
+    texture = object()
+    quads = Emitter(fallback=True, texture=texture)
+    sprites = Emitter(fallback=False, texture=texture)
+    assert not hasattr(sprites, 'vertexs')
+    for system in (quads, sprites):
+        batch.add(system)
+        system.add_particles(10)
+    groups = batch.collect()
+    assert [g.count for g in groups] == [20]
+    assert not sprites.fallback
+    live = sprites.particle_life[:, 0] >= 0
+    assert numpy.allclose(groups[0].arrays[0][10:20].mean(axis=1),
+                          sprites.particle_pos[live], atol=1e-3)
+
+
+def test_batch_group_deletes_replaced_buffers():
+    group = particle.ParticleBatchGroup(object(), False, True)
+    old = group.buffers = [RecordingBuffer() for a in group.arrays]
+    group._reserve(group.capacity + 1)
+    assert group.buffers is None
+    assert all(buffer.calls == [('delete',)] for buffer in old)
+
+
+def reference_update(system, delta):
+    # update_particles before the in place kernel
+    norm = numpy.sqrt(system.particle_pos[:, 0] ** 2 + system.particle_pos[:, 1] ** 2)
+    norm = numpy.select([norm == 0], [0.0000001], default=norm)
+    posx = system.particle_pos[:, 0] / norm
+    posy = system.particle_pos[:, 1] / norm
+    radial = numpy.swapaxes(numpy.array([posx, posy]), 0, 1)
+    radial *= system.particle_rad
+    tangential = numpy.swapaxes(numpy.array([-posy, posx]), 0, 1)
+    tangential *= system.particle_tan
+    system.particle_dir += (tangential + radial + system.particle_grav) * delta
+    system.particle_pos += system.particle_dir * delta
+    system.particle_life -= delta
+    if system.position_type == system.POSITION_FREE:
+        system.particle_pos -= numpy.array([system.x, system.y]) - system.start_pos
+    system.particle_color += system.particle_delta_color * delta
+    system.particle_color[:, 3] = numpy.select(
+        [system.particle_life[:, 0] < 0], [0], default=system.particle_color[:, 3])
+
+
+@pytest.mark.parametrize("position_type", [particle.ParticleSystem.POSITION_GROUPED,
+                                           particle.ParticleSystem.POSITION_FREE])
+def test_update_kernel_same_as_reference(position_type):
+    numpy.random.seed(11)
+    system = make_emitter()
+    system.position_type = position_type
+    system.add_particles(1500)
+    # one particle at the emitter, norm 0
+    system.particle_pos[0] = 0.0
+    reference = make_emitter()
+    for name in system._particle_arrays:
+        getattr(reference, name)[:] = getattr(system, name)
+    reference.position_type = position_type
+    for i, delta in enumerate([0.1, 0.3, 0.02, 0.5, 1.0]):
+        system.position = reference.position = (i * 3.0, -i * 2.0)
+        system.update_particles(delta)
+        reference_update(reference, delta)
+        for name in system._particle_arrays:
+            assert numpy.allclose(getattr(system, name), getattr(reference, name),
+                                  rtol=1e-5, atol=1e-3), name
+    assert numpy.all(system.particle_color[system.particle_life[:, 0] < 0, 3] == 0)
+
+
+def test_update_kernel_does_not_allocate():
+    tracemalloc = pytest.importorskip('tracemalloc')
+    if not hasattr(tracemalloc, 'reset_peak'):
+        pytest.skip('needs tracemalloc.reset_peak')
+    cls = type(str('Big'), (Emitter,), {'total_particles': 10000})
+    system = cls(fallback=True, texture=object())
+    system.add_particles(10000)
+    system.update_particles(0.01)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        for i in range(5):
+            system.update_particles(0.01)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # a single temporary array of particle_pos size would be 80000 bytes
+    assert peak < 10000
+
+
+def test_seeded_simulation_is_reproducible():
+    runs = []
+    for i in range(2):
+        system = Emitter(fallback=True, texture=object(), seed=42)
+        system.simulate(100, 1.0 / 60)
+        runs.append(system.snapshot())
+    numpy.random.seed(0)
+    other = Emitter(fallback=True, texture=object(), seed=43)
+    other.simulate(100, 1.0 / 60)
+    first, second = runs
+    assert sorted(first) == sorted(Emitter._particle_arrays)
+    assert len(first['particle_life']) > 100
+    for name in first:
+        assert numpy.array_equal(first[name], second[name])
+    assert not numpy.array_equal(first['particle_pos'],
+                                 other.snapshot()['particle_pos'])
+
+
+def test_simulation_of_system_class():
+    import cocos.particle_systems as particle_systems
+    for cls in (particle_systems.Fireworks, particle_systems.Galaxy, Emitter):
+        simulation = particle.simulation_of(cls, seed=3)
+        assert not isinstance(simulation, particle.ParticleSystem)
+        assert isinstance(simulation, particle.ParticleSimulation)
+        for name in ('total_particles', 'emission_rate', 'gravity', 'life',
+                     'start_color', 'position_type'):
+            assert getattr(simulation, name) == getattr(cls, name)
+        system = cls(fallback=True, texture=object(), seed=3)
+        simulation.simulate(50, 0.02)
+        system.simulate(50, 0.02)
+        got = simulation.snapshot()
+        expected = system.snapshot()
+        for name in expected:
+            assert numpy.array_equal(got[name], expected[name])
+
+
+def test_prewarm():
+    system = make_emitter()
+    system.prewarm(3.0)
+    assert abs(system.elapsed - 3.0) < 1e-9
+    live = numpy.count_nonzero(alive(system))
+    # emission_rate * life, about the steady state
+    assert 150 <= live <= 250
+    # a system that would remove itself is not removed while prewarming
+    system = make_emitter()
+    system.auto_remove_on_finish = True
+    system.duration = 0.5
+    system.prewarm(3.0)
+    assert not system.active
+
+
+class Smoke(Emitter):
+    prewarm_seconds = 3.0
+
+
+class CountingSmoke(Smoke):
+    lod_interval = 3
+    low_priority = True
+
+    def step(self, delta):
+        self.steps = getattr(self, 'steps', 0) + 1
+        super(CountingSmoke, self).step(delta)
+
+
+def test_prewarm_seconds():
+    # prewarmed when created, through step overrides, without level of detail
+    system = CountingSmoke(fallback=True, texture=object(), seed=3)
+    assert system.steps == 30
+    assert abs(system.elapsed - 3.0) < 1e-9
+    assert 150 <= numpy.count_nonzero(alive(system)) <= 250
+    simulation = particle.simulation_of(Smoke, seed=3)
+    assert abs(simulation.elapsed - 3.0) < 1e-9
+    assert 150 <= numpy.count_nonzero(alive(simulation)) <= 250
+    # and when restarted
+    system.restart()
+    assert abs(system.elapsed - 3.0) < 1e-9
+    assert system.steps == 60
+    # a plain system starts empty
+    assert make_emitter().particle_count == 0
+
+
+def lod_pair(position, low_priority):
+    systems = []
+    for lod_interval in (1, 3):
+        system = Emitter(fallback=True, texture=object(), seed=9)
+        system.lod_interval = lod_interval
+        system.low_priority = low_priority
+        system.position = position
+        systems.append(system)
+    return systems
+
+
+def test_lod_low_priority_and_out_of_view():
+    # in view and normal priority, always updated
+    every_frame, lod = lod_pair((320.0, 240.0), False)
+    assert lod.is_in_view()
+    for i in range(6):
+        every_frame.step(0.125)
+        lod.step(0.125)
+        assert numpy.array_equal(every_frame.particle_pos, lod.particle_pos)
+
+    for position, low_priority in (((320.0, 240.0), True), ((5000.0, 240.0), False)):
+        reference, lod = lod_pair(position, low_priority)
+        assert lod.is_in_view() == (position[0] < 1000)
+        for i in range(6):
+            lod.step(0.125)
+            if i % 3 == 2:
+                # one update with the accumulated time; dts exact in binary
+                reference.step(0.375)
+                assert numpy.allclose(reference.particle_pos, lod.particle_pos)
+            else:
+                assert lod.particle_count == reference.particle_count
+        assert lod.particle_count > 0
+
+
+class ShortLived(Emitter):
+    duration = 0.5
+    life = 0.5
+    life_var = 0.0
+
+
+def test_pool_recycles_finished_systems():
+    pool = particle.ParticleSystemPool(max_per_class=1)
+    parent = CocosNode()
+    first = pool.acquire(ShortLived, fallback=True, texture=object())
+    arrays = [getattr(first, name) for name in first._particle_arrays]
+    parent.add(first)
+    for i in range(20):
+        first.step(0.125)
+        if first not in parent.get_children():
+            break
+    # finished: removed itself and went back to the pool, restarted
+    assert first not in parent.get_children()
+    assert pool.stats()['idle'] == 1
+    assert first.active and first.particle_count == 0
+    assert not numpy.any(alive(first))
+
+    again = pool.acquire(ShortLived)
+    assert again is first
+    assert all(getattr(again, name) is array
+               for name, array in zip(again._particle_arrays, arrays))
+    parent.add(again)
+    again.step(0.125)
+    assert again.particle_count > 0
+
+    other = pool.acquire(ShortLived, fallback=True, texture=object())
+    assert other is not first
+    pool.release(other)
+    pool.release(make_emitter())
+    stats = pool.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 2, 1 / 3)
+    assert (stats['released'], stats['discarded'], stats['idle']) == (3, 0, 2)
+    pool.release(pool.acquire(ShortLived))
+    pool.release(ShortLived(fallback=True, texture=object()))
+    assert pool.stats()['discarded'] == 1
+
+
+class Region(object):
+    # like a pyglet TextureRegion: shares the owner texture id
+    def __init__(self, texture_id, u0, v0, u1, v1):
+        self.id = texture_id
+        self.tex_coords = (u0, v0, 0.0, u1, v0, 0.0, u1, v1, 0.0, u0, v1, 0.0)
+
+
+atlas_frames = [Region(7, 0.5 * (i % 2), 0.5 * (i // 2), 0.5 * (i % 2) + 0.5,
+                       0.5 * (i // 2) + 0.5) for i in range(4)]
+
+
+class Animated(Emitter):
+    frames = atlas_frames
+    affectors = (affectors.FrameAnimation(4),)
+
+
+def test_frames_texture_rects():
+    system = Animated(fallback=True)
+    assert system.texture is atlas_frames[0]
+    system.add_particles(4)
+    # ages 0, 0.25, 0.5, 0.75 are frames 0, 1, 2, 3
+    system.particle_life[:4, 0] *= numpy.array([1.0, 0.74, 0.49, 0.24])
+    system.update_particles(0.0)
+    system.update_tex_coords()
+    expected = numpy.array([particle._texture_rect(f) for f in atlas_frames])
+    assert numpy.allclose(system.particle_rects[:4], expected)
+    nw, sw, se, ne = system.tex_coords[3]
+    assert tuple(sw) == (0.5, 0.5) and tuple(ne) == (1.0, 1.0)
+    # a region as texture, without frames
+    single = Emitter(fallback=True, texture=atlas_frames[1])
+    assert single.particle_rects is None
+    assert numpy.all(single.texture_rects == [[0.5, 0.0, 1.0, 0.5]])
+    assert tuple(single.tex_coords[10, 1]) == (0.5, 0.0)
+
+
+@pytest.mark.parametrize("fallback", [True, False])
+def test_batch_node_shares_atlas(fallback):
+    batch = particle.ParticleBatchNode(fallback=True)
+    batch.fallback = fallback
+    animated = Animated(fallback=True)
+    single = Emitter(fallback=True, texture=atlas_frames[3])
+    for system in (animated, single):
+        batch.add(system)
+        system.add_particles(20)
+    groups = batch.collect()
+    assert len(groups) == 1 and groups[0].count == 40
+    if fallback:
+        tex_coords = groups[0].arrays[2]
+        assert numpy.all(tex_coords[20:40, 1] == (0.5, 0.5))
+        assert numpy.all(tex_coords[:20, 1] == (0.0, 0.0))
+    else:
+        assert groups[0].per_particle_rects
+        rects = groups[0].arrays[4]
+        assert numpy.all(rects[:20] == [0.0, 0.0, 0.5, 0.5])
+        assert numpy.all(rects[20:40] == [0.5, 0.5, 1.0, 1.0])
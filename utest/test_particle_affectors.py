@@ -0,0 +1,180 @@
+from __future__ import division, print_function, unicode_literals
+
+# set the desired pyglet mockup
+import sys
+sys.path.insert(0,'pyglet_mockup1')
+import pyglet
+assert pyglet.mock_level == 1
+
+import pytest
+numpy = pytest.importorskip('numpy')
+
+from cocos.director import director
+from cocos.euclid import Point2
+import cocos.particle as particle
+import cocos.particle_affectors as affectors
+
+director.init()
+
+
+class Emitter(particle.ParticleSimulation):
+    total_particles = 1000
+    duration = -1
+    angle = 90.0
+    angle_var = 180.0
+    speed = 100.0
+    speed_var = 50.0
+    size = 10.0
+    size_var = 2.0
+    life = 2.0
+    life_var = 0.0
+    start_color = particle.Color(0.5, 0.5, 0.5, 1.0)
+    end_color = particle.Color(0.5, 0.5, 0.5, 1.0)
+    emission_rate = 200.0
+
+
+def simulation(*affector_list, **attrs):
+    attrs['affectors'] = tuple(affector_list)
+    cls = type(str('Affected'), (Emitter,), attrs)
+    return cls(seed=5)
+
+
+def live(system):
+    return system.particle_life[:, 0] >= 0
+
+
+def test_size_over_life():
+    system = simulation(affectors.SizeOverLife([(0.0, 0.0), (0.25, 2.0), (1.0, 1.0)]))
+    assert 'particle_size_start' in system._particle_arrays
+    system.add_particles(10)
+    assert numpy.all(system.particle_size[:10] == 0.0)
+    for age, factor in ((0.125, 1.0), (0.25, 2.0), (0.75, 4.0 / 3.0)):
+        system.particle_life[:10] = 2.0 * (1.0 - age)
+        system.update_particles(0.0)
+        assert numpy.allclose(system.particle_size[:10],
+                              system.particle_size_start[:10] * factor)
+    with pytest.raises(ValueError):
+        affectors.SizeOverLife([(0.5, 1.0), (0.2, 1.0)])
+
+
+def test_rotation():
+    system = simulation(affectors.Rotation(90.0, start=30.0))
+    assert simulation().particle_rotation is None
+    system.add_particles(5)
+    assert numpy.all(system.particle_rotation[:5] == 30.0)
+    system.update_particles(0.5)
+    assert numpy.allclose(system.particle_rotation[:5], 75.0)
+
+
+def test_rotated_quads():
+    cls = type(str('Rotating'), (particle.ParticleSystem, Emitter),
+               {'affectors': (affectors.Rotation(0.0, start=90.0),)})
+    system = cls(fallback=True, texture=object())
+    system.add_particles(3)
+    system.make_delta_pos_to_vertex()
+    half = system.particle_size[:3, 0, numpy.newaxis] * 0.5
+    # 90 degrees clockwise: NW corner goes to NE, SW to NW, ...
+    expected = numpy.array([[1.0, 1.0], [-1.0, 1.0], [-1.0, -1.0], [1.0, -1.0]])
+    assert numpy.allclose(system.delta_pos_to_vertex[:3],
+                          expected[numpy.newaxis] * half[:, :, numpy.newaxis],
+                          atol=1e-4)
+
+
+def test_drag_and_damping():
+    system = simulation(affectors.Drag(0.01), affectors.VelocityDamping(0.25))
+    system.add_particles(50)
+    direction = system.particle_dir[:50].copy()
+    speed = numpy.hypot(direction[:, 0], direction[:, 1])[:, numpy.newaxis]
+    system.update_particles(0.5)
+    expected = direction / (1.0 + 0.01 * speed * 0.5) * 0.5
+    assert numpy.allclose(system.particle_dir[:50], expected, rtol=1e-5)
+
+
+def test_bounce_keeps_particles_above_line():
+    system = simulation(affectors.Bounce((0.0, 2.0), point=(0.0, -20.0), restitution=0.5))
+    system.gravity = Point2(0.0, -500.0)
+    system.simulate(120, 1.0 / 60)
+    alive = live(system)
+    assert numpy.all(system.particle_pos[alive, 1] >= -20.0 - 1e-3)
+    # particles came down and bounced
+    assert numpy.any(numpy.isclose(system.particle_pos[alive, 1], -20.0, atol=3.0))
+    # a particle moving into the line reflects its normal speed
+    system.particle_pos[0] = (0.0, -25.0)
+    system.particle_dir[0] = (10.0, -40.0)
+    system.gravity = Point2(0.0, 0.0)
+    affectors.Bounce((0.0, 1.0), point=(0.0, -20.0), restitution=0.5,
+                     friction=0.5).update(system, 0.0, 1)
+    assert numpy.allclose(system.particle_pos[0], (0.0, -20.0))
+    assert numpy.allclose(system.particle_dir[0], (5.0, 20.0))
+
+
+@pytest.mark.parametrize("compact_storage", [False, True])
+def test_kill_region(compact_storage):
+    system = simulation(affectors.KillRegion(-1000.0, -1000.0, 2000.0, 970.0),
+                        affectors.Rotation(10.0, 5.0),
+                        compact_storage=compact_storage)
+    system.simulate(60, 1.0 / 60)
+    alive = live(system)
+    # 200 emitted, none died of age
+    assert 0 < numpy.count_nonzero(alive) < 190
+    assert numpy.all(system.particle_pos[alive, 1] >= -30.0)
+    assert numpy.all(system.particle_color[~alive, 3] == 0.0)
+    if compact_storage:
+        assert system.particle_count == numpy.count_nonzero(alive)
+        assert numpy.all(alive[:system.particle_count])
+        # rotation moved along the particles
+        age = 2.0 - system.particle_life[:system.particle_count, 0]
+        assert numpy.allclose(system.particle_rotation[:system.particle_count, 0],
+                              system.particle_rotation_speed[:system.particle_count, 0] * age,
+                              atol=1e-2)
+
+
+def test_kill_outside_in_parent_coordinates():
+    system = simulation(affectors.KillRegion(0.0, 0.0, 100.0, 100.0, inside=False,
+                                             relative=False))
+    system.x = system.y = 50.0
+    system.simulate(60, 1.0 / 60)
+    alive = live(system)
+    assert alive.any()
+    pos = system.particle_pos[alive]
+    assert numpy.all(numpy.abs(pos) <= 50.0)
+
+
+def test_affectors_do_not_allocate():
+    tracemalloc = pytest.importorskip('tracemalloc')
+    if not hasattr(tracemalloc, 'reset_peak'):
+        pytest.skip('needs tracemalloc.reset_peak')
+    system = simulation(affectors.SizeOverLife([(0.0, 1.0), (0.5, 2.0), (1.0, 0.0)]),
+                        affectors.Rotation(30.0, 10.0),
+                        affectors.Drag(0.001),
+                        affectors.VelocityDamping(0.9),
+                        affectors.Bounce((0.0, 1.0), point=(0.0, -10.0)),
+                        affectors.KillRegion(200.0, -500.0, 100.0, 1000.0),
+                        total_particles=10000)
+    system.add_particles(10000)
+    system.update_particles(0.01)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        for i in range(5):
+            system.update_particles(0.01)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 10000
+
+
+def test_frame_animation():
+    system = simulation(affectors.FrameAnimation(3, cycles=2.0))
+    system.add_particles(6)
+    assert numpy.all(system.particle_frame[:6] == 0.0)
+    system.particle_life[:6, 0] = 2.0 * (1.0 - numpy.array([0.0, 0.1, 0.2, 0.4, 0.6, 0.99]))
+    system.update_particles(0.0)
+    assert list(system.particle_frame[:6, 0]) == [0.0, 0.0, 1.0, 2.0, 0.0, 2.0]
+
+    fixed = simulation(affectors.FrameAnimation(3, cycles=0.0, random_start=True))
+    fixed.add_particles(300)
+    start = fixed.particle_frame[:300].copy()
+    assert set(start[:, 0]) == set([0.0, 1.0, 2.0])
+    fixed.update_particles(0.5)
+    assert numpy.all(fixed.particle_frame[:300] == start)